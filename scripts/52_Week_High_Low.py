@@ -2,12 +2,13 @@ import requests
 import time
 import os
 import random
-import json
 import sys
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from typing import Optional, List, Dict
 
+from jsonio import dump_file, response_json
+
 # -------------------------
 # Configuration
 # -------------------------
@@ -41,7 +42,7 @@ def fetch_json_data(url: str, max_retries: int = MAX_RETRIES) -> Optional[dict]:
             }
             resp = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
             resp.raise_for_status()
-            return resp.json()
+            return response_json(resp)
         except requests.exceptions.RequestException:
             if attempt < max_retries:
                 time.sleep(RETRY_BACKOFF * attempt)
@@ -49,8 +50,7 @@ def fetch_json_data(url: str, max_retries: int = MAX_RETRIES) -> Optional[dict]:
 
 def safe_write_json(path: str, data: dict) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    dump_file(data, path)
 
 def parse_iso_date_get_ymd(iso_str: str) -> Optional[str]:
     """Extract YYYY-MM-DD from an ISO-like string."""
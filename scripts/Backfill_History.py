@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import logging
+import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, date
+from typing import Any, Dict, List, Optional
+
+from jsonio import load_file, load_file_as, response_json_as
+from rate_control import AdaptiveRateLimiter, limiter_backed_off, limiter_for, paced_get
+from history_store import HISTORY_DIR, load_history, save_history, add_turnover, build_entry, merge_candles, normalize_universe
+from strike import PRICETICKS_URL, extract_daily_bars
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG = {
+    "universe_file": os.path.join(SCRIPT_DIR, "Sector_Industry.json"),
+    "history_dir": HISTORY_DIR,
+    "max_candles": 200,
+    "max_workers": 4,          # Concurrent date requests in flight
+    "initial_rate": 2.0,       # Requests/second to start from, across all workers; adapts to how Strike responds
+    "max_rate": 5.0,
+    "request_timeout": 30,
+    "retry_count": 3,
+    "retry_backoff": 2,
+}
+
+# -------------------------------
+# HELPER FUNCTIONS
+# -------------------------------
+
+def load_json_file(file_path: str, schema: Optional[str] = None) -> Optional[Any]:
+    """A reusable function to load and parse a JSON file, optionally against a jsonio schema."""
+    try:
+        return load_file_as(file_path, schema) if schema else load_file(file_path)
+    except FileNotFoundError:
+        logging.warning(f"Data file not found at {file_path}. This may be optional.")
+    except json.JSONDecodeError:
+        logging.error(f"Could not decode JSON from {file_path}. Check the file for errors.")
+    return None
+
+def save_history_shards(entries: List[Dict[str, Any]]):
+    """Writes the history shards; only the shards whose content changed are rewritten."""
+    try:
+        stats = save_history(entries, CONFIG["history_dir"])
+        logging.info(f"  {stats['written']} of {stats['shards']} history shards changed.")
+    except Exception as e:
+        logging.error(f"Failed to save history to {CONFIG['history_dir']}: {e}")
+
+def weekdays_back(end_date: date, days: int) -> List[date]:
+    """The last `days` Monday-Friday dates up to and including end_date, newest first."""
+    dates = []
+    current = end_date
+    while len(dates) < days:
+        if current.weekday() < 5:
+            dates.append(current)
+        current -= timedelta(days=1)
+    return dates
+
+# -------------------------------
+# CORE LOGIC FUNCTIONS
+# -------------------------------
+
+def fetch_session_bars(session: date, limiter: AdaptiveRateLimiter) -> Dict[str, list]:
+    """
+    Fetches the full-universe daily candles for one date. Holidays come back empty;
+    bars stamped with another date are dropped so a holiday never duplicates a session.
+    """
+    date_str = session.strftime("%Y-%m-%d")
+    url = PRICETICKS_URL.format(date=date_str)
+    for attempt in range(1, CONFIG["retry_count"] + 1):
+        try:
+            response = paced_get(url, limiter=limiter, timeout=CONFIG["request_timeout"])
+            response.raise_for_status()
+            bars = extract_daily_bars(response_json_as(response, "strike"))
+            return {symbol: bar for symbol, bar in bars.items() if bar[0][:10] == date_str}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.warning(f"  {date_str} attempt {attempt}/{CONFIG['retry_count']} failed: {e}")
+            # Throttles, 5xx and network errors are already paced by the limiter (and Retry-After).
+            if attempt < CONFIG["retry_count"] and not limiter_backed_off(e):
+                time.sleep(CONFIG["retry_backoff"] ** (attempt - 1))
+    logging.error(f"  Giving up on {date_str}.")
+    return {}
+
+def fetch_sessions(dates: List[date]) -> Dict[str, Dict[str, list]]:
+    """Fetches several dates concurrently. Returns {date: {symbol: bar}} for dates that traded."""
+    limiter = limiter_for(PRICETICKS_URL, initial_rate=CONFIG["initial_rate"], max_rate=CONFIG["max_rate"])
+    results: Dict[str, Dict[str, list]] = {}
+    with ThreadPoolExecutor(max_workers=CONFIG["max_workers"]) as pool:
+        futures = {pool.submit(fetch_session_bars, d, limiter): d for d in dates}
+        for future in as_completed(futures):
+            session = futures[future].strftime("%Y-%m-%d")
+            bars = future.result()
+            if bars:
+                results[session] = bars
+                logging.info(f"  {session}: {len(bars)} bars")
+            else:
+                logging.info(f"  {session}: no trading data (holiday or unavailable)")
+    logging.info(f"  Strike pacing: {limiter}")
+    return results
+
+def apply_backfill(historical_data: List[Dict[str, Any]], universe: List[Dict[str, str]],
+                   sessions: Dict[str, Dict[str, list]], today: date, overwrite: bool = False) -> int:
+    """
+    Writes the fetched bars into the history store in place. Symbols without any history
+    yet get a new entry. Returns the number of symbols that received at least one bar.
+    """
+    index = {entry.get("INECODE"): i for i, entry in enumerate(historical_data) if entry.get("INECODE")}
+    touched = 0
+    for stock in universe:
+        symbol, inecode = stock["Symbol"], stock["INECODE"]
+        new_bars = [list(bars[symbol]) for bars in sessions.values() if symbol in bars]
+        if not new_bars:
+            continue
+        add_turnover(new_bars)
+        pos = index.get(inecode)
+        existing = historical_data[pos] if pos is not None else None
+        candles = merge_candles(existing.get("candles", []) if existing else [], new_bars,
+                                CONFIG["max_candles"], overwrite=overwrite)
+        entry = build_entry(symbol, inecode, candles, existing, today, attempted=True)
+        if pos is None:
+            index[inecode] = len(historical_data)
+            historical_data.append(entry)
+        else:
+            historical_data[pos] = entry
+        touched += 1
+    return touched
+
+# -------------------------------
+# MAIN EXECUTION
+# -------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill daily candles for the whole universe, one Strike request per date.")
+    parser.add_argument("--days", type=int, default=30, help="Number of weekdays to backfill (default: 30).")
+    parser.add_argument("--end", help="Last date to backfill, YYYY-MM-DD (default: today).")
+    parser.add_argument("--workers", type=int, default=CONFIG["max_workers"], help="Concurrent requests.")
+    parser.add_argument("--repair", action="store_true", help="Overwrite existing bars instead of only filling gaps.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    CONFIG["max_workers"] = max(1, args.workers)
+    today = datetime.today().date()
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else today
+
+    universe_raw = load_json_file(CONFIG["universe_file"])
+    if not universe_raw:
+        return
+    universe = normalize_universe(universe_raw)
+    try:
+        historical_data = load_history(schema="history", history_dir=CONFIG["history_dir"]) or []
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"Could not read history from {CONFIG['history_dir']} ({e}). Aborting so it is not overwritten.")
+        return
+
+    dates = weekdays_back(end_date, args.days)
+    logging.info(f"🚀 Backfilling {len(dates)} weekdays ({dates[-1]} → {dates[0]}) for {len(universe)} symbols "
+                 f"with {CONFIG['max_workers']} workers...")
+    start = time.time()
+    sessions = fetch_sessions(dates)
+    if not sessions:
+        logging.error("No trading data fetched. Nothing to write.")
+        return
+
+    touched = apply_backfill(historical_data, universe, sessions, today, overwrite=args.repair)
+    save_history_shards(historical_data)
+    logging.info(f"✅ Wrote {len(sessions)} sessions into history for {touched} symbols in {time.time() - start:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import os
+import io
+import csv
+import sys
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import requests
+
+from jsonio import dump_file
+from query_store import QueryStore
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Custom sector indices: constituent lists come from the published Google Sheet (one
+# "sector,symbol" row per constituent) and every index is rebuilt from the daily candle
+# history as an equal-weighted and a market-cap-weighted level series. The page only
+# downloads the precomputed custom_indices.json.
+
+IST = ZoneInfo("Asia/Kolkata")
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DATA_DIR = os.path.join(SCRIPT_DIR, "..", "static", "data")
+
+CONFIG = {
+    "definitions_url": "https://docs.google.com/spreadsheets/d/e/2PACX-1vTOqNgqIvbKgZ2SNvOAGkhW6iXxm1xXK_R1xCorTNDQkWRxod8-8G8x0isl1zTVHDVeHsfwfZfJLlkh/pub?output=csv",
+    # Last definitions fetched from the sheet; used as is when the sheet cannot be reached.
+    "definitions_file": os.path.join(SCRIPT_DIR, "custom_index_definitions.csv"),
+    "output_file": os.path.join(STATIC_DATA_DIR, "custom_indices.json"),
+    "request_timeout": 30,
+    "base_level": 100.0,
+    # Sessions of level history published per index (the series is rebased to base_level at its start).
+    "series_sessions": 250,
+    # Trailing returns, in sessions.
+    "return_windows": {"1D": 1, "1W": 5, "1M": 21, "3M": 63, "6M": 126},
+    # Relative strength vs the benchmark over these windows, in sessions.
+    "rs_windows": {"1M": 21, "3M": 63, "6M": 126},
+}
+
+# The benchmark is the whole published universe, weighted the same way as the index it is compared with.
+BENCHMARK_NAME = "Finvestik Universe"
+WEIGHTINGS = ("equal", "mcap")
+
+# -------------------------------
+# DEFINITIONS
+# -------------------------------
+
+def fetch_definitions_text() -> Optional[str]:
+    """CSV text of the sheet, saved as the new definitions_file. Falls back to the saved copy."""
+    try:
+        resp = requests.get(CONFIG["definitions_url"], timeout=CONFIG["request_timeout"])
+        resp.raise_for_status()
+        text = resp.content.decode("utf-8-sig")
+        if len(text.strip()) >= 5:
+            with open(CONFIG["definitions_file"], "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            return text
+        logging.warning("⚠️ Custom index sheet is empty; using the saved definitions.")
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"⚠️ Could not fetch the custom index sheet ({e}); using the saved definitions.")
+    try:
+        with open(CONFIG["definitions_file"], encoding="utf-8-sig") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def parse_definitions(csv_text: str) -> Dict[str, List[str]]:
+    """
+    Index name -> constituent symbols, in sheet order. The index name is the "sector" column
+    and the symbol the "symbol" column (case-insensitive), else the first and second columns.
+    """
+    reader = csv.reader(io.StringIO(csv_text))
+    header = [h.strip().lower() for h in next(reader, [])]
+    if len(header) < 2:
+        return {}
+    name_col = header.index("sector") if "sector" in header else 0
+    symbol_col = header.index("symbol") if "symbol" in header else 1
+
+    indices: Dict[str, List[str]] = {}
+    for row in reader:
+        if len(row) <= max(name_col, symbol_col):
+            continue
+        name, symbol = row[name_col].strip(), row[symbol_col].strip().upper()
+        if not name or not symbol:
+            continue
+        members = indices.setdefault(name, [])
+        if symbol not in members:
+            members.append(symbol)
+    return indices
+
+# -------------------------------
+# INDEX COMPUTATION
+# -------------------------------
+
+def locate(keys: np.ndarray, sorted_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(position in sorted_values, found) for every key."""
+    if not len(sorted_values):
+        return np.zeros(len(keys), dtype=int), np.zeros(len(keys), dtype=bool)
+    pos = np.clip(np.searchsorted(sorted_values, keys), 0, len(sorted_values) - 1)
+    return pos, sorted_values[pos] == keys
+
+def index_returns(returns: np.ndarray, weights: np.ndarray, membership: np.ndarray) -> np.ndarray:
+    """
+    Daily returns (T, K) of K indices at once. returns and weights are (T, S); membership is
+    (S, K). A constituent counts on a day only when both its return and weight are known, so
+    listings, suspensions and gaps in the history drop out of that day instead of distorting it.
+    """
+    valid = np.isfinite(returns) & np.isfinite(weights)
+    w = np.where(valid, weights, 0.0)
+    weighted = np.where(valid, returns, 0.0) * w
+    total = w @ membership
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = (weighted @ membership) / total
+    return np.where(total > 0, out, 0.0)
+
+def levels_from_returns(returns: np.ndarray, base: float) -> np.ndarray:
+    """(T+1, K) levels starting at `base`, chain-linked from (T, K) daily returns."""
+    growth = np.vstack([np.ones((1, returns.shape[1])), 1.0 + returns])
+    return base * np.cumprod(growth, axis=0)
+
+def trailing_change(levels: np.ndarray, sessions: int) -> np.ndarray:
+    """% change of every column over the last `sessions` rows; NaN when the series is shorter."""
+    if sessions >= len(levels):
+        return np.full(levels.shape[1], np.nan)
+    return (levels[-1] / levels[-1 - sessions] - 1) * 100
+
+def compute_levels(store: QueryStore, indices: Dict[str, List[str]]) -> Tuple[np.ndarray, Dict[str, np.ndarray], List[List[str]]]:
+    """
+    One vectorized pass over the close panel for every index and both weightings.
+
+    Returns (dates, {weighting: (T, K + 1) levels}, missing symbols per index); the last
+    column of each level array is the benchmark. Market-cap weights use the latest share
+    count implied by the universe (Market Cap / current_price) times the previous close.
+    """
+    dates, symbols, close_panel = store.history_panel("close")
+    window = min(len(dates), CONFIG["series_sessions"] + 1)
+    dates = np.asarray(dates[len(dates) - window:])
+    close = np.asarray(close_panel[len(close_panel) - window:], dtype=np.float64)
+    symbols = np.asarray(symbols)
+
+    names = list(indices)
+    membership = np.zeros((len(symbols), len(names) + 1))
+    missing = []
+    for k, name in enumerate(names):
+        wanted = np.array(indices[name], dtype=str)
+        pos, found = locate(wanted, symbols)
+        membership[pos[found], k] = 1.0
+        missing.append([str(s) for s in wanted[~found]])
+
+    upos, in_universe = locate(symbols, store.universe_column("Symbol"))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = store.universe_column("Market Cap") / store.universe_column("current_price")
+    shares = np.where(in_universe, shares[upos] if len(shares) else np.nan, np.nan)
+    membership[:, -1] = in_universe  # benchmark: every universe stock with history
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = close[1:] / close[:-1] - 1
+    weights = {
+        "equal": np.where(np.isfinite(close[:-1]), 1.0, np.nan),
+        "mcap": close[:-1] * shares,
+    }
+    levels = {w: levels_from_returns(index_returns(returns, weights[w], membership), CONFIG["base_level"])
+              for w in WEIGHTINGS}
+    return dates, levels, missing
+
+def summarize(levels: np.ndarray, k: int) -> Dict[str, Any]:
+    """Level series, trailing returns and RS vs the benchmark (last column) for index column k."""
+    series, bench = levels[:, k], levels[:, -1]
+    rs_line = series / bench * CONFIG["base_level"]
+    pair = np.stack([series, bench], axis=1)
+    returns = {label: trailing_change(pair, n)[0] for label, n in CONFIG["return_windows"].items()}
+    rs = {}
+    for label, n in CONFIG["rs_windows"].items():
+        own, market = trailing_change(pair, n)
+        rs[label] = ((1 + own / 100) / (1 + market / 100) - 1) * 100
+    return {
+        "level": round(float(series[-1]), 2),
+        "levels": [round(float(v), 2) for v in series],
+        "rs_line": [round(float(v), 2) for v in rs_line],
+        "returns": {k_: (round(float(v), 2) if np.isfinite(v) else None) for k_, v in returns.items()},
+        "rs": {k_: (round(float(v), 2) if np.isfinite(v) else None) for k_, v in rs.items()},
+    }
+
+def build_output(indices: Dict[str, List[str]], dates: np.ndarray, levels: Dict[str, np.ndarray],
+                 missing: List[List[str]]) -> Dict[str, Any]:
+    output = {
+        "generated_at": datetime.now(IST).strftime("%Y-%m-%d %H:%M:%S"),
+        "as_of": str(dates[-1]) if len(dates) else None,
+        "base_level": CONFIG["base_level"],
+        "dates": [str(d) for d in dates],
+        "benchmark": {"name": BENCHMARK_NAME,
+                      **{w: {"levels": [round(float(v), 2) for v in levels[w][:, -1]]} for w in WEIGHTINGS}},
+        "indices": [],
+    }
+    for k, (name, members) in enumerate(indices.items()):
+        output["indices"].append({
+            "name": name,
+            "constituents": members,
+            "missing": missing[k],
+            **{w: summarize(levels[w], k) for w in WEIGHTINGS},
+        })
+    return output
+
+# -------------------------------
+# MAIN EXECUTION
+# -------------------------------
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    csv_text = fetch_definitions_text()
+    if not csv_text:
+        logging.error("❌ No custom index definitions available.")
+        sys.exit(1)
+    indices = parse_definitions(csv_text)
+    if not indices:
+        logging.error("❌ Custom index definitions contain no index.")
+        sys.exit(1)
+
+    store = QueryStore.open()
+    dates, levels, missing = compute_levels(store, indices)
+    if len(dates) < 2:
+        logging.error("❌ Candle history holds fewer than two sessions.")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(CONFIG["output_file"]), exist_ok=True)
+    dump_file(build_output(indices, dates, levels, missing), CONFIG["output_file"])
+    unresolved = sum(len(m) for m in missing)
+    logging.info(f"✅ {len(indices)} custom indices over {len(dates)} sessions written to {CONFIG['output_file']}"
+                 + (f" ({unresolved} constituents without history)" if unresolved else ""))
+
+if __name__ == "__main__":
+    main()
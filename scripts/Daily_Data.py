@@ -2,12 +2,25 @@ import os
 import json
 import math
 import time
-import requests
+import shlex
 import logging
-import pandas as pd
-from datetime import datetime, timedelta
-import pytz
-from typing import List, Dict, Any, Optional
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, time as dtime
+from typing import List, Dict, Any, Optional, Tuple
+
+from jsonio import load_file, load_file_as, dump_file
+from snapshot_store import SNAPSHOT_DIR, record_snapshot
+from sharded_store import encode_rows, write_if_changed
+from quality_gate import check_universe, record_metrics
+from stock_record import StockRecord, records_to_output
+from security_master import SecurityMaster
+from history_store import HISTORY_DIR, load_history
+from corporate_actions import CorporateActions
+from strike import IST, MARKET_OPEN, MARKET_CLOSE
+from live_sources import CONFIG as SOURCE_CONFIG, HedgedFetcher, LiveUniverse
 
 # -------------------------------
 # CONFIGURATION
@@ -17,27 +30,33 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DATA_DIR = os.path.join(SCRIPT_DIR, "..", "static", "data")
 
 CONFIG = {
-    # 1. NEW URL (For Today's Data - Live/Closing State)
-    "strike_api_url_today": "https://api-v2.strike.money/v3/market/api/equity/last-traded-state?securities=EQ%3A*&onlyFaoStocks=false&lastTradedTime={date}",
-    
-    # 2. OLD URL (For Previous Day Data - Historical % Change Calculation)
-    "strike_api_url_history": "https://api-v2.strike.money/v3/market/api/equity/priceticks?securities=EQ%3A*&onlyFaoStocks=false&candleInterval=1d&dateTimes={date}",
-    
+    # Live data comes from the sources in live_sources.py (Strike, then Chartink as the hedge/fallback).
     "output_file": os.path.join(STATIC_DATA_DIR, "stock_universe.json"),
     "output_version_file": os.path.join(STATIC_DATA_DIR, "data_version.json"),
     "sector_file": os.path.join(SCRIPT_DIR, "Sector_Industry.json"),
     "high_low_file": os.path.join(SCRIPT_DIR, "52_wk_High_Low.json"),
     "circuit_limit_file": os.path.join(SCRIPT_DIR, "circuit_limits.json"),
-    "historical_file": os.path.join(SCRIPT_DIR, "stock_historical_universe.json"),
+    "history_dir": HISTORY_DIR,
+    "snapshot_dir": SNAPSHOT_DIR,
+    # The session's final universe is snapshotted once the session has closed (a git-tracked
+    # file rewritten every few minutes would only churn). Set to True to also archive every
+    # intraday run.
+    "snapshot_intraday": False,
+    # --stream: seconds between two polls of the live feed, how long after the close to keep polling,
+    # and the least minutes between two --on-publish runs (each one is a git commit + push).
+    "stream_interval_seconds": 15,
+    "stream_close_grace_minutes": 5,
+    "stream_push_every_minutes": 10,
+    # Block publishing when quality_gate.py finds the universe broken (see --skip-quality-gate).
+    "quality_gate": True,
 }
 
 # --- 2. HELPER FUNCTIONS ---
 
-def load_json_file(file_path: str) -> Optional[Dict[str, Any]]:
-    """A reusable function to load and parse a JSON file."""
+def load_json_file(file_path: str, schema: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """A reusable function to load and parse a JSON file, optionally against a jsonio schema."""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_file_as(file_path, schema) if schema else load_file(file_path)
     except FileNotFoundError:
         logging.warning(f"Data file not found at {file_path}. This may be optional.")
     except json.JSONDecodeError:
@@ -48,160 +67,62 @@ def save_json_file(data: Any, path: str):
     """A generic function to save data to a JSON file."""
     try:
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        dump_file(data, path)
     except Exception as e:
         logging.error(f"Failed to save JSON file to {path}: {e}")
 
-def find_valid_trading_day_data(start_date: datetime.date, url_template: str, max_lookback_days: int = 30) -> (Optional[datetime.date], Optional[Dict[str, Any]]):
-    """
-    Looks back day-by-day from a start date to find the first day with valid API data.
-    """
-    logging.info(f"Searching for data using template: {url_template[:60]}...")
-    current_date = start_date
-    for _ in range(max_lookback_days):
-        date_str = current_date.strftime("%Y-%m-%d")
-        api_url = url_template.format(date=date_str)
-        try:
-            response = requests.get(api_url, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            ticks_new = data.get("data", {}).get("current", {}).get("ticks")
-            ticks_old = data.get("data", {}).get("ticks")
-
-            if ticks_new or ticks_old:
-                logging.info(f"  SUCCESS: Found valid trading data for date: {date_str}")
-                return current_date, data
-            else:
-                logging.info(f"  No trades found for {date_str}, looking back...")
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"  Could not fetch data for {date_str} ({e}), looking back...")
-        
-        current_date -= timedelta(days=1)
-
-    logging.error(f"FATAL: Could not find any trading data after looking back {max_lookback_days} days.")
-    return None, None
-
-def process_strike_response(today_data: Dict[str, Any], previous_day_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """
-    Processes the raw JSON response from Strike API using mixed API logic.
-    """
-    logging.info("Step 2: Processing today's (New API) and previous day's (Old API) data...")
-    
-    previous_day_closes = {}
-    prev_api_data = previous_day_data.get("data", {})
-    prev_ticks = prev_api_data.get("ticks", {})
-    
-    for symbol, tick_data in prev_ticks.items():
-        if tick_data and isinstance(tick_data, list) and isinstance(tick_data[0], list) and len(tick_data[0]) > 4:
-            previous_day_closes[symbol] = tick_data[0][4] 
-            
-    logging.info(f"  Created a lookup map with {len(previous_day_closes)} previous day closing prices.")
-
-    stocks = []
-    today_api_data = today_data.get("data", {})
-    
-    if "current" in today_api_data:
-        today_inner = today_api_data["current"]
-        fields = today_inner.get("fields", [])
-        today_ticks = today_inner.get("ticks", {})
-    else:
-        fields = today_api_data.get("fields", [])
-        today_ticks = today_api_data.get("ticks", {})
-
-    if not all([fields, today_ticks]):
-        logging.error("  Could not find 'fields' or 'ticks' in today's API response. Aborting.")
-        return []
-
-    fallback_count = 0
-    for symbol, tick_data in today_ticks.items():
-        if not tick_data or not isinstance(tick_data, list) or not isinstance(tick_data[0], list):
-            continue
-
-        values = tick_data[0]
-        raw_stock_info = dict(zip(fields, values))
-        
-        stock = {
-            "symbol": symbol,
-            "close": raw_stock_info.get("dayClose", raw_stock_info.get("close")),
-            "high": raw_stock_info.get("dayHigh", raw_stock_info.get("high")),
-            "low": raw_stock_info.get("dayLow", raw_stock_info.get("low")),
-            "volume": raw_stock_info.get("dayVolume", raw_stock_info.get("volume")),
-            "open": raw_stock_info.get("dayOpen", raw_stock_info.get("open"))
-        }
-
-        today_close = stock.get("close")
-        previous_close = previous_day_closes.get(symbol)
-
-        if previous_close is not None and isinstance(today_close, (int, float)) and previous_close != 0:
-            stock['%change'] = ((today_close - previous_close) / previous_close) * 100
-        else:
-            today_open = stock.get("open")
-            if isinstance(today_open, (int, float)) and isinstance(today_close, (int, float)) and today_open != 0:
-                stock['%change'] = ((today_close - today_open) / today_open) * 100
-                fallback_count += 1
-            else:
-                stock['%change'] = 0.0
-
-        stocks.append(stock)
-    
-    logging.info(f"  Processed {len(stocks)} stocks using mixed API logic.")
-    if fallback_count > 0:
-        logging.info(f"  Used fallback %change calculation (Open vs Close) for {fallback_count} stocks (missing history).")
-    return stocks
-
-def map_sector_data(stocks: List[Dict], sector_data: List[Dict]):
+def map_sector_data(stocks: List[StockRecord], sector_data: List[Dict]):
     logging.info("Step 3: Mapping sector/industry data...")
     sector_map = {item["Symbol"]: item for item in sector_data if "Symbol" in item}
     count = 0
     for stock in stocks:
-        symbol = stock.get("symbol")
-        sector_info = sector_map.get(symbol)
+        sector_info = sector_map.get(stock.symbol)
         if sector_info:
-            sector_info.pop("Symbol", None)
-            stock.update(sector_info)
+            stock.apply_sector(sector_info)
             count += 1
     logging.info(f"  Mapped sector data for {count} of {len(stocks)} stocks.")
 
-def filter_invalid_inecode(stocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def filter_invalid_inecode(stocks: List[StockRecord]) -> List[StockRecord]:
     logging.info("Step 3.5: Filtering stocks with invalid INECODE...")
     initial_count = len(stocks)
     filtered_stocks = [
         stock for stock in stocks
-        if stock.get("INECODE") and stock.get("INECODE") != "XXXXXXXXXXXX"
+        if stock.inecode and stock.inecode != "XXXXXXXXXXXX"
     ]
     removed_count = initial_count - len(filtered_stocks)
     if removed_count > 0:
         logging.info(f"  Removed {removed_count} stocks where INECODE is missing or 'XXXXXXXXXXXX'.")
     return filtered_stocks
 
-def map_circuit_limits(stocks: List[Dict], circuit_data: List[Dict]):
+def map_circuit_limits(stocks: List[StockRecord], circuit_data: List[Dict]):
     logging.info("Step 4: Mapping circuit limit data...")
     circuit_map = {item["SYMBOL"]: item.get("BAND") for item in circuit_data}
-    count = 0
+    count = live = 0
     for stock in stocks:
-        symbol = stock.get("symbol")
-        band_value = circuit_map.get(symbol,0)
-        stock["circuitLimit"] = band_value
+        # Bands decoded from today's snapshot win over the morning circuit_limits.json file.
+        if stock.circuit_limit is None:
+            stock.circuit_limit = circuit_map.get(stock.symbol, 0)
+        else:
+            live += 1
         count += 1
-    logging.info(f"  Mapped circuit limits for {count} of {len(stocks)} stocks.")
+    logging.info(f"  Mapped circuit limits for {count} of {len(stocks)} stocks ({live} from today's snapshot).")
 
-def map_52_week_high_low(stocks: List[Dict], high_low_data) -> List[Dict]:
+def map_52_week_high_low(stocks: List[StockRecord], high_low_data, master: SecurityMaster) -> List[StockRecord]:
     logging.info("Step 5: Mapping 52-week high/low data...")
     if isinstance(high_low_data, dict) and "data" in high_low_data:
         hl_list = high_low_data["data"]
     else:
         hl_list = high_low_data or []
 
-    hl_map = { (item.get("Symbol") or "").strip().upper(): item for item in hl_list if isinstance(item, dict) }
+    # Keyed by current symbol, so a report still using a former symbol joins after a rename.
+    hl_map = { master.canonical_symbol(item.get("Symbol")): item for item in hl_list if isinstance(item, dict) }
 
     processed = 0
     for stock in stocks:
-        sym = (stock.get("symbol") or "").strip().upper()
+        sym = (stock.symbol or "").strip().upper()
         if not sym: continue
 
-        day_high, day_low, close_price = stock.get("high"), stock.get("low"), stock.get("close")
+        day_high, day_low, close_price = stock.high, stock.low, stock.close
         stored = hl_map.get(sym, {})
         high_candidates = [v for v in (stored.get("52_Weeks_High"), day_high) if isinstance(v, (int, float))]
         low_candidates = [v for v in (stored.get("52_Weeks_Low"), day_low) if isinstance(v, (int, float))]
@@ -209,60 +130,58 @@ def map_52_week_high_low(stocks: List[Dict], high_low_data) -> List[Dict]:
         fifty_two_week_high = max(high_candidates) if high_candidates else None
         fifty_two_week_low = min(low_candidates) if low_candidates else None
 
-        stock["fifty_two_week_high"] = fifty_two_week_high
-        stock["fifty_two_week_low"] = fifty_two_week_low
+        stock.fifty_two_week_high = fifty_two_week_high
+        stock.fifty_two_week_low = fifty_two_week_low
 
         if isinstance(fifty_two_week_high, (int, float)) and isinstance(close_price, (int, float)) and fifty_two_week_high != 0:
-            stock["Down from 52W High (%)"] = round(((fifty_two_week_high - close_price) / fifty_two_week_high) * 100, 2)
-        else: stock["Down from 52W High (%)"] = None
+            stock.down_from_high_pct = round(((fifty_two_week_high - close_price) / fifty_two_week_high) * 100, 2)
+        else: stock.down_from_high_pct = None
 
         if isinstance(fifty_two_week_low, (int, float)) and isinstance(close_price, (int, float)) and fifty_two_week_low != 0:
-            stock["Up from 52W Low (%)"] = round(((close_price - fifty_two_week_low) / fifty_two_week_low) * 100, 2)
-        else: stock["Up from 52W Low (%)"] = None
+            stock.up_from_low_pct = round(((close_price - fifty_two_week_low) / fifty_two_week_low) * 100, 2)
+        else: stock.up_from_low_pct = None
         processed += 1
     logging.info(f"  Processed 52-week metrics for {processed} stocks.")
     return stocks
 
-def calculate_turnover_sma20(stocks: List[Dict], historical_data: List[Dict], trade_date: str):
+def calculate_turnover_sma20(stocks: List[StockRecord], hist_map: Dict[str, List[list]], trade_date: str, master: SecurityMaster):
     logging.info("Step 6: Calculating 20-day Turnover SMA...")
-    hist_map = {item["Symbol"]: item["candles"] for item in historical_data if "Symbol" in item and "candles" in item}
     count = 0
     for stock in stocks:
-        close_price, volume = stock.get("close"), stock.get("volume")
+        close_price, volume = stock.close, stock.volume
         today_turnover = (close_price * volume) / 1e7 if isinstance(close_price, (int, float)) and isinstance(volume, (int, float)) else 0
-        stock["turnover"] = round(today_turnover, 2)
-        candles = hist_map.get(stock.get("symbol"))
+        stock.turnover = round(today_turnover, 2)
+        candles = hist_map.get(master.resolve_isin(stock.inecode, stock.symbol))
         if not candles:
-            stock["TurnoverSMA20"] = stock["turnover"]
+            stock.turnover_sma20 = stock.turnover
             continue
         first_candle_date = str(candles[0][0])[:10]
         selected_candles = candles[1:20] if first_candle_date == trade_date else candles[0:19]
         turnover_values = [today_turnover] + [c[7] for c in selected_candles if len(c) >= 8 and isinstance(c[7], (int, float)) and c[7] > 0]
         if turnover_values:
-            stock["TurnoverSMA20"] = round(sum(turnover_values) / len(turnover_values), 2)
+            stock.turnover_sma20 = round(sum(turnover_values) / len(turnover_values), 2)
             count += 1
-        else: stock["TurnoverSMA20"] = 0
+        else: stock.turnover_sma20 = 0
     logging.info(f"  Calculated Turnover SMA20 for {count} of {len(stocks)} stocks.")
 
-def calculate_tomcap(stocks: List[Dict]):
+def calculate_tomcap(stocks: List[StockRecord]):
     logging.info("Step 7: Calculating Tomcap...")
     count = 0
     for stock in stocks:
-        sma20, mcap = stock.get("TurnoverSMA20"), stock.get("Market Cap")
+        sma20, mcap = stock.turnover_sma20, stock.market_cap
         if isinstance(sma20, (int, float)) and isinstance(mcap, (int, float)) and mcap > 0:
-            stock["Tomcap"] = math.floor((sma20 * 100 / mcap) * 100) / 100
+            stock.tomcap = math.floor((sma20 * 100 / mcap) * 100) / 100
             count += 1
-        else: stock["Tomcap"] = None
+        else: stock.tomcap = None
     logging.info(f"  Calculated Tomcap for {count} of {len(stocks)} stocks.")
 
-def calculate_rs_rating(stocks: List[Dict], historical_data: List[Dict], trade_date: str):
+def calculate_rs_rating(stocks: List[StockRecord], hist_map: Dict[str, List[list]], trade_date: str, master: SecurityMaster):
     logging.info("Step 8: Calculating RS Rating...")
-    hist_map = {item["Symbol"]: item["candles"] for item in historical_data if "Symbol" in item and "candles" in item}
     rs_values_3m, rs_values_6m = [], []
     for stock in stocks:
-        today_close = stock.get("close")
-        candles = hist_map.get(stock.get("symbol"))
-        stock["RS_3M"], stock["RS_6M"] = None, None
+        today_close = stock.close
+        candles = hist_map.get(master.resolve_isin(stock.inecode, stock.symbol))
+        stock.rs_3m, stock.rs_6m = None, None
         if not all([today_close, candles]): continue
         first_hist_date = str(candles[0][0])[:10]
         historical_slice = candles[1:] if first_hist_date == trade_date else candles
@@ -271,88 +190,295 @@ def calculate_rs_rating(stocks: List[Dict], historical_data: List[Dict], trade_d
 
         if len(closes) > days_3m:
             ret_1m, ret_2m, ret_3m = (closes[0]/closes[days_1m]-1)*100, (closes[0]/closes[days_2m]-1)*100, (closes[0]/closes[days_3m]-1)*100
-            stock["_RS_3M_value"] = 0.4*ret_1m + 0.35*ret_2m + 0.25*ret_3m
-            rs_values_3m.append(stock["_RS_3M_value"])
-        else: stock["RS_3M"] = 100
+            stock.rs_3m_value = 0.4*ret_1m + 0.35*ret_2m + 0.25*ret_3m
+            rs_values_3m.append(stock.rs_3m_value)
+        else: stock.rs_3m = 100
 
         if len(closes) > days_6m:
             ret_1m_6, ret_3m_6, ret_6m = (closes[0]/closes[days_1m]-1)*100, (closes[0]/closes[days_3m]-1)*100, (closes[0]/closes[days_6m]-1)*100
-            stock["_RS_6M_value"] = 0.4*ret_1m_6 + 0.35*ret_3m_6 + 0.25*ret_6m
-            rs_values_6m.append(stock["_RS_6M_value"])
-        else: stock["RS_6M"] = 100
+            stock.rs_6m_value = 0.4*ret_1m_6 + 0.35*ret_3m_6 + 0.25*ret_6m
+            rs_values_6m.append(stock.rs_6m_value)
+        else: stock.rs_6m = 100
 
     rs_values_3m.sort(); rs_values_6m.sort()
     t3, t6 = len(rs_values_3m), len(rs_values_6m)
     for stock in stocks:
-        if "_RS_3M_value" in stock and t3 > 1:
-            stock["RS_3M"] = round(rs_values_3m.index(stock["_RS_3M_value"])/(t3-1)*99)
-        if "_RS_6M_value" in stock and t6 > 1:
-            stock["RS_6M"] = round(rs_values_6m.index(stock["_RS_6M_value"])/(t6-1)*99)
+        if stock.rs_3m_value is not None and t3 > 1:
+            stock.rs_3m = round(rs_values_3m.index(stock.rs_3m_value)/(t3-1)*99)
+        if stock.rs_6m_value is not None and t6 > 1:
+            stock.rs_6m = round(rs_values_6m.index(stock.rs_6m_value)/(t6-1)*99)
     logging.info(f"  Calculated RS Rating for {t3} (3M) and {t6} (6M) of {len(stocks)} stocks.")
 
-def prepare_and_save_data(stocks: List[Dict]):
-    logging.info("Step 9: Preparing and saving final JSON file...")
+def previous_session_closes(stocks: List[StockRecord], hist_map: Dict[str, List[list]], trade_date: str,
+                            master: SecurityMaster) -> Tuple[Optional[str], Dict[str, float]]:
+    """
+    Official closes of the last session before `trade_date` in the candle history, by symbol:
+    the quality gate's reference for %change. The session is the one most symbols' history
+    ends on before `trade_date`; symbols whose history ends elsewhere are left out.
+    """
+    dated = {}
     for stock in stocks:
-        stock.pop("_RS_3M_value", None); stock.pop("_RS_6M_value", None); stock.pop("open", None)
-    df = pd.DataFrame(stocks)
-    if '%change' in df.columns: df['%change'] = df['%change'].round(2)
-    df.drop(columns=['SecurityID', 'ListingID', 'SME Stock?', 'Industry ID'], inplace=True, errors='ignore')
-    df.rename(columns={'close': 'current_price', 'high': 'day_high', 'low': 'day_low',
-                       'volume': 'day_volume', '%change': 'change_percentage', 'symbol': 'Symbol'}, inplace=True)
-    records = df.where(pd.notnull(df), None).to_dict(orient="records")
-    save_json_file(records, CONFIG["output_file"])
+        for candle in hist_map.get(master.resolve_isin(stock.inecode, stock.symbol)) or []:  # newest first
+            if str(candle[0])[:10] < trade_date:
+                if len(candle) > 4 and isinstance(candle[4], (int, float)):
+                    dated[stock.symbol] = (str(candle[0])[:10], candle[4])
+                break
+    if not dated:
+        return None, {}
+    session = Counter(day for day, _ in dated.values()).most_common(1)[0][0]
+    return session, {symbol: close for symbol, (day, close) in dated.items() if day == session}
+
+def passes_quality_gate(records: List[Dict], trade_date: str, source: Optional[str] = None,
+                        previous: Tuple[Optional[str], Dict[str, float]] = (None, {})) -> Tuple[bool, List[str]]:
+    """Runs quality_gate.py on the rows. Returns (publish?, failures found)."""
+    logging.info("Step 9: Checking data quality...")
+    previous_session, previous_closes = previous
+    report = check_universe(records, trade_date, CONFIG["snapshot_dir"],
+                            previous_closes=previous_closes, previous_session=previous_session)
+    record_metrics(report, source)
+    for warning in report.warnings:
+        logging.warning(f"  ⚠️ {warning}")
+    if report.passed:
+        logging.info(f"  Quality gate passed ({len(records)} rows).")
+        return True, []
+    for failure in report.failures:
+        logging.error(f"  ❌ {failure}")
+    if not CONFIG["quality_gate"]:
+        logging.warning("  Quality gate disabled — publishing anyway.")
+        return True, report.failures
+    logging.error("  Quality gate failed — keeping the last published universe.")
+    return False, report.failures
+
+def prepare_and_save_data(records: List[Dict]) -> bool:
+    """
+    Saves the universe one row per line, so a commit diffs only the rows that changed.
+    Returns False (and leaves the file alone) when nothing changed.
+    """
+    logging.info("Step 10: Saving final JSON file...")
+    if not write_if_changed(encode_rows(records), CONFIG["output_file"]):
+        logging.info(f"  Universe unchanged ({len(records)} stocks); nothing written.")
+        return False
     logging.info(f"  Successfully saved {len(records)} stocks.")
+    return True
 
-# --- 4. MAIN EXECUTION ---
-def main():
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    ist = pytz.timezone('Asia/Kolkata')
-    start_date = datetime.now(ist).date()
-    logging.info(f"🚀 Starting data pipeline. Current IST date: {start_date.strftime('%Y-%m-%d')}")
+# --- 3. STAGED INPUT LOADING ---
+# The reference files load on threads and the history file parses in a worker process while
+# the live feed downloads; each enrichment stage waits only for the inputs it reads.
 
-    # 1. Fetch Today's Data (New API)
-    latest_q_date, raw_today_data = find_valid_trading_day_data(start_date, CONFIG["strike_api_url_today"])
-    if not raw_today_data: return
+# Newest candles kept per symbol: RS 6M reads 121 closes and the turnover SMA 20 rows.
+HISTORY_CANDLES_NEEDED = 150
 
-    # FIX: Get the actual session date from the API response
-    actual_trade_date_str = None
+def load_history_index(history_dir: str) -> Optional[Dict[str, List[list]]]:
+    """
+    Parses the history file, applies split/bonus adjustments and keys each symbol's newest
+    candles by current ISIN. Runs in a worker process, so only the trimmed index is sent back.
+    """
     try:
-        today_ticks = raw_today_data.get("data", {}).get("current", {}).get("ticks", {})
-        first_symbol = next(iter(today_ticks))
-        actual_trade_date_str = str(today_ticks[first_symbol][0][0])[:10]
-        actual_trade_date = datetime.strptime(actual_trade_date_str, "%Y-%m-%d").date()
-    except:
-        actual_trade_date = latest_q_date
-        actual_trade_date_str = actual_trade_date.strftime("%Y-%m-%d")
-
-    # 2. Fetch Previous Day's Data (Old API)
-    # Search starts strictly from one day BEFORE the actual found session date
-    previous_day_start = actual_trade_date - timedelta(days=1)
-    prev_trade_date, raw_previous_day_data = find_valid_trading_day_data(previous_day_start, CONFIG["strike_api_url_history"])
-    if not raw_previous_day_data: return
-
-    stocks = process_strike_response(raw_today_data, raw_previous_day_data)
-    if not stocks: return
-
-    sector_data = load_json_file(CONFIG["sector_file"])
-    high_low_data = load_json_file(CONFIG["high_low_file"])
-    circuit_data = load_json_file(CONFIG["circuit_limit_file"])
-    historical_data = load_json_file(CONFIG["historical_file"])
-
-    if sector_data: 
-        map_sector_data(stocks, sector_data)
+        historical = load_history(schema="candle_symbols", history_dir=history_dir)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"Could not read history from {history_dir}: {e}")
+        return None
+    if not historical:
+        logging.warning(f"No candle history in {history_dir}; turnover SMA and RS rating are skipped.")
+        return None
+    master = SecurityMaster.load()
+    CorporateActions.load(master=master).adjust_history(historical)
+    index = master.index_history(historical)
+    return {isin: candles[:HISTORY_CANDLES_NEEDED] for isin, candles in index.items()}
+
+def load_history_isolated(history_pool: Optional[ProcessPoolExecutor]) -> Optional[Dict[str, List[list]]]:
+    if history_pool is not None:
+        try:
+            return history_pool.submit(load_history_index, CONFIG["history_dir"]).result()
+        except Exception as e:
+            logging.warning(f"History worker process failed ({e}); parsing in this process.")
+    return load_history_index(CONFIG["history_dir"])
+
+def start_reference_loads(pool: ThreadPoolExecutor, history_pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, Future]:
+    """Starts every load the enrichment stages read besides the live feed."""
+    return {
+        "sector": pool.submit(load_json_file, CONFIG["sector_file"]),
+        "high_low": pool.submit(load_json_file, CONFIG["high_low_file"]),
+        "circuit": pool.submit(load_json_file, CONFIG["circuit_limit_file"]),
+        "master": pool.submit(SecurityMaster.load),
+        "history": pool.submit(load_history_isolated, history_pool),
+    }
+
+def load_reference_data() -> Dict[str, Any]:
+    """All reference inputs, loaded concurrently. Loaded once per stream session."""
+    with ThreadPoolExecutor(max_workers=5, thread_name_prefix="load") as pool, \
+            ProcessPoolExecutor(max_workers=1) as history_pool:
+        return {key: future.result() for key, future in start_reference_loads(pool, history_pool).items()}
+
+def ready(refs: Dict[str, Any], key: str) -> Any:
+    """One reference input, waiting for it if its load is still in flight."""
+    value = refs[key]
+    return value.result() if isinstance(value, Future) else value
+
+def build_universe(live: LiveUniverse, refs: Dict[str, Any]) -> List[StockRecord]:
+    """Shared enrichment of a live universe, whichever source it came from. `refs` values may be Futures."""
+    stocks = live.stocks
+    trade_date_str = live.trade_date.strftime("%Y-%m-%d")
+    if ready(refs, "sector"):
+        map_sector_data(stocks, ready(refs, "sector"))
         stocks = filter_invalid_inecode(stocks)
-    if circuit_data: map_circuit_limits(stocks, circuit_data.get("data", []))
-    if high_low_data: map_52_week_high_low(stocks, high_low_data)
-    if historical_data:
-        calculate_turnover_sma20(stocks, historical_data, actual_trade_date_str)
+    map_circuit_limits(stocks, (ready(refs, "circuit") or {}).get("data", []))
+    master = ready(refs, "master")
+    if ready(refs, "high_low"): map_52_week_high_low(stocks, ready(refs, "high_low"), master)
+    hist_map = ready(refs, "history")
+    if hist_map:
+        calculate_turnover_sma20(stocks, hist_map, trade_date_str, master)
         calculate_tomcap(stocks)
-        calculate_rs_rating(stocks, historical_data, actual_trade_date_str)
-    
-    prepare_and_save_data(stocks)
+        calculate_rs_rating(stocks, hist_map, trade_date_str, master)
+    return stocks
+
+# --- 4. MAIN EXECUTION ---
+
+def session_closed(trade_date_str: str) -> bool:
+    """True once `trade_date_str` is a past session or today's close has passed (IST)."""
+    now = datetime.now(IST)
+    return trade_date_str < now.strftime("%Y-%m-%d") or now.time() >= MARKET_CLOSE
+
+def snapshot_session(records: List[Dict], trade_date_str: str, failures: List[str]):
+    """Records the session's final snapshot after the close, and intraday versions when enabled."""
+    closed = session_closed(trade_date_str)
+    if closed or CONFIG["snapshot_intraday"]:
+        record_snapshot(records, trade_date_str, CONFIG["snapshot_dir"], intraday=CONFIG["snapshot_intraday"],
+                        meta={"quality_failures": failures}, final=closed)
+
+def publish(stocks: List[StockRecord], trade_date_str: str, source: Optional[str] = None,
+            refs: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Writes the universe and the version file once the quality gate passes. After the close
+    the session snapshot is recorded whatever the gate decides (with its failures), so the
+    gate's own reference data never depends on it passing. Each file is replaced atomically. Returns
+    False when the gate blocked the publish.
+    """
+    ordered = sorted(stocks, key=lambda s: s.symbol or "")
+    records = records_to_output(ordered)
+    previous = (None, {})
+    if refs and ready(refs, "history"):
+        previous = previous_session_closes(ordered, ready(refs, "history"), trade_date_str, ready(refs, "master"))
+    passed, failures = passes_quality_gate(records, trade_date_str, source, previous)
+    snapshot_session(records, trade_date_str, failures)
+    if not passed:
+        return False
+    if not prepare_and_save_data(records):
+        return True  # same content: no version bump
     save_json_file({"timestamp": int(time.time() * 1000)}, CONFIG["output_version_file"])
     logging.info(f"✅ Version file created at {CONFIG['output_version_file']}")
-    logging.info("🎯 Pipeline complete.")
+    return True
+
+def run_once(fetcher: HedgedFetcher):
+    start_date = datetime.now(IST).date()
+    logging.info(f"🚀 Starting data pipeline. Current IST date: {start_date.strftime('%Y-%m-%d')}")
+
+    with ThreadPoolExecutor(max_workers=5, thread_name_prefix="load") as pool, \
+            ProcessPoolExecutor(max_workers=1) as history_pool:
+        refs = start_reference_loads(pool, history_pool)  # overlaps the live fetch below
+        live = fetcher.fetch(start_date)
+        if not live:
+            pool.shutdown(cancel_futures=True)
+            return
+        stocks = build_universe(live, refs)
+    if not stocks: return
+    if publish(stocks, live.trade_date.strftime("%Y-%m-%d"), live.source, refs):
+        logging.info("🎯 Pipeline complete.")
+
+def stream(fetcher: HedgedFetcher, interval: int, on_publish: Optional[str] = None,
+           push_every: float = CONFIG["stream_push_every_minutes"], until: Optional[dtime] = None):
+    """
+    Stays resident for today's session (or until `until`, IST): reference data, history and
+    the previous session's closes are loaded once, the live feed is polled every `interval`
+    seconds and each new snapshot is published. `on_publish` is a shell command (e.g. a git
+    commit/push script) started after a publish at most every `push_every` minutes and never
+    while the previous one still runs; it runs once more at the end if anything is unpushed.
+    """
+    now = datetime.now(IST)
+    session_day = now.date()
+    if session_day.weekday() >= 5:
+        logging.info("Weekend — no session to stream.")
+        return
+    opens_at = datetime.combine(session_day, MARKET_OPEN, IST)
+    stops_at = datetime.combine(session_day, MARKET_CLOSE, IST) + timedelta(minutes=CONFIG["stream_close_grace_minutes"])
+    if until is not None:
+        stops_at = min(stops_at, datetime.combine(session_day, until, IST))
+    if now >= stops_at:
+        logging.info(f"Nothing left to stream before {stops_at:%H:%M} IST.")
+        return
+    if now < opens_at:
+        logging.info(f"⏳ Waiting for the open at {opens_at:%H:%M} IST...")
+        time.sleep((opens_at - now).total_seconds())
+
+    logging.info(f"📡 Streaming {session_day} every {interval}s until {stops_at:%H:%M} IST.")
+    refs = load_reference_data()
+    last_payload = None
+    last_stocks = None
+    hook = None
+    hook_started = None
+    unpushed = False
+    published = 0
+
+    while datetime.now(IST) < stops_at:
+        started = time.monotonic()
+        live = fetcher.fetch(session_day, ttl=interval)
+        if live is not None and live.payload is not last_payload:
+            if live.trade_date != session_day:
+                # Before the first tick (or on a failed fetch) the lookback returns an earlier session.
+                if not published and datetime.now(IST) > opens_at + timedelta(minutes=30):
+                    logging.info(f"Feed still reports {live.trade_date} 30 minutes after the open — no session today. Stopping.")
+                    break
+                time.sleep(interval)
+                continue
+            stocks = build_universe(live, refs)
+            if stocks and publish(stocks, live.trade_date.strftime("%Y-%m-%d"), live.source, refs):
+                published += 1
+                last_payload, last_stocks = live.payload, stocks
+                logging.info(f"⚡ Published update {published} from {live.source} in {time.monotonic() - started:.1f}s.")
+                unpushed = True
+                if (on_publish and (hook is None or hook.poll() is not None)
+                        and (hook_started is None or time.monotonic() - hook_started >= push_every * 60)):
+                    hook = subprocess.Popen(shlex.split(on_publish))
+                    hook_started, unpushed = time.monotonic(), False
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    if last_stocks and session_closed(session_day.strftime("%Y-%m-%d")):
+        # The feed may not change after the close, so the last published universe is the session's.
+        ordered = sorted(last_stocks, key=lambda s: s.symbol or "")
+        snapshot_session(records_to_output(ordered), session_day.strftime("%Y-%m-%d"), [])
+        unpushed = True
+    if hook is not None:
+        hook.wait()
+    if on_publish and unpushed:
+        # The closing update (and anything published since the last run) must not be lost.
+        logging.info("📤 Running the publish hook for the final update...")
+        subprocess.run(shlex.split(on_publish))
+    logging.info(f"🎯 Stream complete: {published} updates published.")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build static/data/stock_universe.json from the live feeds.")
+    parser.add_argument("--stream", action="store_true", help="Stay resident during market hours and publish every poll.")
+    parser.add_argument("--interval", type=int, default=CONFIG["stream_interval_seconds"], help="Seconds between polls in --stream mode.")
+    parser.add_argument("--on-publish", help="Shell command to start after a publish in --stream mode.")
+    parser.add_argument("--push-every", type=float, default=CONFIG["stream_push_every_minutes"],
+                        help="Least minutes between two --on-publish runs in --stream mode.")
+    parser.add_argument("--until", type=lambda v: datetime.strptime(v, "%H:%M").time(),
+                        help="Stop streaming at this IST time (HH:MM) instead of after the close.")
+    parser.add_argument("--sources", default=",".join(SOURCE_CONFIG["source_order"]),
+                        help="Comma-separated live sources in order of preference (strike, chartink).")
+    parser.add_argument("--hedge-after", type=float, default=SOURCE_CONFIG["hedge_after_seconds"],
+                        help="Seconds to wait for a source before also asking the next one.")
+    parser.add_argument("--skip-quality-gate", action="store_true", help="Publish even when the data-quality checks fail.")
+    args = parser.parse_args(argv)
+    if args.skip_quality_gate:
+        CONFIG["quality_gate"] = False
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    fetcher = HedgedFetcher([s.strip() for s in args.sources.split(",") if s.strip()], hedge_after=args.hedge_after)
+    if args.stream:
+        stream(fetcher, max(1, args.interval), args.on_publish, max(0.0, args.push_every), args.until)
+    else:
+        run_once(fetcher)
 
 if __name__ == "__main__":
     main()
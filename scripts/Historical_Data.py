@@ -1,10 +1,16 @@
 import os
 import json
-import requests
 import time
 from datetime import datetime, timedelta
 import urllib.parse
 
+from jsonio import load_file, load_file_as, response_json_as
+from history_store import HISTORY_DIR, load_history, save_history, add_turnover, build_entry, merge_candles, normalize_universe, plan_fetch_batches, head_batch_key, last_candle_date, previous_weekday
+from security_master import SecurityMaster
+from corporate_actions import CorporateActions
+from rate_control import limiter_backed_off, limiter_for, paced_get
+from strike import PRICETICKS_URL, find_valid_trading_day_data, extract_daily_bars, session_date_of
+
 # ----------------------------------------
 # CONFIGURATION
 # ----------------------------------------
@@ -16,19 +22,27 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 #INPUT_JSON = os.path.join(BASE_DIR, "../static/data/stock_universe.json")
 INPUT_JSON = os.path.join(BASE_DIR, "Sector_Industry.json")
-OUTPUT_JSON = os.path.join(BASE_DIR, "stock_historical_universe.json")
+OUTPUT_DIR = HISTORY_DIR  # history/<first letter>.json shards + manifest.json (see sharded_store.py)
+# Work log for full fetches: completed symbols are appended in batches so an
+# interrupted run can resume instead of starting over.
+CHECKPOINT_FILE = os.path.join(BASE_DIR, "stock_historical_checkpoint.jsonl")
 
 
 API_BASE = "https://api.upstox.com/v3/historical-candle"
-API_DELAY_SECONDS = 0.2
+API_INITIAL_RATE = 5  # requests/second to start from; adapts to how Upstox responds
+API_MAX_RATE = 25
 RETRY_COUNT = 3
-RETRY_BACKOFF = 2
+RETRY_BACKOFF = 2  # seconds base for retrying failures the limiter does not pace (4xx, bad JSON)
 MAX_CANDLES = 200
 FORCE_FULL_FETCH = "N"  # Set to "Y" to force full fetch on any day
+BULK_EOD_INGEST = "Y"  # Append the latest session's bar for every symbol from one full-market Strike request
+CHECKPOINT_BATCH_SIZE = 100  # Symbols fetched between two work-log writes
+CHECKPOINT_MAX_AGE_DAYS = 7  # Older work logs are discarded and the full fetch restarts
 
-today = datetime.today().date()
+upstox_limiter = limiter_for(API_BASE, initial_rate=API_INITIAL_RATE, max_rate=API_MAX_RATE)
 #is_sunday = datetime.today().weekday() == 6
 force_mode = FORCE_FULL_FETCH.strip().upper() == "Y"
+bulk_mode = BULK_EOD_INGEST.strip().upper() == "Y"
 #full_mode = is_sunday or force_mode
 full_mode = force_mode
 
@@ -36,23 +50,21 @@ full_mode = force_mode
 # HELPERS
 # ----------------------------------------
 
-def load_json_file(filepath):
+def load_json_file(filepath, schema=None):
     if not os.path.exists(filepath):
         return None
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_file_as(filepath, schema) if schema else load_file(filepath)
     except Exception as e:
         print(f"❌ Failed to read {filepath}: {e}")
         return None
 
-def save_json_file(data, filepath):
+def save_history_shards(entries):
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        print(f"✅ Saved to {filepath}")
+        stats = save_history(entries, OUTPUT_DIR)
+        print(f"✅ Saved {len(entries)} symbols to {OUTPUT_DIR} ({stats['written']} of {stats['shards']} shards changed)")
     except Exception as e:
-        print(f"❌ Failed to write {filepath}: {e}")
+        print(f"❌ Failed to write {OUTPUT_DIR}: {e}")
 
 def fetch_candle_data(inecode, from_date, to_date):
     encoded_symbol = urllib.parse.quote(f"NSE_EQ|{inecode}")
@@ -64,32 +76,32 @@ def fetch_candle_data(inecode, from_date, to_date):
                 "Accept": "application/json",
                 "User-Agent": "Mozilla/5.0"
             }
-            response = requests.get(url, headers=headers, timeout=20)
+            response = paced_get(url, limiter=upstox_limiter, headers=headers, timeout=20)
             response.raise_for_status()
 
-            data = response.json()
+            data = response_json_as(response, "upstox_candles")
             candles = data.get("data", {}).get("candles", [])
             if isinstance(candles, list):
                 return candles
         except Exception as e:
             print(f"⚠️ {inecode} attempt {attempt}: {e}")
-            time.sleep(RETRY_BACKOFF ** (attempt - 1))
+            # Throttles, 5xx and network errors are already paced by the limiter (and Retry-After).
+            if attempt < RETRY_COUNT and not limiter_backed_off(e):
+                time.sleep(RETRY_BACKOFF ** (attempt - 1))
 
     print(f"❌ Giving up on {inecode}")
     return []
 
 def build_existing_candle_map(existing_data):
-    return {
-        entry["INECODE"]: entry
-        for entry in existing_data
-        if "INECODE" in entry and "candles" in entry and isinstance(entry["candles"], list)
-    }
-
-def get_latest_date_from_existing(existing_candles):
-    try:
-        return datetime.fromisoformat(existing_candles[0][0]).date()
-    except:
-        return None
+    candle_map = {}
+    for entry in existing_data:
+        if "INECODE" in entry and "candles" in entry and isinstance(entry["candles"], list):
+            previous = candle_map.get(entry["INECODE"])
+            if previous:
+                # Two entries for one security after a re-key: keep a single merged series.
+                entry = dict(entry, candles=merge_candles(entry["candles"], previous["candles"], MAX_CANDLES))
+            candle_map[entry["INECODE"]] = entry
+    return candle_map
 
 def merge_and_trim(existing, new):
     existing_dates = {c[0] for c in existing}
@@ -97,164 +109,306 @@ def merge_and_trim(existing, new):
     combined = filtered_new + existing
     return combined[:MAX_CANDLES]
 
-def add_turnover(candle_list):
-    for candle in candle_list:
-        if len(candle) >= 6 and isinstance(candle[4], (int, float)) and isinstance(candle[5], (int, float)):
-            turnover = round(candle[4] * candle[5] / 1e7, 2)  # Convert to crores
-            candle.append(turnover)
-    return candle_list
-
-# ----------------------------------------
-# LOAD INPUTS
-# ----------------------------------------
-
-print(f"🚀 Starting Historical_Data.py")
-# print(f"📆 Today: {today} | Mode: {'FORCED FULL' if force_mode else 'FULL (Sunday)' if is_sunday else 'INCREMENTAL'}\n")
-
-universe_raw = load_json_file(INPUT_JSON)
-if universe_raw is None:
-    print(f"❌ {INPUT_JSON} not found or unreadable.")
-    exit()
-
-# Normalize and filter entries: keep only valid Symbol + INECODE, skip placeholders like "XXXXXXXXXXXX"
-universe_data = []
-seen_symbols = set()
-for rec in universe_raw:
-    symbol = (rec.get("Symbol") or "").strip().upper()
-    inecode = (rec.get("INECODE") or "").strip().upper()
-
-    # Skip if missing symbol or inecode
-    if not symbol or not inecode:
-        continue
-
-    # Explicitly skip placeholder INECODEs (e.g., "XXXXXXXXXXXX") or non-INE codes
-    if inecode == "XXXXXXXXXXXX":
-        continue
-
-    # Deduplicate by symbol
-    if symbol in seen_symbols:
-        continue
-    seen_symbols.add(symbol)
-
-    universe_data.append({"Symbol": symbol, "INECODE": inecode})
-
-print(f"📥 Loaded {len(universe_data)} valid symbols from {INPUT_JSON} (skipped placeholders/invalid INECODEs).")
-
-historical_data = load_json_file(OUTPUT_JSON) or []
-historical_map = build_existing_candle_map(historical_data)
-
-# Prepare output structure
-new_historical = []
-
-# Find 1 valid stock for incremental detection
-test_ine = None
-test_latest_date = None
-
-if not full_mode:
-    for entry in historical_data:
-        if entry.get("INECODE", "") and entry.get("candles"):
-            test_ine = entry["INECODE"]
-            test_latest_date = get_latest_date_from_existing(entry["candles"])
-            break
-
-    if not test_ine or not test_latest_date:
-        print("❌ Could not determine latest candle date. Run full mode or fix existing data.")
-        exit()
+def ingest_strike_eod(universe_data, historical_map, today):
+    """
+    Appends the latest session's daily bar to every symbol whose history ends exactly one
+    session earlier, using a single full-market Strike priceticks response. Symbols with
+    gaps are left alone so the per-symbol Upstox fetch can backfill them.
+    Returns the number of symbols updated in historical_map.
+    """
+    _, snapshot = find_valid_trading_day_data(today, PRICETICKS_URL)
+    bars = extract_daily_bars(snapshot) if snapshot else {}
+    session = session_date_of(bars)
+    if not session:
+        print("⚠️ Strike snapshot unavailable. Falling back to per-symbol fetches.")
+        return 0
+    session_str = session.strftime('%Y-%m-%d')
+
+    # The previous weekday is the previous session unless it was a holiday; only then ask Strike.
+    heads = {last_candle_date(historical_map.get(s["INECODE"])) for s in universe_data}
+    prev_session = previous_weekday(session)
+    if prev_session not in heads:
+        _, prev_snapshot = find_valid_trading_day_data(session - timedelta(days=1), PRICETICKS_URL)
+        prev_session = session_date_of(extract_daily_bars(prev_snapshot)) if prev_snapshot else None
+
+    print(f"📦 Strike snapshot for {session_str}: {len(bars)} bars (previous session {prev_session})")
+
+    ingested = 0
+    for stock in universe_data:
+        symbol, inecode = stock["Symbol"], stock["INECODE"]
+        entry = historical_map.get(inecode)
+        bar = bars.get(symbol)
+        if not entry or not bar or bar[0][:10] != session_str:
+            continue
+        if last_candle_date(entry) != prev_session:
+            continue
+        candles = merge_and_trim(entry["candles"], add_turnover([list(bar)]))
+        historical_map[inecode] = build_entry(symbol, inecode, candles, entry, today, attempted=True)
+        ingested += 1
+    return ingested
+
+def load_checkpoint(filepath, today):
+    """
+    Replays the full-fetch work log.
+    Returns (completed entries keyed by INECODE, INECODEs that failed and still need a retry).
+    A truncated last line (crash mid-write) is ignored.
+    """
+    completed, failed = {}, set()
+    if not os.path.exists(filepath):
+        return completed, failed
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("type") == "header":
+                started = datetime.strptime(record.get("started", "1970-01-01"), '%Y-%m-%d').date()
+                if (today - started).days > CHECKPOINT_MAX_AGE_DAYS:
+                    print(f"🗑️ Discarding work log started on {started} (older than {CHECKPOINT_MAX_AGE_DAYS} days).")
+                    os.remove(filepath)
+                    return {}, set()
+            elif record.get("type") == "batch":
+                for entry in record.get("entries", []):
+                    completed[entry["INECODE"]] = entry
+                    failed.discard(entry["INECODE"])
+                failed.update(ine for ine in record.get("failures", []) if ine not in completed)
+    return completed, failed
+
+def append_checkpoint(filepath, record):
+    """Appends one record to the work log and forces it to disk."""
+    with open(filepath, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+class CheckpointLog:
+    """Buffers completed entries and failures of a full fetch and appends them to the work log in batches."""
+
+    def __init__(self, filepath, enabled):
+        self.filepath = filepath
+        self.enabled = enabled
+        self.entries, self.failures = [], []
+        self.batch_no = 0
+
+    def add(self, entry):
+        self.entries.append(entry)
+        self._maybe_flush()
+
+    def fail(self, inecode):
+        self.failures.append(inecode)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self.entries) + len(self.failures) >= CHECKPOINT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled or not (self.entries or self.failures):
+            return
+        self.batch_no += 1
+        append_checkpoint(self.filepath, {
+            "type": "batch",
+            "batch": self.batch_no,
+            "entries": self.entries,
+            "failures": self.failures,
+        })
+        print(f"💾 Checkpointed batch {self.batch_no} ({len(self.entries)} done, {len(self.failures)} failed)")
+        self.entries, self.failures = [], []
 
-    from_date = (test_latest_date + timedelta(days=1)).strftime('%Y-%m-%d')
-    to_date = today.strftime('%Y-%m-%d')
+def plan_fetch(universe_data, historical_map, today):
+    """
+    Plans the fetch: INECODE -> (from_date, to_date) for every symbol that needs candles.
+    Returns (planned_ranges, probe_results); probe_results holds candles already fetched while planning.
+    """
+    planned_ranges = {}
+    probe_results = {}
 
-    print(f"🔍 Checking for new data using {test_ine} from {from_date} to {to_date}")
-    test_response = fetch_candle_data(test_ine, from_date, to_date)
-    if not test_response:
-        print("⚠️ No new data. Skipping update for all valid stocks.\n")
+    if full_mode:
+        full_from = (today - timedelta(days=MAX_CANDLES)).strftime('%Y-%m-%d')
+        for stock in universe_data:
+            planned_ranges[stock["INECODE"]] = (full_from, today.strftime('%Y-%m-%d'))
+        return planned_ranges, probe_results
+
+    if bulk_mode:
+        bulk_ingested = ingest_strike_eod(universe_data, historical_map, today)
+        print(f"📦 Bulk-ingested latest session bar for {bulk_ingested} of {len(universe_data)} symbols.")
+
+    fetch_batches = plan_fetch_batches(universe_data, historical_map, today, MAX_CANDLES)
+    for (from_date, to_date), stocks in sorted(fetch_batches.items()):
+        print(f"🗓️ {len(stocks)} stale symbols need {from_date} → {to_date}")
+        for stock in stocks:
+            planned_ranges[stock["INECODE"]] = (from_date, to_date)
+
+    # Probe one up-to-date symbol: if the exchange has nothing new (holiday), skip its whole group.
+    head_key = head_batch_key(fetch_batches, historical_map)
+    if head_key:
+        test_ine = fetch_batches[head_key][0]["INECODE"]
+        print(f"🔍 Checking for new data using {test_ine} from {head_key[0]} to {head_key[1]}")
+        test_response = fetch_candle_data(test_ine, *head_key)
+        if test_response:
+            probe_results[test_ine] = test_response
+        else:
+            print(f"⚠️ No new data. Skipping update for {len(fetch_batches[head_key])} up-to-date stocks.\n")
+            for stock in fetch_batches[head_key]:
+                planned_ranges.pop(stock["INECODE"], None)
+
+    print(f"📋 Fetch plan: {len(planned_ranges)} of {len(universe_data)} symbols need new candles.\n")
+    return planned_ranges, probe_results
 
 # ----------------------------------------
-# MAIN LOOP
+# MAIN
 # ----------------------------------------
 
-updated = 0
-skipped = 0
-failures = []
-
-for idx, stock in enumerate(universe_data, start=1):
-    symbol = stock.get("Symbol", "").strip().upper()
-    inecode = stock.get("INECODE", "").strip().upper()
-
-    if not inecode :
-        print(f"{idx}/{len(universe_data)} ⏭️ Skipping {symbol} (invalid INECODE)")
-        skipped += 1
-        continue
-
-    existing_entry = historical_map.get(inecode)
-    existing_candles = existing_entry["candles"] if existing_entry else []
-
-    if not full_mode and test_response == [] and existing_candles:
-       # print(f"{idx}/{len(universe_data)} ⏭️ Skipping {symbol} — no new data today")
-        skipped += 1
-        new_historical.append({
-            "Symbol": symbol,
-            "INECODE": inecode,
-            "candles": existing_candles
-        })
-        continue
-
-    if full_mode:
-        from_date = (today - timedelta(days=MAX_CANDLES)).strftime('%Y-%m-%d')
-        to_date = today.strftime('%Y-%m-%d')
-    else:
-        latest_date = get_latest_date_from_existing(existing_candles) or (today - timedelta(days=MAX_CANDLES))
-        from_date = (latest_date + timedelta(days=1)).strftime('%Y-%m-%d')
-        to_date = today.strftime('%Y-%m-%d')
-
-    print(f"{idx}/{len(universe_data)} 📡 Fetching candles for {symbol} ({inecode})")
-
-    candles = fetch_candle_data(inecode, from_date, to_date)
-
-    if not candles:
-        print(f"⚠️ No candles for {symbol}")
-        failures.append(inecode)
-        # Still preserve existing if any
-        new_historical.append({
-            "Symbol": symbol,
-            "INECODE": inecode,
-            "candles": existing_candles
-        })
-        continue
+def main():
+    today = datetime.today().date()
+    print(f"🚀 Starting Historical_Data.py")
+    # print(f"📆 Today: {today} | Mode: {'FORCED FULL' if force_mode else 'FULL (Sunday)' if is_sunday else 'INCREMENTAL'}\n")
 
-    # Add turnover to only new candles
-    candles = add_turnover(candles)
+    # ----------------------------------------
+    # LOAD INPUTS
+    # ----------------------------------------
 
-    if full_mode:
-        combined = candles[:MAX_CANDLES]
-    else:
-        combined = merge_and_trim(existing_candles, candles)
+    universe_raw = load_json_file(INPUT_JSON)
+    if universe_raw is None:
+        print(f"❌ {INPUT_JSON} not found or unreadable.")
+        return
 
-    new_historical.append({
-        "Symbol": symbol,
-        "INECODE": inecode,
-        "candles": combined
-    })
+    # Normalize and filter entries: keep only valid Symbol + INECODE, skip placeholders like "XXXXXXXXXXXX"
+    universe_data = normalize_universe(universe_raw)
 
-    updated += 1
-    time.sleep(API_DELAY_SECONDS)
+    print(f"📥 Loaded {len(universe_data)} valid symbols from {INPUT_JSON} (skipped placeholders/invalid INECODEs).")
 
-# ----------------------------------------
-# SAVE OUTPUT
-# ----------------------------------------
+    try:
+        historical_data = load_history(schema="history", history_dir=OUTPUT_DIR) or []
+    except Exception as e:
+        print(f"❌ Failed to read history from {OUTPUT_DIR}: {e}. Aborting so it is not overwritten.")
+        return
 
-save_json_file(new_historical, OUTPUT_JSON)
+    # History stored under a symbol's former name or ISIN moves to its current key instead of being refetched.
+    master = SecurityMaster.load()
+    remapped = master.remap_history(historical_data)
+    if remapped:
+        print(f"🔁 Re-keyed {remapped} history entries to their current symbol/ISIN.")
+    historical_map = build_existing_candle_map(historical_data)
 
-# ----------------------------------------
-# SUMMARY
-# ----------------------------------------
-
-print(f"\n✅ Historical update complete.")
-print(f"🟢 Stocks updated: {updated}")
-print(f"🟡 Skipped (no update needed or invalid INE): {skipped}")
-if failures:
-    print(f"🔴 Failed: {len(failures)} → {', '.join(failures)}")
-else:
-    print("✅ All fetches succeeded.")
+    # Prepare output structure
+    new_historical = []
 
+    # Resume a previously interrupted full fetch from its work log
+    checkpoint_entries, checkpoint_failures = {}, set()
+    if full_mode:
+        checkpoint_entries, checkpoint_failures = load_checkpoint(CHECKPOINT_FILE, today)
+        if checkpoint_entries or checkpoint_failures:
+            print(f"♻️ Resuming full fetch: {len(checkpoint_entries)} symbols already done, "
+                  f"{len(checkpoint_failures)} failures to retry.")
+        else:
+            append_checkpoint(CHECKPOINT_FILE, {"type": "header", "started": today.strftime('%Y-%m-%d')})
+    checkpoint = CheckpointLog(CHECKPOINT_FILE, enabled=full_mode)
+
+    planned_ranges, probe_results = plan_fetch(universe_data, historical_map, today)
+
+    # ----------------------------------------
+    # MAIN LOOP
+    # ----------------------------------------
+
+    updated = 0
+    skipped = 0
+    resumed = 0
+    failures = []
+
+    for idx, stock in enumerate(universe_data, start=1):
+        symbol = stock.get("Symbol", "").strip().upper()
+        inecode = stock.get("INECODE", "").strip().upper()
+
+        if not inecode :
+            print(f"{idx}/{len(universe_data)} ⏭️ Skipping {symbol} (invalid INECODE)")
+            skipped += 1
+            continue
+
+        if full_mode and inecode in checkpoint_entries:
+            resumed += 1
+            new_historical.append(checkpoint_entries[inecode])
+            continue
+
+        existing_entry = historical_map.get(inecode)
+        existing_candles = existing_entry["candles"] if existing_entry else []
+
+        if inecode not in planned_ranges:
+           # print(f"{idx}/{len(universe_data)} ⏭️ Skipping {symbol} — already fresh")
+            skipped += 1
+            new_historical.append(build_entry(symbol, inecode, existing_candles, existing_entry, today))
+            continue
+
+        from_date, to_date = planned_ranges[inecode]
+
+        if inecode in probe_results:
+            candles = probe_results[inecode]
+        else:
+            print(f"{idx}/{len(universe_data)} 📡 Fetching candles for {symbol} ({inecode})")
+            candles = fetch_candle_data(inecode, from_date, to_date)
+
+        if not candles:
+            print(f"⚠️ No candles for {symbol}")
+            failures.append(inecode)
+            checkpoint.fail(inecode)
+            # Still preserve existing if any
+            new_historical.append(build_entry(symbol, inecode, existing_candles, existing_entry, today,
+                                              attempted=True, failed=True))
+            continue
+
+        # Add turnover to only new candles
+        candles = add_turnover(candles)
+
+        if full_mode:
+            combined = candles[:MAX_CANDLES]
+        else:
+            combined = merge_and_trim(existing_candles, candles)
+
+        new_entry = build_entry(symbol, inecode, combined, existing_entry, today, attempted=True)
+        new_historical.append(new_entry)
+        checkpoint.add(new_entry)
+        updated += 1
+
+    checkpoint.flush()
+
+    # ----------------------------------------
+    # SAVE OUTPUT
+    # ----------------------------------------
+
+    save_history_shards(new_historical)
+
+    # Candles stay as fetched; split/bonus gaps are recorded so readers adjust older bars.
+    actions = CorporateActions.load(master=master)
+    detected = actions.detect(new_historical)
+    if detected:
+        actions.save()
+        for action in detected:
+            print(f"✂️ Split/bonus gap in {action['symbol']} on {action['ex_date']} (x{action['factor']:g})")
+
+    # The work log is only needed while the full fetch is incomplete; keep it when
+    # failures remain so the next forced run retries just those symbols.
+    if full_mode and os.path.exists(CHECKPOINT_FILE):
+        if failures:
+            print(f"📝 Keeping work log {CHECKPOINT_FILE}: {len(failures)} symbols still to retry.")
+        else:
+            os.remove(CHECKPOINT_FILE)
+
+    # ----------------------------------------
+    # SUMMARY
+    # ----------------------------------------
+
+    print(f"\n✅ Historical update complete.")
+    print(f"🟢 Stocks updated: {updated}")
+    print(f"🟡 Skipped (no update needed or invalid INE): {skipped}")
+    if resumed:
+        print(f"♻️ Restored from work log: {resumed}")
+    print(f"📶 Upstox pacing: {upstox_limiter}")
+    if failures:
+        print(f"🔴 Failed: {len(failures)} → {', '.join(failures)}")
+    else:
+        print("✅ All fetches succeeded.")
 
+if __name__ == "__main__":
+    main()
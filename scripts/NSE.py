@@ -1,9 +1,12 @@
 import requests
 import csv
-import json
 import os
 import time
 
+from jsonio import dumps
+from http_cache import ValidatorStore
+from security_master import SecurityMaster
+
 URL = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
 OUTPUT = os.path.join(os.path.dirname(__file__), "NSE.json")
 TIMEOUT = (10, 60)  # (connect, read) seconds
@@ -15,15 +18,25 @@ HEADERS = {
     "Accept": "text/csv, */*; q=0.01",
 }
 
-def stream_csv_to_json(url, output_file):
+def stream_csv_to_json(url, output_file, validators):
+    """
+    Converts EQUITY_L.csv to JSON. Returns the records, or None when the listing has not
+    changed since the last processed download (nothing is parsed or written then).
+    """
     print("Downloading (browser-like):", url)
-    resp = requests.get(url, stream=True, headers=HEADERS, timeout=TIMEOUT)
+    # Without an existing output there is nothing to keep, so the request is unconditional.
+    have_output = os.path.exists(output_file)
+    conditional = validators.request_headers(url) if have_output else {}
+    resp = requests.get(url, headers={**HEADERS, **conditional}, timeout=TIMEOUT)
     resp.raise_for_status()
+    if validators.is_unchanged(url, resp) and have_output:
+        print(f"⏭️ EQUITY_L.csv unchanged since last run (HTTP {resp.status_code}). Skipping.")
+        return None
 
-    lines = resp.iter_lines(decode_unicode=True)
+    lines = resp.text.splitlines()
     reader = csv.DictReader(lines)
 
-    total = 0
+    records = []
     with open(output_file, "w", encoding="utf-8") as out:
         out.write("[")
         first = True
@@ -43,19 +56,34 @@ def stream_csv_to_json(url, output_file):
 
             if not first:
                 out.write(",\n")
-            json.dump(record, out, ensure_ascii=False)
+            out.write(dumps(record).decode("utf-8"))
             first = False
-            total += 1
+            records.append(record)
 
         out.write("]")
 
     resp.close()
-    print(f"✅ Done — processed {total} rows. Saved: {os.path.abspath(output_file)}")
+    validators.remember(url)
+    print(f"✅ Done — processed {len(records)} rows. Saved: {os.path.abspath(output_file)}")
+    return records
+
+def update_security_master(records):
+    """Folds today's listing into security_master.json and reports renames / ISIN changes."""
+    master = SecurityMaster.load()
+    events = master.update_from_nse(records)
+    master.save()
+    for event in events:
+        print(f"🔁 {event['type']}: {event['old']} → {event['new']} ({event['isin']})")
+    print(f"✅ Security master holds {len(master)} securities ({len(events)} changes this run).")
 
 if __name__ == "__main__":
     start = time.time()
     try:
-        stream_csv_to_json(URL, OUTPUT)
+        validators = ValidatorStore()
+        records = stream_csv_to_json(URL, OUTPUT, validators)
+        if records is not None:
+            update_security_master(records)
+            validators.save()
     except Exception as e:
         print("ERROR:", e)
     print(f"Time elapsed: {time.time() - start:.2f}s")
@@ -3,8 +3,11 @@ import time
 import os
 import random
 import json
-import csv
-import sys  # [ADDED]
+
+from jsonio import load_file, dump_file, response_json, response_json_as
+from security_master import SecurityMaster
+from http_cache import ValidatorStore
+from rate_control import limiter_backed_off, limiter_for, paced_get
 
 # -------------------------------
 # Configuration & Constants
@@ -13,11 +16,14 @@ API1_URL = "https://api.stockedge.com/Api/SectorDashboardApi/GetAllSectorsWithRe
 API2_BASE_URL = "https://api.stockedge.com/Api/industryDashboardApi/GetIndustryPeerList/{industry_id}?lang=en&pageSize=20&page={page_num}"
 API3_SECURITY_INFO_URL = "https://api.stockedge.com/Api/SecurityDashboardApi/GetLatestSecurityInfo/{security_id}?lang=en"
 
-API_CALL_DELAY = 0.1
+API_INITIAL_RATE = 10  # requests/second to start from; adapts to how StockEdge responds
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 OUTPUT_JSON_FILE = os.path.join(BASE_DIR, "Sector_Industry.json")
 
+PEER_PAGE_SIZE = 20
+UNCHANGED = object()  # fetch_json_data() result for a conditional request the server reports unchanged
+
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/114.0.0.0 Safari/537.36",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/111.0.0.0 Safari/537.36",
@@ -27,27 +33,33 @@ USER_AGENTS = [
 # -------------------------------
 # Helpers
 # -------------------------------
-def fetch_json_data(url, context_message="", max_retries=3, delay_between_retries=1):
+def fetch_json_data(url, context_message="", max_retries=3, delay_between_retries=1, schema=None, validators=None):
+    # All three StockEdge APIs share one host, and so one adaptive limiter.
+    limiter = limiter_for(url, initial_rate=API_INITIAL_RATE)
     for attempt in range(1, max_retries + 1):
         try:
             headers = {"Accept": "application/json", "User-Agent": random.choice(USER_AGENTS)}
-            response = requests.get(url, headers=headers, timeout=20)
+            if validators is not None:
+                headers.update(validators.request_headers(url))
+            response = paced_get(url, limiter=limiter, headers=headers, timeout=20)
             response.raise_for_status()
-            return response.json()
+            if validators is not None and validators.is_unchanged(url, response):
+                return UNCHANGED
+            return response_json_as(response, schema) if schema else response_json(response)
         except requests.exceptions.Timeout:
             print(f"⚠️ [{context_message}] Attempt {attempt}/{max_retries} timed out.")
         except requests.exceptions.RequestException as e:
             print(f"⚠️ [{context_message}] Attempt {attempt}/{max_retries} failed: {e}")
-        if attempt < max_retries:
-            time.sleep(delay_between_retries * attempt)
+            # The limiter paces throttles, 5xx and network errors; anything else waits here.
+            if attempt < max_retries and not limiter_backed_off(e):
+                time.sleep(delay_between_retries * attempt)
     print(f"❌ Giving up on {context_message} after {max_retries} attempts.")
     return None
 
 def load_json_file(file_path):
     if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return load_file(file_path)
         except json.JSONDecodeError:
             print(f"⚠️ Warning: {file_path} contains invalid JSON. Starting fresh.")
         except Exception as e:
@@ -56,8 +68,7 @@ def load_json_file(file_path):
 
 def save_json_file(data, file_path):
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    dump_file(data, file_path)
 
 def map_inecodes_from_json(stocks_data, nse_json_file_path):
     if not os.path.exists(nse_json_file_path):
@@ -66,170 +77,216 @@ def map_inecodes_from_json(stocks_data, nse_json_file_path):
 
     print(f"\n📥 NSE.json found. Starting INECODE mapping...")
 
-    # Load NSE.json once
-    with open(nse_json_file_path, 'r', encoding='utf-8') as f:
-        nse_data = json.load(f)
-
-    # Build dict: trading_symbol → isin
-    symbol_to_inecode = {}
-    for row in nse_data:
-        symbol = row.get("trading_symbol", "").strip().upper()
-        isin = row.get("isin", "").strip().upper()
-        if symbol and isin:
-            symbol_to_inecode[symbol] = isin
+    # Resolve through the security master so symbols StockEdge still lists under a former
+    # name map to the current ISIN (and are renamed) instead of falling out of the universe.
+    # The master never forgets a security, so only ISINs in today's listing are accepted:
+    # delisted and suspended stocks still get the placeholder and are filtered out.
+    # NSE.py folds each changed listing into the master (and skips an unchanged one), so the
+    # master is only read here; a symbol it does not know yet falls back to the listing.
+    nse_data = load_file(nse_json_file_path)
+    master = SecurityMaster.load()
+    listed = SecurityMaster.listed_isins(nse_data)
+    symbol_to_inecode = {row.get("trading_symbol", "").strip().upper(): row.get("isin", "").strip().upper()
+                         for row in nse_data if row.get("trading_symbol") and row.get("isin")}
 
     # Update Sector_Industry.json stocks
     updated_count = 0
+    renamed_count = 0
     for stock in stocks_data:
         symbol = stock.get("Symbol", "").strip().upper()
-        matched_ine = symbol_to_inecode.get(symbol, "")
+        entry = master.by_symbol(symbol)
 
-        if matched_ine:
+        if entry and entry["isin"] in listed:
             # Always update to matched value, even if already present
-            stock["INECODE"] = matched_ine
+            stock["INECODE"] = entry["isin"]
+            if entry["symbol"] != symbol:
+                stock["Symbol"] = entry["symbol"]
+                renamed_count += 1
+            updated_count += 1
+        elif symbol in symbol_to_inecode:
+            stock["INECODE"] = symbol_to_inecode[symbol]
             updated_count += 1
         else:
             # Not found in NSE.json → set to placeholder
             stock["INECODE"] = "XXXXXXXXXXXX"
 
+    master.update_from_stockedge(stocks_data)
+    master.save()  # no-op unless an identity field or StockEdge id changed
 
-    print(f"✅ INECODE mapping complete. Updated {updated_count} entries.")
+    print(f"✅ INECODE mapping complete. Updated {updated_count} entries ({renamed_count} renamed symbols).")
     return stocks_data, updated_count
 
 
-# -------------------------------
-# Accept command-line mode arg
-# -------------------------------
-# [MODIFIED]: Replaced interactive input() with sys.argv
-update_mode = "full"
-print(f"\n🚀 Running Sector_Industry.py in mode: {update_mode.upper()}")
-all_stocks_data = load_json_file(OUTPUT_JSON_FILE)
-security_id_to_stock = {stock["SecurityID"]: stock for stock in all_stocks_data if stock.get("SecurityID")}
+def crawl_sectors(sectors_data, all_stocks_data, processed_security_ids, validators):
+    """
+    Walks every sector/industry peer list (API2) and looks up stocks not seen before (API3),
+    appending them to all_stocks_data. Progress is saved after each sector that added stocks.
+    Returns (new stocks added, peer pages skipped as unchanged).
+    """
+    total_new_stocks_added_this_run = 0
+    unchanged_pages = 0
 
-csv_file_path = os.path.join(BASE_DIR, "NSE.json")
-all_stocks_data, updated_ine_count = map_inecodes_from_json(all_stocks_data, csv_file_path)
-save_json_file(all_stocks_data, OUTPUT_JSON_FILE)
+    for sector in sectors_data:
+        sector_name = sector.get("Name", "N/A")
+        print(f"🔍 Processing Sector: {sector_name}")
+    
+        current_sector_stocks_added = False
+
+        for industry in sector.get("IndustriesForSector", []):
+            industry_id = industry.get("ID")
+            industry_name = industry.get("Name", "N/A")
+            if not industry_id: 
+                print(f"  ⚠️ Skipping industry with no ID in sector {sector_name}.")
+                continue
+            print(f"  🏭 Processing Industry: {industry_name} (ID: {industry_id})")
+            page_num = 1
+
+            while True:
+                api2_url = API2_BASE_URL.format(industry_id=industry_id, page_num=page_num)
+                # Only a page whose stocks are all in the output may be skipped; otherwise fetch it in full.
+                page_meta = validators.meta(api2_url)
+                if not all(sid in processed_security_ids for sid in page_meta.get("ids", [None])):
+                    validators.forget(api2_url)
+                stocks_page_summary = fetch_json_data(api2_url, f"Industry Peers (API2) for {industry_name}, Page {page_num}",
+                                                      schema="stockedge_peers", validators=validators)
+
+                if stocks_page_summary is UNCHANGED:
+                    unchanged_pages += 1
+                    if page_meta.get("items", 0) < PEER_PAGE_SIZE:
+                        break
+                    page_num += 1
+                    if page_num > 50:
+                        print(f"   ⚠️ Exceeded 50 pages for industry {industry_name}. Moving to next.")
+                        break
+                    continue
 
+                if not stocks_page_summary: 
+                    print(f"    ⚠️ No more stocks found for Industry {industry_name} on page {page_num} or fetch failed.")
+                    break
 
-# -------------------------------
-# Full Update Mode
-# -------------------------------
-print(f"🚀 Starting FULL update from API1+API2+API3...")
+                for stock_summary in stocks_page_summary:
+                    if stock_summary.get("Exchange", "NSE") == "BSE": 
+                        continue
+                
+                    security_id_val = stock_summary.get("SecurityID")
+                    stock_name_val = stock_summary.get("Name", "N/A")
+                    mcap_val = stock_summary.get("MCAP", "N/A")
+
+                    if not security_id_val:
+                        print(f"    ⚠️ Skipping stock with no SecurityID in Industry {industry_name}.")
+                        continue
+
+                    if security_id_val in processed_security_ids:
+                        continue
+                
+                    print(f"      ➕ Processing New Stock: {stock_name_val} (SecurityID: {security_id_val})")
+
+                    listing_id_val = "N/A" # Initialize
+                    symbol_val = "N/A"
+                    sme_stock_val = "N/A"
+
+                    api3_url = API3_SECURITY_INFO_URL.format(security_id=security_id_val)
+                    security_info = fetch_json_data(api3_url, f"Security Info (API3) for {security_id_val}")
+
+                    if security_info:
+                        listings_array = security_info.get("Listings", [])
+                        if listings_array:
+                            first_listing = listings_array[0] 
+                            symbol_val = first_listing.get("ListingSymbol", "N/A")
+                            sme_stock_val = "Yes" if first_listing.get("IsSME") else "No" # Or N/A if IsSME is not present
+                            if first_listing.get("IsSME") is None:
+                                sme_stock_val = "N/A"
+
+                            # CORRECTED: Use "ListingID" key as per user feedback and original script's intent
+                            temp_listing_id = first_listing.get("ListingID") 
+                            if temp_listing_id is not None:
+                                listing_id_val = str(temp_listing_id)
+                                # print(f"        Found ListingID: {listing_id_val}.")
+                            # else:
+                                # print(f"        No 'ListingID' field in first listing for SecurityID {security_id_val}.")
+                
+                    stock_data_entry = {
+                        "SecurityID": security_id_val,
+                        "ListingID": listing_id_val, # This is now the primary ID for API4
+                        "SME Stock?": sme_stock_val,
+                        "Sector Name": sector_name,
+                        "Industry Name": industry_name,
+                        "Industry ID": industry_id,
+                        "Symbol": symbol_val,
+                        "Stock Name": stock_name_val,
+                        "Market Cap": mcap_val
+                    }
+                
+                    all_stocks_data.append(stock_data_entry)
+                    processed_security_ids.add(security_id_val)
+                    total_new_stocks_added_this_run += 1
+                    current_sector_stocks_added = True
+
+                page_ids = [s.get("SecurityID") for s in stocks_page_summary
+                            if s.get("SecurityID") and s.get("Exchange", "NSE") != "BSE"]
+                validators.remember(api2_url, items=len(stocks_page_summary), ids=page_ids)
+
+                if not stocks_page_summary or len(stocks_page_summary) < PEER_PAGE_SIZE : 
+                     break
+                page_num += 1
+                if page_num > 50: 
+                    print(f"   ⚠️ Exceeded 50 pages for industry {industry_name}. Moving to next.")
+                    break
+
+        if current_sector_stocks_added:
+            save_json_file(all_stocks_data, OUTPUT_JSON_FILE)
+            validators.save()
+            print(f"  💾 Saved progress to {OUTPUT_JSON_FILE} after Sector: {sector_name}\n")
+        else:
+            print(f"  ✅ No new stocks added for sector: {sector_name}. JSON file not re-saved for this sector.\n")
 
-all_stocks_data = load_json_file(OUTPUT_JSON_FILE)
-processed_security_ids = {stock.get("SecurityID") for stock in all_stocks_data if stock.get("SecurityID")}
-print(f"Found {len(processed_security_ids)} already processed SecurityIDs in {OUTPUT_JSON_FILE}.")
+    return total_new_stocks_added_this_run, unchanged_pages
 
-sectors_data = fetch_json_data(API1_URL, "Sectors (API1)")
-time.sleep(API_CALL_DELAY)
 
-if not sectors_data:
-    print("❌ No sectors found from API1. Aborting."); exit()
+def main():
+    # -------------------------------
+    # Accept command-line mode arg
+    # -------------------------------
+    # [MODIFIED]: Replaced interactive input() with sys.argv
+    update_mode = "full"
+    print(f"\n🚀 Running Sector_Industry.py in mode: {update_mode.upper()}")
+    all_stocks_data = load_json_file(OUTPUT_JSON_FILE)
 
-total_new_stocks_added_this_run = 0
+    csv_file_path = os.path.join(BASE_DIR, "NSE.json")
+    all_stocks_data, updated_ine_count = map_inecodes_from_json(all_stocks_data, csv_file_path)
+    save_json_file(all_stocks_data, OUTPUT_JSON_FILE)
 
-for sector in sectors_data:
-    sector_name = sector.get("Name", "N/A")
-    print(f"🔍 Processing Sector: {sector_name}")
-    
-    current_sector_stocks_added = False
-
-    for industry in sector.get("IndustriesForSector", []):
-        industry_id = industry.get("ID")
-        industry_name = industry.get("Name", "N/A")
-        if not industry_id: 
-            print(f"  ⚠️ Skipping industry with no ID in sector {sector_name}.")
-            continue
-        print(f"  🏭 Processing Industry: {industry_name} (ID: {industry_id})")
-        page_num = 1
-
-        while True:
-            api2_url = API2_BASE_URL.format(industry_id=industry_id, page_num=page_num)
-            stocks_page_summary = fetch_json_data(api2_url, f"Industry Peers (API2) for {industry_name}, Page {page_num}")
-            time.sleep(API_CALL_DELAY)
-            
-            if not stocks_page_summary: 
-                print(f"    ⚠️ No more stocks found for Industry {industry_name} on page {page_num} or fetch failed.")
-                break
-
-            for stock_summary in stocks_page_summary:
-                if stock_summary.get("Exchange", "NSE") == "BSE": 
-                    continue
-                
-                security_id_val = stock_summary.get("SecurityID")
-                stock_name_val = stock_summary.get("Name", "N/A")
-                mcap_val = stock_summary.get("MCAP", "N/A")
 
-                if not security_id_val:
-                    print(f"    ⚠️ Skipping stock with no SecurityID in Industry {industry_name}.")
-                    continue
+    # -------------------------------
+    # Full Update Mode
+    # -------------------------------
+    print(f"🚀 Starting FULL update from API1+API2+API3...")
 
-                if security_id_val in processed_security_ids:
-                    continue
-                
-                print(f"      ➕ Processing New Stock: {stock_name_val} (SecurityID: {security_id_val})")
-
-                listing_id_val = "N/A" # Initialize
-                symbol_val = "N/A"
-                sme_stock_val = "N/A"
-
-                api3_url = API3_SECURITY_INFO_URL.format(security_id=security_id_val)
-                security_info = fetch_json_data(api3_url, f"Security Info (API3) for {security_id_val}")
-                time.sleep(API_CALL_DELAY)
-
-                if security_info:
-                    listings_array = security_info.get("Listings", [])
-                    if listings_array:
-                        first_listing = listings_array[0] 
-                        symbol_val = first_listing.get("ListingSymbol", "N/A")
-                        sme_stock_val = "Yes" if first_listing.get("IsSME") else "No" # Or N/A if IsSME is not present
-                        if first_listing.get("IsSME") is None:
-                            sme_stock_val = "N/A"
-
-                        # CORRECTED: Use "ListingID" key as per user feedback and original script's intent
-                        temp_listing_id = first_listing.get("ListingID") 
-                        if temp_listing_id is not None:
-                            listing_id_val = str(temp_listing_id)
-                            # print(f"        Found ListingID: {listing_id_val}.")
-                        # else:
-                            # print(f"        No 'ListingID' field in first listing for SecurityID {security_id_val}.")
-                
-                stock_data_entry = {
-                    "SecurityID": security_id_val,
-                    "ListingID": listing_id_val, # This is now the primary ID for API4
-                    "SME Stock?": sme_stock_val,
-                    "Sector Name": sector_name,
-                    "Industry Name": industry_name,
-                    "Industry ID": industry_id,
-                    "Symbol": symbol_val,
-                    "Stock Name": stock_name_val,
-                    "Market Cap": mcap_val
-                }
-                
-                all_stocks_data.append(stock_data_entry)
-                processed_security_ids.add(security_id_val)
-                total_new_stocks_added_this_run += 1
-                current_sector_stocks_added = True
-            
-            if not stocks_page_summary or len(stocks_page_summary) < 20 : 
-                 break
-            page_num += 1
-            if page_num > 50: 
-                print(f"   ⚠️ Exceeded 50 pages for industry {industry_name}. Moving to next.")
-                break
-
-    if current_sector_stocks_added:
-        save_json_file(all_stocks_data, OUTPUT_JSON_FILE)
-        print(f"  💾 Saved progress to {OUTPUT_JSON_FILE} after Sector: {sector_name}\n")
-    else:
-        print(f"  ✅ No new stocks added for sector: {sector_name}. JSON file not re-saved for this sector.\n")
+    all_stocks_data = load_json_file(OUTPUT_JSON_FILE)
+    processed_security_ids = {stock.get("SecurityID") for stock in all_stocks_data if stock.get("SecurityID")}
+    print(f"Found {len(processed_security_ids)} already processed SecurityIDs in {OUTPUT_JSON_FILE}.")
 
-    
+    # Peer pages are fetched conditionally; a page StockEdge reports unchanged is skipped unparsed.
+    validators = ValidatorStore()
+
+    sectors_data = fetch_json_data(API1_URL, "Sectors (API1)")
+
+    if not sectors_data:
+        print("❌ No sectors found from API1. Aborting."); return
+
+    total_new_stocks_added_this_run, unchanged_pages = crawl_sectors(
+        sectors_data, all_stocks_data, processed_security_ids, validators)
+
+    print(f"\n✅ Sector_Industry.py script completed.")
+    print(f"Total new stocks added in this run: {total_new_stocks_added_this_run}.")
+    print(f"Peer pages unchanged since last run (skipped): {unchanged_pages}.")
+    print(f"StockEdge pacing: {limiter_for(API1_URL)}")
+    csv_file_path = os.path.join(BASE_DIR, "NSE.json")
+    all_stocks_data, updated_ine_count = map_inecodes_from_json(all_stocks_data, csv_file_path)
+    save_json_file(all_stocks_data, OUTPUT_JSON_FILE)
+    validators.save()
+    print(f"Total stocks in {OUTPUT_JSON_FILE}: {len(all_stocks_data)}.")
+    print(f"File saved at: {OUTPUT_JSON_FILE}")
 
-print(f"\n✅ Sector_Industry.py script completed.")
-print(f"Total new stocks added in this run: {total_new_stocks_added_this_run}.")
-csv_file_path = os.path.join(BASE_DIR, "NSE.json")
-all_stocks_data, updated_ine_count = map_inecodes_from_json(all_stocks_data, csv_file_path)
-save_json_file(all_stocks_data, OUTPUT_JSON_FILE)
-print(f"Total stocks in {OUTPUT_JSON_FILE}: {len(all_stocks_data)}.")
-print(f"File saved at: {OUTPUT_JSON_FILE}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import base64
+import logging
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from jsonio import dumps
+from query_store import QueryStore
+from sharded_store import write_if_changed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Hover previews for the stock universe table. The last `window` closes of every symbol
+# (split/bonus-adjusted, from the query store) are downsampled with Largest-Triangle-Three-
+# Buckets to `points` points and quantized to bytes, so the page draws a preview from one
+# small local file and only loads the TradingView widget on click.
+#
+# sparklines.json: {"as_of", "window", "points", "levels",
+#                   "series": {symbol: [low, high, offset, base64(x bytes + y bytes)]}}
+# x is the session index inside the window (0 = oldest); y is the close quantized between
+# low and high to 0..levels. Sessions before `offset` predate the symbol's history.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DATA_DIR = os.path.join(SCRIPT_DIR, "..", "static", "data")
+
+CONFIG = {
+    "output_file": os.path.join(STATIC_DATA_DIR, "sparklines.json"),
+    "window": 120,      # closes per symbol (x must fit in a byte)
+    "points": 40,       # points kept after downsampling
+    "levels": 255,      # quantization levels (y must fit in a byte)
+    "min_closes": 20,   # symbols with a shorter history get no sparkline
+}
+
+# -------------------------------
+# SERIES
+# -------------------------------
+
+def recent_closes(closes: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (S, window) closes per symbol from a (D, S) panel, forward-filled over missing sessions,
+    and the index of each symbol's first close in the window. Leading gaps repeat that close.
+    """
+    recent = np.asarray(closes[-window:], dtype=np.float64).T
+    filled = np.isfinite(recent)
+    cols = np.where(filled, np.arange(recent.shape[1]), 0)
+    np.maximum.accumulate(cols, axis=1, out=cols)
+    recent = np.take_along_axis(recent, cols, axis=1)
+    offset = np.where(filled.any(axis=1), filled.argmax(axis=1), recent.shape[1])
+    first = recent[np.arange(len(recent)), np.minimum(offset, recent.shape[1] - 1)]
+    recent = np.where(np.arange(recent.shape[1]) < offset[:, None], first[:, None], recent)
+    return recent, offset
+
+def lttb(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets over every row of an (S, L) matrix at once. Returns the
+    (S, points) column indices kept; the first and last sample are always kept.
+    """
+    rows, length = y.shape
+    if points >= length or points < 3:
+        return np.tile(np.arange(length), (rows, 1))
+    x = np.arange(length, dtype=np.float64)
+    row = np.arange(rows)
+    every = (length - 2) / (points - 2)
+    kept = np.zeros((rows, points), dtype=np.int64)
+    kept[:, -1] = length - 1
+    a = np.zeros(rows, dtype=np.int64)
+    for i in range(points - 2):
+        # Average of the next bucket is the third triangle vertex.
+        avg_start, avg_end = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, length)
+        avg_x, avg_y = x[avg_start:avg_end].mean(), y[:, avg_start:avg_end].mean(axis=1)
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        ax, ay = x[a], y[row, a]
+        area = np.abs((ax - avg_x)[:, None] * (y[:, start:end] - ay[:, None])
+                      - (ax[:, None] - x[start:end]) * (avg_y - ay)[:, None])
+        a = start + area.argmax(axis=1)
+        kept[:, i + 1] = a
+    return kept
+
+def build_bundle(dates: np.ndarray, symbols: np.ndarray, closes: np.ndarray) -> Dict[str, Any]:
+    window, points, levels = CONFIG["window"], CONFIG["points"], CONFIG["levels"]
+    recent, offset = recent_closes(closes, window)
+    usable = (recent.shape[1] - offset >= CONFIG["min_closes"]) & np.isfinite(recent).all(axis=1)
+    recent, offset, symbols = recent[usable], offset[usable], np.asarray(symbols)[usable]
+
+    kept = lttb(recent, points)
+    y = np.take_along_axis(recent, kept, axis=1)
+    low, high = y.min(axis=1), y.max(axis=1)
+    span = np.where(high > low, high - low, 1.0)
+    quantized = np.rint((y - low[:, None]) / span[:, None] * levels).astype(np.uint8)
+    packed = np.concatenate([kept.astype(np.uint8), quantized], axis=1)
+
+    series = {
+        str(symbol): [round(float(lo), 2), round(float(hi), 2), int(off), base64.b64encode(row.tobytes()).decode("ascii")]
+        for symbol, lo, hi, off, row in zip(symbols, low, high, offset, packed)
+    }
+    return {"as_of": str(dates[-1]) if len(dates) else None, "window": int(recent.shape[1]),
+            "points": int(kept.shape[1]), "levels": levels, "series": series}
+
+# -------------------------------
+# MAIN EXECUTION
+# -------------------------------
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if CONFIG["window"] > 256 or CONFIG["levels"] > 255:
+        logging.error("❌ window and levels must fit in a byte.")
+        sys.exit(1)
+    dates, symbols, closes = QueryStore.open().history_panel("close")
+    if len(dates) < CONFIG["min_closes"]:
+        logging.error("❌ Candle history is too short for sparklines.")
+        sys.exit(1)
+
+    bundle = build_bundle(dates, symbols, closes)
+    os.makedirs(os.path.dirname(CONFIG["output_file"]), exist_ok=True)
+    changed = write_if_changed(dumps(bundle), CONFIG["output_file"])
+    size_kb = os.path.getsize(CONFIG["output_file"]) / 1024
+    logging.info(f"✅ {len(bundle['series'])} sparklines as of {bundle['as_of']} ({size_kb:.0f} KB)"
+                 + ("" if changed else " — unchanged"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Before/after benchmark for the JSON layer: stdlib json vs the jsonio backend on every
+pipeline artifact present in the checkout.
+
+    python scripts/benchmarks/bench_json.py [--repeat 5]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import timeit
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SCRIPTS_DIR)
+
+import jsonio  # noqa: E402
+
+ARTIFACTS = [
+    os.path.join(SCRIPTS_DIR, "history", "r.json"),  # one history shard
+    os.path.join(SCRIPTS_DIR, "Sector_Industry.json"),
+    os.path.join(SCRIPTS_DIR, "NSE.json"),
+    os.path.join(SCRIPTS_DIR, "52_wk_High_Low.json"),
+    os.path.join(SCRIPTS_DIR, "circuit_limits.json"),
+    os.path.join(SCRIPTS_DIR, "..", "static", "data", "stock_universe.json"),
+]
+
+def stdlib_load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def stdlib_dump(data, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+def best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"jsonio backend: {jsonio.BACKEND}")
+    print(f"{'artifact':32} {'size':>8} {'load std':>9} {'load new':>9} {'dump std':>9} {'dump new':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.json")
+        for path in ARTIFACTS:
+            if not os.path.exists(path):
+                continue
+            data = stdlib_load(path)
+            assert jsonio.load_file(path) == data
+            size_kb = os.path.getsize(path) / 1024
+            load_std = best(lambda: stdlib_load(path), args.repeat)
+            load_new = best(lambda: jsonio.load_file(path), args.repeat)
+            dump_std = best(lambda: stdlib_dump(data, out), args.repeat)
+            dump_new = best(lambda: jsonio.dump_file(data, out), args.repeat)
+            print(f"{os.path.basename(path):32} {size_kb:7.0f}K {load_std:8.1f}ms {load_new:8.1f}ms "
+                  f"{dump_std:8.1f}ms {dump_new:8.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmarks live_sources.process_strike_response (the shared Strike decoder) against the
+former per-symbol dict(zip()) loop on a synthetic 5k-symbol last-traded-state payload.
+Both paths produce the same StockRecord list, value for value and type for type.
+
+    python scripts/benchmarks/bench_strike_decoder.py [--symbols 5000] [--repeat 20]
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stock_record import StockRecord  # noqa: E402
+from live_sources import process_strike_response  # noqa: E402
+
+TODAY_FIELDS = ["dateTime", "dayOpen", "dayHigh", "dayLow", "dayClose", "dayVolume",
+                "circuitLimit", "lastTradedPrice", "openInterest", "totalBuyQty", "totalSellQty"]
+
+def build_fixture(n_symbols: int, seed: int = 7):
+    rng = random.Random(seed)
+    today_ticks, prev_ticks = {}, {}
+    for i in range(n_symbols):
+        symbol = f"SYM{i:05d}"
+        prev_close = round(rng.uniform(5, 5000), 2)
+        close = round(prev_close * rng.uniform(0.9, 1.1), 2)
+        if rng.random() < 0.2:  # whole-rupee prices arrive as JSON integers and must stay integers
+            close = int(close)
+        today_ticks[symbol] = [["2026-10-19T15:30:00+05:30", prev_close, round(close * 1.02, 2), round(close * 0.98, 2), close,
+                                rng.randint(1_000, 5_000_000), rng.choice([2, 5, 10, 20]), close, 0, 0, 0]]
+        if rng.random() > 0.02:  # a few symbols without history exercise the open-vs-close fallback
+            prev_ticks[symbol] = [["2026-10-16T00:00:00+05:30", prev_close, prev_close, prev_close, prev_close, 1000]]
+    today = {"data": {"current": {"fields": TODAY_FIELDS, "ticks": today_ticks}}}
+    previous = {"data": {"ticks": prev_ticks}}
+    return today, previous
+
+def legacy_loop(today_data, previous_day_data):
+    """The per-row implementation previously used by process_strike_response."""
+    previous_day_closes = {}
+    for symbol, tick_data in previous_day_data.get("data", {}).get("ticks", {}).items():
+        if tick_data and isinstance(tick_data, list) and isinstance(tick_data[0], list) and len(tick_data[0]) > 4:
+            previous_day_closes[symbol] = tick_data[0][4]
+
+    inner = today_data["data"]["current"]
+    fields, today_ticks = inner["fields"], inner["ticks"]
+    stocks = []
+    for symbol, tick_data in today_ticks.items():
+        if not tick_data or not isinstance(tick_data, list) or not isinstance(tick_data[0], list):
+            continue
+        raw = dict(zip(fields, tick_data[0]))
+        stock = StockRecord(
+            symbol,
+            close=raw.get("dayClose", raw.get("close")),
+            high=raw.get("dayHigh", raw.get("high")),
+            low=raw.get("dayLow", raw.get("low")),
+            volume=raw.get("dayVolume", raw.get("volume")),
+            open=raw.get("dayOpen", raw.get("open")),
+            circuit_limit=raw.get("circuitLimit"),
+        )
+        close, prev = stock.close, previous_day_closes.get(symbol)
+        if prev is not None and isinstance(close, (int, float)) and prev != 0:
+            stock.change_pct = (close - prev) / prev * 100
+        elif isinstance(stock.open, (int, float)) and isinstance(close, (int, float)) and stock.open != 0:
+            stock.change_pct = (close - stock.open) / stock.open * 100
+        else:
+            stock.change_pct = 0.0
+        stocks.append(stock)
+    return stocks
+
+def same_record(a: StockRecord, b: StockRecord) -> bool:
+    for attr in ("symbol", "close", "high", "low", "volume", "open", "circuit_limit"):
+        x, y = getattr(a, attr), getattr(b, attr)
+        if x != y or type(x) is not type(y):
+            return False
+    return abs(a.change_pct - b.change_pct) < 1e-9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    today, previous = build_fixture(args.symbols)
+    logging.disable(logging.INFO)  # process_strike_response logs every call
+
+    # Both paths must agree (including int vs float) before their speed means anything.
+    legacy = legacy_loop(today, previous)
+    decoded = process_strike_response(today, previous)
+    assert len(decoded) == len(legacy)
+    assert all(same_record(a, b) for a, b in zip(decoded, legacy))
+
+    t_legacy = min(timeit.repeat(lambda: legacy_loop(today, previous), number=1, repeat=args.repeat))
+    t_decoder = min(timeit.repeat(lambda: process_strike_response(today, previous), number=1, repeat=args.repeat))
+    print(f"symbols: {args.symbols}")
+    print(f"legacy dict(zip) loop : {t_legacy * 1000:8.2f} ms")
+    print(f"shared decoder        : {t_decoder * 1000:8.2f} ms")
+    print(f"speed-up              : {t_legacy / t_decoder:8.2f}x")
+
+if __name__ == "__main__":
+    main()
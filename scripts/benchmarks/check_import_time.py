@@ -0,0 +1,94 @@
+"""
+Startup-time budget for the pipeline scripts. Each module is imported in a fresh interpreter
+under `python -X importtime`; the check fails when its cumulative import time (best of
+--repeat runs) exceeds the budget, or when it pulls in a dependency that must stay lazy.
+tests/test_import_time.py enforces the budgets; this script prints the full report.
+
+    python scripts/benchmarks/check_import_time.py [--repeat 5] [--scale 1.0]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Budgets in milliseconds: measured on a CI runner plus headroom. requests (~140ms) and
+# numpy (~110ms) dominate and are needed by every fetching script; everything else should
+# be small. Raise a budget only together with the change that justifies it.
+BUDGETS_MS = {
+    "jsonio": 80,
+    "stock_record": 40,
+    "security_master": 90,
+    "corporate_actions": 200,
+    "http_cache": 90,
+    "snapshot_store": 100,
+    "quality_gate": 200,
+    "rate_control": 220,
+    "strike": 400,
+    "NSE": 300,
+    "Sector_Industry": 320,
+    "circuitlimit": 420,
+    "Historical_Data": 450,
+    "Daily_Data": 450,
+    "Dummy": 450,  # a thin wrapper over Daily_Data
+    "live_sources": 420,
+    "Custom_Indices": 400,
+    "Sparklines": 400,
+}
+
+# Imported only by the code path that uses them, never at module import.
+LAZY_MODULES = {"pandas", "bs4", "pytz"}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def measure(module):
+    """(cumulative µs of `module`, set of every module it imported) from one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    cumulative, imported = None, set()
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name.split(".")[0])
+        if name == module and len(match.group(3)) == 1:  # top level, not a nested import
+            cumulative = int(match.group(2))
+    return cumulative, imported
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on every budget (slow machines).")
+    parser.add_argument("modules", nargs="*", default=sorted(BUDGETS_MS))
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':18} {'import':>9} {'budget':>8}")
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best_ms = min(us for us, _ in runs) / 1000
+        budget = BUDGETS_MS[module] * args.scale
+        eager = sorted(LAZY_MODULES & runs[0][1])
+        status = "ok"
+        if best_ms > budget:
+            status = "OVER BUDGET"
+            failures.append(f"{module}: {best_ms:.0f}ms > {budget:.0f}ms")
+        if eager:
+            status = f"imports {', '.join(eager)}"
+            failures.append(f"{module}: imports {', '.join(eager)} at startup")
+        print(f"{module:18} {best_ms:7.1f}ms {budget:6.0f}ms  {status}")
+
+    if failures:
+        print("\n❌ Startup budget exceeded:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\n✅ All pipeline modules within their startup budget.")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 import os
 import json
+import math
 import logging
 import requests
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 
+from jsonio import dump_file, response_json_as
+from strike import IST, LAST_TRADED_STATE_URL, fetch_snapshot, get_fields_and_ticks
+
 # -------------------------------
 # CONFIGURATION
 # -------------------------------
@@ -29,8 +33,7 @@ def save_json_file(data: Any, path: str):
     """Saves data to a JSON file, creating the directory if needed."""
     try:
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        dump_file(data, path)
     except IOError as e:
         logging.error(f"Error: Failed to write to file {path}: {e}")
         raise  # Re-raise the exception to stop the script if saving fails
@@ -40,11 +43,24 @@ def save_json_file(data: Any, path: str):
 # -------------------------------
 
 def fetch_data_from_api() -> Optional[Dict[str, Any]]:
-    """Fetches raw data from the API endpoint."""
+    """
+    Uses today's full-universe Strike snapshot (from the shared cache when Daily_Data has
+    already downloaded it today, else fetched now) when it carries circuit bands; otherwise
+    fetches the dedicated endpoint.
+    """
+    try:
+        snapshot = fetch_snapshot(LAST_TRADED_STATE_URL, datetime.now(IST).strftime('%Y-%m-%d'))
+        fields, ticks = get_fields_and_ticks(snapshot)
+        if ticks and "circuitLimit" in fields and "dateTime" in fields:
+            return snapshot
+        logging.info("Shared snapshot has no circuit bands; using the dedicated endpoint.")
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Shared snapshot unavailable ({e}); using the dedicated endpoint.")
+
     try:
         response = requests.get(CONFIG["api_url"], timeout=CONFIG["request_timeout"])
         response.raise_for_status()
-        return response.json()
+        return response_json_as(response, "strike")
     except requests.exceptions.RequestException as e:
         logging.error(f"Error: API request failed: {e}")
     except json.JSONDecodeError:
@@ -54,27 +70,25 @@ def fetch_data_from_api() -> Optional[Dict[str, Any]]:
 def process_api_response(api_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Processes the raw API response into the desired final format."""
     try:
-        current_data = api_data["data"]["current"]
-        fields = current_data["fields"]
-        ticks = current_data["ticks"]
-
+        # Two fields per symbol: a plain loop is as fast as the column decoder here, without the arrays.
+        fields, ticks = get_fields_and_ticks(api_data)
+        if "circuitLimit" not in fields or "dateTime" not in fields:
+            raise ValueError(f"circuitLimit/dateTime missing from fields {fields}")
         band_index = fields.index("circuitLimit")
         date_index = fields.index("dateTime")
 
         processed_data_list: List[Dict[str, Any]] = []
         source_date: Optional[str] = None
-
         for symbol, values_list in ticks.items():
-            if values_list and values_list[0]:
+            if values_list and isinstance(values_list[0], list) and len(values_list[0]) > max(band_index, date_index):
                 latest_tick = values_list[0]
-                if len(latest_tick) > max(band_index, date_index):
-                    processed_data_list.append({
-                        "SYMBOL": symbol,
-                        "BAND": latest_tick[band_index]
-                    })
-                    if source_date is None:
-                        source_date = latest_tick[date_index]
-        
+                band = latest_tick[band_index]
+                if band is None or (isinstance(band, float) and math.isnan(band)):
+                    continue  # no band published; Daily_Data falls back to 0 (unbanded) for missing symbols
+                processed_data_list.append({"SYMBOL": symbol, "BAND": band})
+                if source_date is None:
+                    source_date = latest_tick[date_index]
+
         if not processed_data_list:
             logging.warning("Warning: No stock data was found in the API response.")
             return None
@@ -84,7 +98,7 @@ def process_api_response(api_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
 
         return {
             "source_date": source_date,
-            "last_updated": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "last_updated": datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S'),
             "data": processed_data_list
         }
 
@@ -0,0 +1,282 @@
+import os
+import re
+import csv
+import sys
+import argparse
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from jsonio import dump_file, dumps, load_file
+from security_master import SecurityMaster
+from history_store import HISTORY_DIR, load_history
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Splits and bonus issues for stock_historical_universe.json. The history store keeps candles
+# exactly as fetched; the factors recorded here are applied when the history is read, so an
+# action found today repairs every older bar without refetching the symbol.
+#
+# One entry per (isin, ex_date): {"isin", "symbol", "ex_date", "factor", "kind", "source"}.
+# `factor` is the share-count multiplier (5 for a 10 -> 2 face value split, 2 for a 1:1
+# bonus). Bars before ex_date have prices divided and volume multiplied by it; turnover
+# (close x volume) is unchanged. An entry with factor 1 marks a detected gap as a real move.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ACTIONS_FILE = os.path.join(SCRIPT_DIR, "corporate_actions.json")
+
+# Candle row: [timestamp, open, high, low, close, volume, oi, turnover]
+PRICE_COLUMNS = (1, 2, 3, 4)
+VOLUME_COLUMN = 5
+
+# Factors the detector looks for: common splits and bonus ratios a:b -> (a + b) / b.
+# Smaller factors (1:4 bonus = 1.25) are indistinguishable from a circuit move and must be ingested.
+DETECT_FACTORS = (1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 6.0, 10.0, 20.0)
+DETECT_OPEN_TOLERANCE = 0.04    # |previous close / open / factor - 1| at the ex-date open
+DETECT_CLOSE_TOLERANCE = 0.25   # same for the ex-date close, allowing for the day's own move
+
+# NSE corporate-action PURPOSE texts.
+_SPLIT = re.compile(r"from\s+r[es]\.?\s*([\d.]+).*?to\s+r[es]\.?\s*([\d.]+)", re.IGNORECASE)
+_BONUS = re.compile(r"bonus\s*(\d+)\s*:\s*(\d+)", re.IGNORECASE)
+
+def _bar_date(candle: list) -> str:
+    return str(candle[0])[:10]
+
+def parse_purpose(purpose: str) -> Optional[Tuple[str, float]]:
+    """(kind, factor) of an NSE PURPOSE text such as "Bonus 1:1" or "Face Value Split ... From Rs 10/- ... To Rs 2/-"."""
+    if "split" in purpose.lower():
+        match = _SPLIT.search(purpose)
+        if match and float(match.group(2)) > 0:
+            return "split", float(match.group(1)) / float(match.group(2))
+    match = _BONUS.search(purpose)
+    if match and int(match.group(2)) > 0:
+        return "bonus", (int(match.group(1)) + int(match.group(2))) / int(match.group(2))
+    return None
+
+def close_matrix(history: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]], np.ndarray, np.ndarray]:
+    """
+    (dates ascending, entries, open, close) with one (D, S) float64 column per entry holding
+    candles. Missing bars are NaN.
+    """
+    entries = [e for e in history if e.get("candles")]
+    dates = sorted({_bar_date(c) for e in entries for c in e["candles"] if c})
+    row_of = {d: i for i, d in enumerate(dates)}
+    opens = np.full((len(dates), len(entries)), np.nan)
+    closes = np.full((len(dates), len(entries)), np.nan)
+    for col, entry in enumerate(entries):
+        for candle in entry["candles"]:
+            if len(candle) > 4 and isinstance(candle[1], (int, float)) and isinstance(candle[4], (int, float)):
+                row = row_of[_bar_date(candle)]
+                opens[row, col], closes[row, col] = candle[1], candle[4]
+    return dates, entries, opens, closes
+
+# -------------------------------
+# ACTIONS
+# -------------------------------
+
+class CorporateActions:
+    """In-memory view of corporate_actions.json, keyed by the security's current ISIN."""
+
+    def __init__(self, entries: Optional[List[Dict[str, Any]]] = None, master: Optional[SecurityMaster] = None):
+        self.entries: List[Dict[str, Any]] = entries or []
+        self.master = master if master is not None else SecurityMaster()
+        self._reindex()
+
+    @classmethod
+    def load(cls, path: str = ACTIONS_FILE, master: Optional[SecurityMaster] = None) -> "CorporateActions":
+        """Loads the actions; a missing or unreadable file yields no actions."""
+        try:
+            entries = load_file(path)
+        except (OSError, ValueError):
+            entries = []
+        return cls(entries, master if master is not None else SecurityMaster.load())
+
+    def save(self, path: str = ACTIONS_FILE):
+        # Sorted so the committed file diffs line by line between runs.
+        self.entries.sort(key=lambda e: (e["isin"], e["ex_date"]))
+        dump_file(self.entries, path)
+
+    def _reindex(self):
+        self._by_isin: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for entry in self.entries:
+            key = self.master.resolve_isin(entry.get("isin"), entry.get("symbol"))
+            if key:
+                self._by_isin.setdefault(key, {})[entry["ex_date"]] = entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def for_security(self, isin: Optional[str], symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Actions of one security, newest ex_date first."""
+        key = self.master.resolve_isin(isin, symbol)
+        actions = self._by_isin.get(key, {}) if key else {}
+        return [actions[d] for d in sorted(actions, reverse=True)]
+
+    def add(self, isin: str, symbol: str, ex_date: str, factor: float, kind: str, source: str) -> bool:
+        """Records an action unless one exists for that security and date. Returns True when added."""
+        key = self.master.resolve_isin(isin, symbol) or isin
+        if not key or ex_date in self._by_isin.get(key, {}):
+            return False
+        entry = {"isin": key, "symbol": self.master.canonical_symbol(symbol), "ex_date": ex_date,
+                 "factor": round(factor, 6), "kind": kind, "source": source}
+        self.entries.append(entry)
+        self._by_isin.setdefault(key, {})[ex_date] = entry
+        return True
+
+    # --- Detection ---
+
+    def detect(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Finds split/bonus gaps across the whole close matrix: an ex-date open (and, loosely,
+        close) that sits one of DETECT_FACTORS below the previous close. New gaps are
+        recorded with source "detected"; returns the entries added.
+        """
+        dates, entries, opens, closes = close_matrix(history)
+        if not dates:
+            return []
+        # Previous available close per cell, skipping days a symbol has no bar.
+        rows = np.where(np.isnan(closes), 0, np.arange(len(dates))[:, None])
+        last_row = np.maximum.accumulate(rows, axis=0)
+        prev_close = np.full_like(closes, np.nan)
+        prev_close[1:] = np.take_along_axis(closes, last_row[:-1], axis=0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            open_gap, close_gap = prev_close / opens, prev_close / closes
+        best = np.zeros_like(closes)
+        best_error = np.full_like(closes, np.inf)
+        for factor in DETECT_FACTORS:
+            error = np.abs(open_gap / factor - 1)
+            hit = (error < DETECT_OPEN_TOLERANCE) & (np.abs(close_gap / factor - 1) < DETECT_CLOSE_TOLERANCE) & (error < best_error)
+            best[hit], best_error[hit] = factor, error[hit]
+
+        added = []
+        for row, col in zip(*np.nonzero(best)):
+            entry = entries[col]
+            if self.add(entry.get("INECODE"), entry.get("Symbol"), dates[row], float(best[row, col]), "gap", "detected"):
+                added.append(self.entries[-1])
+        return added
+
+    # --- Ingestion ---
+
+    def ingest_nse(self, rows: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Applies rows of an NSE corporate-actions CSV export (SYMBOL, PURPOSE, EX-DATE, ...).
+        Rows that are not splits or bonus issues are skipped; returns the entries added.
+        """
+        added = []
+        for row in rows:
+            row = {(k or "").strip().upper(): (v or "").strip() for k, v in row.items()}
+            parsed = parse_purpose(row.get("PURPOSE", ""))
+            if not parsed or parsed[1] == 1:
+                continue
+            try:
+                ex_date = datetime.strptime(row.get("EX-DATE", ""), "%d-%b-%Y").strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+            symbol = row.get("SYMBOL", "").upper()
+            if self.add(self.master.isin_for(symbol), symbol, ex_date, parsed[1], parsed[0], "nse"):
+                added.append(self.entries[-1])
+        return added
+
+    # --- Read-time adjustment ---
+
+    @staticmethod
+    def _still_unadjusted(candles: List[list], ex_date: str, factor: float) -> bool:
+        """True when the stored bars still show the action's gap (a refetched series may already be adjusted)."""
+        after = before = None
+        for candle in candles:  # newest first
+            if len(candle) <= 4 or not isinstance(candle[4], (int, float)) or candle[4] <= 0:
+                continue
+            if _bar_date(candle) >= ex_date:
+                after = candle
+            else:
+                before = candle
+                break
+        if after is None or before is None:
+            return False
+        ref = after[1] if isinstance(after[1], (int, float)) and after[1] > 0 else after[4]
+        gap = before[4] / ref
+        return abs(np.log(gap / factor)) < abs(np.log(gap))
+
+    def adjust_candles(self, candles: List[list], actions: List[Dict[str, Any]]) -> List[list]:
+        """Split/bonus-adjusted copy of a newest-first candle list; the input is not modified."""
+        pending = [(a["ex_date"], float(a["factor"])) for a in actions
+                   if float(a["factor"]) != 1 and self._still_unadjusted(candles, a["ex_date"], float(a["factor"]))]
+        if not pending:
+            return candles
+        adjusted, factor = [], 1.0
+        for candle in candles:
+            while pending and _bar_date(candle) < pending[0][0]:
+                factor *= pending.pop(0)[1]
+            if factor != 1.0:
+                candle = list(candle)
+                for pos in PRICE_COLUMNS:
+                    if len(candle) > pos and isinstance(candle[pos], (int, float)):
+                        candle[pos] = candle[pos] / factor
+                if len(candle) > VOLUME_COLUMN and isinstance(candle[VOLUME_COLUMN], (int, float)):
+                    candle[VOLUME_COLUMN] = candle[VOLUME_COLUMN] * factor
+            adjusted.append(candle)
+        return adjusted
+
+    def adjust_history(self, history: List[Dict[str, Any]]) -> int:
+        """
+        Replaces the candles of every history entry with an action by adjusted copies, in
+        place. Other entries are left untouched. Returns the number of entries adjusted.
+        """
+        adjusted = 0
+        if not self.entries:
+            return adjusted
+        for entry in history:
+            actions = self.for_security(entry.get("INECODE"), entry.get("Symbol"))
+            if actions and entry.get("candles"):
+                candles = self.adjust_candles(entry["candles"], actions)
+                if candles is not entry["candles"]:
+                    entry["candles"] = candles
+                    adjusted += 1
+        return adjusted
+
+# -------------------------------
+# COMMAND LINE
+# -------------------------------
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Record split/bonus adjustment factors for the candle history.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_detect = sub.add_parser("detect", help="Scan the candle history for split/bonus gaps.")
+    p_detect.add_argument("--history-dir", default=HISTORY_DIR)
+    p_ingest = sub.add_parser("ingest", help="Apply an NSE corporate-actions CSV export.")
+    p_ingest.add_argument("csv_file")
+    p_add = sub.add_parser("add", help="Record one action by hand (factor 1 marks a detected gap as a real move).")
+    p_add.add_argument("symbol")
+    p_add.add_argument("ex_date", help="YYYY-MM-DD")
+    p_add.add_argument("factor", type=float)
+    p_show = sub.add_parser("show", help="List the actions of a symbol or ISIN.")
+    p_show.add_argument("key")
+    args = parser.parse_args(argv)
+
+    actions = CorporateActions.load()
+    if args.command == "show":
+        found = actions.for_security(args.key, args.key)
+        sys.stdout.write(dumps(found, indent=True).decode("utf-8") + "\n")
+        return
+    if args.command == "detect":
+        added = actions.detect(load_history(history_dir=args.history_dir) or [])
+    elif args.command == "ingest":
+        with open(args.csv_file, newline="", encoding="utf-8-sig") as f:
+            added = actions.ingest_nse(csv.DictReader(f))
+    else:
+        symbol = args.symbol.strip().upper()
+        # A hand-entered action replaces whatever was recorded for that date.
+        key = actions.master.resolve_isin(None, symbol) or symbol
+        actions.entries = [e for e in actions.entries if not (e["isin"] == key and e["ex_date"] == args.ex_date)]
+        actions._reindex()
+        added = [actions.entries[-1]] if actions.add(key, symbol, args.ex_date, args.factor, "manual", "manual") else []
+    actions.save()
+    for entry in added:
+        print(f"✂️ {entry['symbol']} ({entry['isin']}) {entry['kind']} x{entry['factor']:g} on {entry['ex_date']} [{entry['source']}]")
+    print(f"✅ {len(actions)} corporate actions recorded ({len(added)} new).")
+
+if __name__ == "__main__":
+    main()
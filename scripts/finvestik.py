@@ -0,0 +1,109 @@
+import sys
+import time
+import logging
+import argparse
+from typing import Any, Dict, List, Optional
+
+from jsonio import dumps
+
+# -------------------------------
+# COMMAND LINE
+# -------------------------------
+# Entry point for ad-hoc analysis of the published data:
+#
+#     python scripts/finvestik.py query top RS_3M -n 25 --sector Banking
+#     python scripts/finvestik.py query top return_20d --as-of 2026-10-16
+#     python scripts/finvestik.py query series RELIANCE --field close --start 2026-01-01
+#     python scripts/finvestik.py query sectors Tomcap --agg sum
+#     python scripts/finvestik.py query crossed RS_3M 80 --since 2026-10-13
+#
+# Queries read the memory-mapped store from query_store.py, building it first when the
+# JSON sources changed since the last build.
+
+def print_table(rows: List[Dict[str, Any]]):
+    if not rows:
+        print("(no rows)")
+        return
+    columns = list(rows[0])
+    cells = [[f"{v:,.2f}" if isinstance(v, float) else "-" if v is None else str(v) for v in (row.get(c) for c in columns)]
+             for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.ljust(w) if i == 0 else v.rjust(w) for i, (v, w) in enumerate(zip(r, widths))))
+
+def add_query_parser(sub):
+    p_query = sub.add_parser("query", help="Query history, universe and snapshots without loading the JSON.")
+    p_query.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+    p_query.add_argument("--no-rebuild", action="store_true", help="Use the store as is, even if stale.")
+    q = p_query.add_subparsers(dest="query", required=True)
+
+    q.add_parser("build", help="(Re)build the memory-mapped store.")
+
+    p_top = q.add_parser("top", help="Top-N stocks by a universe metric or return_<N>d.")
+    p_top.add_argument("metric")
+    p_top.add_argument("-n", type=int, default=20)
+    p_top.add_argument("--asc", action="store_true", help="Lowest first.")
+    p_top.add_argument("--as-of", help="YYYY-MM-DD; ranks the archived session on or before this date.")
+    p_top.add_argument("--sector")
+    p_top.add_argument("--industry")
+
+    p_series = q.add_parser("series", help="One symbol's candle field or metric over time.")
+    p_series.add_argument("symbol")
+    p_series.add_argument("--field", default="close")
+    p_series.add_argument("--start", help="YYYY-MM-DD")
+    p_series.add_argument("--end", help="YYYY-MM-DD")
+
+    p_sectors = q.add_parser("sectors", help="Aggregate a universe metric per sector or industry.")
+    p_sectors.add_argument("metric")
+    p_sectors.add_argument("--by", choices=["sector", "industry"], default="sector")
+    p_sectors.add_argument("--agg", choices=["median", "mean", "sum", "min", "max", "count"], default="median")
+
+    p_crossed = q.add_parser("crossed", help="Stocks whose metric crossed a threshold since a date.")
+    p_crossed.add_argument("metric")
+    p_crossed.add_argument("threshold", type=float)
+    p_crossed.add_argument("--since", required=True, help="YYYY-MM-DD")
+    p_crossed.add_argument("--below", action="store_true", help="Downward crossings instead.")
+
+def run_query(args) -> List[Dict[str, Any]]:
+    from query_store import QueryStore, build_store
+
+    if args.query == "build":
+        manifest = build_store()
+        history, universe, panel = manifest["history"], manifest["universe"], manifest["panel"]
+        return [{"part": "history", "symbols": history["symbols"], "days": history["dates"]},
+                {"part": "universe", "symbols": universe["rows"], "days": 1},
+                {"part": "panel", "symbols": panel["symbols"], "days": panel["sessions"]}]
+
+    store = QueryStore.open(rebuild=not args.no_rebuild)
+    if args.query == "top":
+        return store.top(args.metric, args.n, args.asc, args.as_of, args.sector, args.industry)
+    if args.query == "series":
+        return store.series(args.symbol, args.field, args.start, args.end)
+    if args.query == "sectors":
+        return store.sector_aggregate(args.metric, args.by, args.agg)
+    return store.crossed(args.metric, args.threshold, args.since, args.below)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="finvestik", description="Finvestik data tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add_query_parser(sub)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    started = time.perf_counter()
+    try:
+        rows = run_query(args)
+    except KeyError as e:
+        print(f"❌ {e.args[0] if e.args else e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        sys.stdout.write(dumps(rows, indent=True).decode("utf-8") + "\n")
+    else:
+        print_table(rows)
+        print(f"\n{len(rows)} rows in {elapsed_ms:.0f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from jsonio import load_file, load_file_as
+from sharded_store import write_sharded, read_sharded
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The history is stored sharded by symbol (see sharded_store.py). HISTORY_FILE is the former
+# single-file layout, still read until the first sharded write replaces it.
+HISTORY_DIR = os.path.join(BASE_DIR, "history")
+HISTORY_FILE = os.path.join(BASE_DIR, "stock_historical_universe.json")
+
+# Per-symbol freshness metadata stored next to "candles" in every history entry.
+LAST_CANDLE_KEY = "last_candle_date"
+LAST_ATTEMPT_KEY = "last_fetch_attempt"
+FAILURE_COUNT_KEY = "failure_count"
+
+# A symbol that keeps failing is retried after 1, 2, 4, ... days, never waiting longer than this.
+MAX_RETRY_INTERVAL_DAYS = 16
+
+# ----------------------------------------
+# STORAGE
+# ----------------------------------------
+
+def load_history(schema: Optional[str] = None, history_dir: str = HISTORY_DIR) -> Optional[List[Dict[str, Any]]]:
+    """All history entries, or None when no history has been written yet. Read errors propagate."""
+    entries = read_sharded(history_dir, schema)
+    if entries is None and os.path.exists(HISTORY_FILE):
+        entries = load_file_as(HISTORY_FILE, schema) if schema else load_file(HISTORY_FILE)
+    return entries
+
+def save_history(entries: List[Dict[str, Any]], history_dir: str = HISTORY_DIR) -> Dict[str, int]:
+    """
+    Writes the history shards (only those that changed) and retires the single-file layout.
+    Candles go one per line, so a day's new bar adds a line per symbol rather than
+    rewriting every symbol's row.
+    """
+    stats = write_sharded(entries, history_dir, key="Symbol", expand="candles")
+    if os.path.exists(HISTORY_FILE):
+        os.remove(HISTORY_FILE)
+    return stats
+
+# ----------------------------------------
+# CANDLE HELPERS
+# ----------------------------------------
+
+def candle_date(candle) -> Optional[date]:
+    """Trading date of a candle row ([timestamp, open, high, low, close, volume, oi, turnover])."""
+    try:
+        return datetime.fromisoformat(str(candle[0])[:10]).date()
+    except (ValueError, TypeError, IndexError):
+        return None
+
+def last_candle_date(entry: Optional[Dict[str, Any]]) -> Optional[date]:
+    """Newest candle date of a history entry. Candles are stored newest first."""
+    if not entry or not entry.get("candles"):
+        return None
+    return candle_date(entry["candles"][0])
+
+def previous_weekday(day: date) -> date:
+    """The closest Monday-Friday date strictly before `day`."""
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+def has_trading_day_between(from_date: date, to_date: date) -> bool:
+    """True if the inclusive range contains at least one weekday (exchange holidays are not known here)."""
+    current = from_date
+    while current <= to_date:
+        if current.weekday() < 5:
+            return True
+        current += timedelta(days=1)
+    return False
+
+def normalize_universe(universe_raw: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Keeps only records with a Symbol and a real INECODE (placeholders like "XXXXXXXXXXXX"
+    are dropped), upper-cased and de-duplicated by symbol.
+    """
+    universe = []
+    seen_symbols = set()
+    for rec in universe_raw:
+        symbol = (rec.get("Symbol") or "").strip().upper()
+        inecode = (rec.get("INECODE") or "").strip().upper()
+        if not symbol or not inecode or inecode == "XXXXXXXXXXXX":
+            continue
+        if symbol in seen_symbols:
+            continue
+        seen_symbols.add(symbol)
+        universe.append({"Symbol": symbol, "INECODE": inecode})
+    return universe
+
+def add_turnover(candle_list):
+    """Appends turnover in crores (close * volume / 1e7) to each candle."""
+    for candle in candle_list:
+        if len(candle) >= 6 and isinstance(candle[4], (int, float)) and isinstance(candle[5], (int, float)):
+            turnover = round(candle[4] * candle[5] / 1e7, 2)  # Convert to crores
+            candle.append(turnover)
+    return candle_list
+
+def merge_candles(existing: List[list], new: List[list], max_candles: int, overwrite: bool = False) -> List[list]:
+    """
+    Merges candles from any date range into an existing newest-first list, keyed by date.
+    Existing bars win unless `overwrite` is set (used to repair bad history).
+    """
+    by_date = {}
+    for candle in (existing + new) if overwrite else (new + existing):
+        key = str(candle[0])[:10]
+        by_date[key] = candle
+    return [by_date[key] for key in sorted(by_date, reverse=True)][:max_candles]
+
+# ----------------------------------------
+# FRESHNESS METADATA
+# ----------------------------------------
+
+def build_entry(symbol: str, inecode: str, candles: List[list], previous: Optional[Dict[str, Any]],
+                today: date, attempted: bool = False, failed: bool = False) -> Dict[str, Any]:
+    """
+    Builds a history entry, carrying freshness metadata forward from the previous entry.
+    `attempted` marks that a fetch was made today; `failed` counts it as a failure.
+    """
+    previous = previous or {}
+    entry = {
+        "Symbol": symbol,
+        "INECODE": inecode,
+        "candles": candles,
+    }
+    newest = candle_date(candles[0]) if candles else None
+    entry[LAST_CANDLE_KEY] = newest.strftime('%Y-%m-%d') if newest else None
+    entry[LAST_ATTEMPT_KEY] = today.strftime('%Y-%m-%d') if attempted else previous.get(LAST_ATTEMPT_KEY)
+    if failed:
+        entry[FAILURE_COUNT_KEY] = int(previous.get(FAILURE_COUNT_KEY) or 0) + 1
+    elif attempted:
+        entry[FAILURE_COUNT_KEY] = 0
+    else:
+        entry[FAILURE_COUNT_KEY] = int(previous.get(FAILURE_COUNT_KEY) or 0)
+    return entry
+
+def is_due_for_retry(entry: Optional[Dict[str, Any]], today: date) -> bool:
+    """Symbols that failed before are retried with an exponential back-off on the last attempt date."""
+    if not entry:
+        return True
+    failures = int(entry.get(FAILURE_COUNT_KEY) or 0)
+    last_attempt = entry.get(LAST_ATTEMPT_KEY)
+    if failures == 0 or not last_attempt:
+        return True
+    wait_days = min(2 ** (failures - 1), MAX_RETRY_INTERVAL_DAYS)
+    return (today - datetime.strptime(last_attempt, '%Y-%m-%d').date()).days >= wait_days
+
+# ----------------------------------------
+# FETCH PLANNER
+# ----------------------------------------
+
+def plan_fetch_batches(universe: List[Dict[str, str]], history_map: Dict[str, Dict[str, Any]],
+                       today: date, max_candles: int) -> Dict[Tuple[str, str], List[Dict[str, str]]]:
+    """
+    Builds the minimal incremental fetch: only symbols whose history is missing trading
+    days up to today, grouped by identical (from_date, to_date) range. Newly listed symbols
+    (no history yet) get a full window; symbols in failure back-off are left out.
+    """
+    to_date = today
+    batches: Dict[Tuple[str, str], List[Dict[str, str]]] = defaultdict(list)
+    for stock in universe:
+        entry = history_map.get(stock["INECODE"])
+        newest = last_candle_date(entry)
+        from_date = newest + timedelta(days=1) if newest else today - timedelta(days=max_candles)
+        if not has_trading_day_between(from_date, to_date):
+            continue
+        if not is_due_for_retry(entry, today):
+            continue
+        batches[(from_date.strftime('%Y-%m-%d'), to_date.strftime('%Y-%m-%d'))].append(stock)
+    return dict(batches)
+
+def head_batch_key(batches: Dict[Tuple[str, str], List[Dict[str, str]]],
+                   history_map: Dict[str, Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """
+    The range shared by symbols that are fully caught up (latest from_date among symbols
+    with history). One probe of this group tells whether the exchange has new candles at all.
+    """
+    keys = [
+        key for key, stocks in batches.items()
+        if any(last_candle_date(history_map.get(s["INECODE"])) for s in stocks)
+    ]
+    return max(keys) if keys else None
@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, Optional
+
+from jsonio import dump_file, load_file
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Validators (ETag, Last-Modified, body hash) of the last processed response per URL, so
+# reference-data fetchers can send conditional requests and skip parse/write when a source
+# has not changed. The file is committed with the data it describes.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VALIDATORS_FILE = os.path.join(SCRIPT_DIR, "http_validators.json")
+
+class ValidatorStore:
+    """
+    Per-URL validators. A response is only remembered once the caller has processed it
+    (remember()), so a run that fails half-way refetches instead of skipping.
+    """
+
+    def __init__(self, path: str = VALIDATORS_FILE):
+        self.path = path
+        try:
+            self.entries: Dict[str, Dict[str, Any]] = load_file(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since for the last processed response of `url`."""
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url: str, response) -> bool:
+        """
+        True on 304 Not Modified, or on a 200 whose body hashes to the one last processed
+        (for servers that ignore conditional headers). Otherwise the new validators are
+        held until remember(url) is called.
+        """
+        if response.status_code == 304:
+            return True
+        if response.status_code != 200:
+            return False
+        digest = hashlib.sha256(response.content).hexdigest()
+        if self.entries.get(url, {}).get("sha256") == digest:
+            return True
+        self._pending[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": digest,
+        }
+        return False
+
+    def remember(self, url: str, **meta: Any):
+        """Marks the pending response of `url` as processed. `meta` is stored alongside it."""
+        validators = self._pending.pop(url, None)
+        if validators is None:
+            return
+        self.entries[url] = {key: value for key, value in {**validators, **meta}.items() if value is not None}
+        self._dirty = True
+
+    def meta(self, url: str) -> Dict[str, Any]:
+        """Everything stored for the last processed response of `url`."""
+        return self.entries.get(url, {})
+
+    def forget(self, url: Optional[str] = None):
+        """Drops the validators of one URL (or all), forcing the next fetch to be unconditional."""
+        if url is None:
+            self._dirty = bool(self.entries)
+            self.entries = {}
+        elif self.entries.pop(url, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """Writes the store only when something changed, so unchanged runs leave no diff."""
+        if not self._dirty:
+            return
+        dump_file(dict(sorted(self.entries.items())), self.path)
+        self._dirty = False
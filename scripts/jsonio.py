@@ -0,0 +1,178 @@
+import os
+import json
+from typing import Any, Dict, List, Optional, TypedDict
+
+# -------------------------------
+# BACKEND SELECTION
+# -------------------------------
+# orjson (fastest) or msgspec are used when installed; the stdlib json module is the fallback.
+# Set FINVESTIK_JSON_BACKEND=json (or orjson / msgspec) to force a backend.
+
+_REQUESTED = os.environ.get("FINVESTIK_JSON_BACKEND", "").strip().lower()
+
+orjson = None
+msgspec = None
+if _REQUESTED in ("", "orjson"):
+    try:
+        import orjson
+    except ImportError:
+        pass
+if _REQUESTED in ("", "msgspec"):
+    try:
+        import msgspec
+    except ImportError:
+        pass
+
+BACKEND = "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+
+def _default(obj: Any) -> Any:
+    """Serializes NumPy scalars (e.g. from pandas records) as plain Python values."""
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if msgspec is not None:
+    _msgspec_encoder = msgspec.json.Encoder(enc_hook=_default)
+    _msgspec_decoder = msgspec.json.Decoder()
+
+# -------------------------------
+# ENCODE / DECODE
+# -------------------------------
+
+def loads(data) -> Any:
+    """Parses JSON from bytes or str. Raises json.JSONDecodeError on invalid input, whatever the backend."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    if BACKEND == "msgspec":
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise json.JSONDecodeError(str(e), "", 0) from e
+    return json.loads(data)
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serializes to UTF-8 bytes, compact or with 2-space indentation."""
+    if BACKEND == "orjson":
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    if BACKEND == "msgspec":
+        raw = _msgspec_encoder.encode(obj)
+        return msgspec.json.format(raw, indent=2) if indent else raw
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_default).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+def load_file(path: str) -> Any:
+    """Reads and parses a JSON file. Errors (missing file, bad JSON) propagate to the caller."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+def dump_file(obj: Any, path: str, indent: bool = True):
+    """
+    Writes a JSON file (pretty-printed by default, like the rest of the pipeline's artifacts).
+    The file is replaced atomically, so readers never see a partially written artifact.
+    """
+    raw = dumps(obj, indent=indent)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+
+def response_json(response) -> Any:
+    """
+    Drop-in for requests' `response.json()` using the fast backend. Decode errors are raised
+    as requests' JSONDecodeError so existing `except RequestException` handlers still apply.
+    """
+    try:
+        return loads(response.content)
+    except json.JSONDecodeError as e:
+        from requests.exceptions import JSONDecodeError as RequestsJSONDecodeError
+        raise RequestsJSONDecodeError(e.msg, e.doc, e.pos) from e
+
+# -------------------------------
+# TYPED SCHEMAS
+# -------------------------------
+# Known payload shapes. With msgspec installed, decode_as() validates while parsing and keeps
+# only the declared keys, so large payloads land as compact dicts without a second pass.
+# Without msgspec the payload is parsed untyped and returned as-is.
+
+class HistoryEntry(TypedDict, total=False):
+    """One symbol in stock_historical_universe.json."""
+    Symbol: str
+    INECODE: str
+    candles: List[list]
+    last_candle_date: Optional[str]
+    last_fetch_attempt: Optional[str]
+    failure_count: int
+
+class CandleSymbol(TypedDict, total=False):
+    """The subset of a history entry the daily pipeline reads."""
+    Symbol: str
+    INECODE: str
+    candles: List[list]
+
+class StrikeTicks(TypedDict, total=False):
+    fields: List[str]
+    ticks: Dict[str, Any]
+
+class StrikeData(TypedDict, total=False):
+    current: StrikeTicks
+    fields: List[str]
+    ticks: Dict[str, Any]
+
+class StrikePayload(TypedDict, total=False):
+    """Strike last-traded-state / priceticks response."""
+    data: StrikeData
+
+class StockEdgePeer(TypedDict, total=False):
+    """One row of a StockEdge industry peer page."""
+    SecurityID: Any
+    Name: Optional[str]
+    MCAP: Any
+    Exchange: Optional[str]
+
+class UpstoxCandleData(TypedDict, total=False):
+    candles: List[list]
+
+class UpstoxCandlePayload(TypedDict, total=False):
+    """Upstox historical-candle response."""
+    status: str
+    data: UpstoxCandleData
+
+SCHEMAS = {
+    "history": List[HistoryEntry],
+    "candle_symbols": List[CandleSymbol],
+    "strike": StrikePayload,
+    "stockedge_peers": List[StockEdgePeer],
+    "upstox_candles": UpstoxCandlePayload,
+}
+
+# Built on first use: a script decoding one schema does not pay for compiling the others.
+_typed_decoders: Dict[str, Any] = {}
+
+def decode_as(data, schema: str) -> Any:
+    """Parses `data` against one of SCHEMAS. Validation errors surface as json.JSONDecodeError."""
+    if msgspec is None:
+        return loads(data)
+    decoder = _typed_decoders.get(schema)
+    if decoder is None:
+        decoder = _typed_decoders[schema] = msgspec.json.Decoder(SCHEMAS[schema])
+    try:
+        return decoder.decode(data)
+    except (msgspec.DecodeError, msgspec.ValidationError) as e:
+        raise json.JSONDecodeError(str(e), "", 0) from e
+
+def load_file_as(path: str, schema: str) -> Any:
+    """load_file() with typed decoding."""
+    with open(path, "rb") as f:
+        return decode_as(f.read(), schema)
+
+def response_json_as(response, schema: str) -> Any:
+    """response_json() with typed decoding."""
+    try:
+        return decode_as(response.content, schema)
+    except json.JSONDecodeError as e:
+        from requests.exceptions import JSONDecodeError as RequestsJSONDecodeError
+        raise RequestsJSONDecodeError(e.msg, e.doc, e.pos) from e
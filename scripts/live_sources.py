@@ -0,0 +1,322 @@
+import time
+import logging
+import threading
+import requests
+import numpy as np
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from jsonio import response_json
+from stock_record import StockRecord
+from strike import (LAST_TRADED_STATE_URL, PRICETICKS_URL, DEFAULT_CANDLE_FIELDS, OHLCV_COLUMNS, IST,
+                    MARKET_OPEN, SNAPSHOT_TTL_SECONDS, find_valid_trading_day_data, get_fields_and_ticks,
+                    decode_ticks, align_to, to_python)
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Live universe providers. Each source normalizes its feed into the same LiveUniverse: one
+# StockRecord per symbol carrying close/high/low/volume/change % (plus open and the circuit
+# band when the feed has them). Enrichment and publishing never see which source answered.
+#
+# HedgedFetcher asks the healthiest source first and, if it has not answered within
+# hedge_after_seconds, starts the next one as well; the first usable universe wins. A source
+# that fails is replaced at once instead of waiting out the hedge delay.
+
+CONFIG = {
+    "strike_url_today": LAST_TRADED_STATE_URL,   # live/closing state of the session
+    "strike_url_history": PRICETICKS_URL,        # previous session's candles, for % change
+    "chartink_dashboard_url": "https://chartink.com/dashboard/364713",
+    "chartink_widget_url": "https://chartink.com/widget/process",
+    "source_order": ["strike", "chartink"],
+    "hedge_after_seconds": 8.0,
+    "fetch_timeout_seconds": 120.0,
+    # After this many consecutive failures a source is asked last until the cooldown has passed.
+    "unhealthy_after_failures": 2,
+    "unhealthy_cooldown_seconds": 300,
+}
+
+class LiveUniverse(NamedTuple):
+    source: str
+    trade_date: date
+    stocks: List[StockRecord]
+    payload: Any  # the raw response; the same object comes back while a source's cache is still valid
+
+# -------------------------------
+# STRIKE
+# -------------------------------
+
+def session_date_of_snapshot(raw_today_data: Dict[str, Any], fallback: date) -> date:
+    """The session the live snapshot belongs to (its first tick's date), else the date it was found for."""
+    try:
+        today_ticks = raw_today_data.get("data", {}).get("current", {}).get("ticks", {})
+        first_symbol = next(iter(today_ticks))
+        return datetime.strptime(str(today_ticks[first_symbol][0][0])[:10], "%Y-%m-%d").date()
+    except Exception:
+        return fallback
+
+def process_strike_response(today_data: Dict[str, Any], previous_day_data: Dict[str, Any]) -> List[StockRecord]:
+    """
+    Processes the raw JSON response from Strike API using mixed API logic.
+    """
+    logging.info("Step 2: Processing today's (New API) and previous day's (Old API) data...")
+
+    previous = decode_ticks(previous_day_data, {"close": ("close", "dayClose")}, default_fields=DEFAULT_CANDLE_FIELDS)
+    logging.info(f"  Created a lookup map with {int(np.isfinite(previous.numeric['close']).sum())} previous day closing prices.")
+
+    fields, today_ticks = get_fields_and_ticks(today_data)
+    if not all([fields, today_ticks]):
+        logging.error("  Could not find 'fields' or 'ticks' in today's API response. Aborting.")
+        return []
+
+    # One decode of today's snapshot yields OHLCV and, when the feed carries it, the circuit band.
+    has_band = "circuitLimit" in fields
+    today = decode_ticks(today_data, OHLCV_COLUMNS, {"circuitLimit": ("circuitLimit",)}, keep_numeric_raw=True)
+    close, open_ = today.numeric["close"], today.numeric["open"]
+    previous_close = align_to(today.symbols, previous.symbols, previous.numeric["close"])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        use_previous = np.isfinite(close) & np.isfinite(previous_close) & (previous_close != 0)
+        use_open = ~use_previous & np.isfinite(close) & np.isfinite(open_) & (open_ != 0)
+        change = np.where(use_previous, (close - previous_close) / previous_close * 100,
+                          np.where(use_open, (close - open_) / open_ * 100, 0.0))
+    fallback_count = int(use_open.sum())
+
+    bands = today.raw["circuitLimit"] if has_band else [None] * len(today.symbols)
+    stocks = [
+        StockRecord(symbol, close=c, high=h, low=l, volume=v, open=o, change_pct=pct, circuit_limit=band)
+        for symbol, c, h, l, v, o, pct, band in zip(
+            today.symbols.tolist(), *(to_python(today.numeric[name], today.raw[name])
+                                      for name in ("close", "high", "low", "volume", "open")),
+            change.tolist(), bands)
+    ]
+
+    logging.info(f"  Processed {len(stocks)} stocks using mixed API logic.")
+    if fallback_count > 0:
+        logging.info(f"  Used fallback %change calculation (Open vs Close) for {fallback_count} stocks (missing history).")
+    return stocks
+
+def _in_background(fn, *args) -> Future:
+    """Runs fn(*args) on a daemon thread, so an abandoned call never blocks interpreter exit."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"bg-{fn.__name__}", daemon=True).start()
+    return future
+
+class StrikeSource:
+    name = "strike"
+
+    def fetch(self, session_day: date, ttl: int) -> Optional[LiveUniverse]:
+        # The previous session is looked up alongside today's snapshot, assuming today's
+        # session is `session_day`; the guess is only redone when the snapshot says otherwise.
+        previous = _in_background(find_valid_trading_day_data, session_day - timedelta(days=1), CONFIG["strike_url_history"])
+        found_date, raw_today_data = find_valid_trading_day_data(session_day, CONFIG["strike_url_today"], ttl=ttl)
+        if not raw_today_data:
+            return None
+        trade_date = session_date_of_snapshot(raw_today_data, found_date)
+        previous_date, raw_previous_day_data = previous.result()
+        if previous_date is None or previous_date >= trade_date:
+            # Search starts strictly from one day BEFORE the actual found session date
+            _, raw_previous_day_data = find_valid_trading_day_data(trade_date - timedelta(days=1), CONFIG["strike_url_history"])
+        if not raw_previous_day_data:
+            return None
+        stocks = process_strike_response(raw_today_data, raw_previous_day_data)
+        return LiveUniverse(self.name, trade_date, stocks, raw_today_data) if stocks else None
+
+# -------------------------------
+# CHARTINK
+# -------------------------------
+
+def fetch_chartink_data() -> Optional[Dict[str, Any]]:
+    """Fetches raw stock data from Chartink's widget endpoint."""
+    logging.info("Fetching data from Chartink...")
+    try:
+        QUERY = (
+            "select latest Close as 'Close', latest High as 'High', "
+            "latest Low as 'Low', latest Volume as 'Volume', "
+            'latest "close - 1 candle ago close / 1 candle ago close * 100" as \'%Change\' '
+            "WHERE ( {cash} 1 = 1 ) ORDER BY 4 desc"
+        )
+        PAYLOAD = {
+            "query": QUERY, "use_live": "1", "limit": "5000",
+            "size": "1", "widget_id": "3810138"
+        }
+        HEADERS = {
+            "Referer": CONFIG["chartink_dashboard_url"], "Origin": "https://chartink.com",
+            "x-requested-with": "XMLHttpRequest", "User-Agent": "python-requests/3.x",
+        }
+
+        from bs4 import BeautifulSoup as bs  # only needed for the CSRF token; kept off the import path
+        with requests.Session() as s:
+            response = s.get(CONFIG["chartink_dashboard_url"], timeout=20)
+            response.raise_for_status()
+            soup = bs(response.content, "html.parser")
+            token = soup.find("meta", {"name": "csrf-token"})["content"]
+            HEADERS["x-csrf-token"] = token
+            resp = s.post(CONFIG["chartink_widget_url"], headers=HEADERS, data=PAYLOAD, timeout=30)
+            resp.raise_for_status()
+            return response_json(resp)
+    except Exception as e:
+        logging.error(f"ERROR fetching Chartink data: {e}")
+    return None
+
+# Chartink result column (lower-cased) -> StockRecord attribute
+CHARTINK_FIELDS = {"close": "close", "high": "high", "low": "low", "volume": "volume", "%change": "change_pct"}
+
+def process_chartink_response(data: Dict[str, Any]) -> List[StockRecord]:
+    """Processes the raw JSON response from Chartink into a clean list of stocks."""
+    stocks = []
+    for item in data.get("groupData", []):
+        stock = StockRecord(item.get("name"))
+        for res in item.get("results", []):
+            if isinstance(res, dict):
+                for key, val in res.items():
+                    attr = CHARTINK_FIELDS.get(key.lower())
+                    if attr is None:
+                        continue
+                    value = val[0] if isinstance(val, list) and val else val
+                    if isinstance(value, str):
+                        cleaned_value = value.replace(',', '')
+                        try:
+                            setattr(stock, attr, float(cleaned_value))
+                        except (ValueError, TypeError):
+                            setattr(stock, attr, value)
+                    else:
+                        setattr(stock, attr, value)
+        stocks.append(stock)
+    logging.info(f"  Processed {len(stocks)} stocks from Chartink.")
+    return stocks
+
+def latest_session_date(moment: datetime) -> date:
+    """Session the live Chartink scan reflects: today once the market has opened, else the previous weekday."""
+    moment = moment.astimezone(IST)
+    day = moment.date()
+    if moment.time() < MARKET_OPEN:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+class ChartinkSource:
+    name = "chartink"
+
+    def fetch(self, session_day: date, ttl: int) -> Optional[LiveUniverse]:
+        raw = fetch_chartink_data()
+        if not raw:
+            return None
+        stocks = process_chartink_response(raw)
+        return LiveUniverse(self.name, latest_session_date(datetime.now(IST)), stocks, raw) if stocks else None
+
+SOURCES = {source.name: source for source in (StrikeSource(), ChartinkSource())}
+
+# -------------------------------
+# HEDGED FETCHING
+# -------------------------------
+
+class SourceHealth:
+    """Consecutive failures and a smoothed latency of one source."""
+
+    def __init__(self):
+        self.failures = 0
+        self.last_failure = 0.0
+        self.latency: Optional[float] = None
+
+    def record(self, ok: bool, seconds: float):
+        if ok:
+            self.failures = 0
+            self.latency = seconds if self.latency is None else 0.7 * self.latency + 0.3 * seconds
+        else:
+            self.failures += 1
+            self.last_failure = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        return (self.failures < CONFIG["unhealthy_after_failures"]
+                or time.monotonic() - self.last_failure > CONFIG["unhealthy_cooldown_seconds"])
+
+class HedgedFetcher:
+    """
+    Fetches the live universe from several sources with hedged requests. Keep one instance for
+    a whole stream session: a source that is still answering an earlier poll is not started
+    again, and source health carries over from poll to poll.
+    """
+
+    def __init__(self, source_names: Optional[Sequence[str]] = None,
+                 hedge_after: float = CONFIG["hedge_after_seconds"], timeout: float = CONFIG["fetch_timeout_seconds"]):
+        names = list(source_names or CONFIG["source_order"])
+        unknown = [n for n in names if n not in SOURCES]
+        if unknown:
+            raise ValueError(f"Unknown live source(s): {', '.join(unknown)}")
+        self.sources = [SOURCES[n] for n in names]
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.health = {s.name: SourceHealth() for s in self.sources}
+        self._inflight: Dict[str, Future] = {}
+
+    def _ordered(self) -> List[Any]:
+        """Configured order, with unhealthy sources moved to the back."""
+        return sorted(self.sources, key=lambda s: not self.health[s.name].is_healthy())
+
+    def _run(self, source, session_day: date, ttl: int) -> Optional[LiveUniverse]:
+        started = time.monotonic()
+        try:
+            result = source.fetch(session_day, ttl)
+        except Exception as e:
+            logging.warning(f"  Live source {source.name} failed: {e}")
+            result = None
+        self.health[source.name].record(result is not None, time.monotonic() - started)
+        return result
+
+    def _start(self, source, session_day: date, ttl: int) -> Future:
+        future = self._inflight.get(source.name)
+        if future is None or future.done():
+            future = Future()
+            # Daemon threads: a run that already published does not wait for a source still hanging.
+            threading.Thread(target=lambda f=future: f.set_result(self._run(source, session_day, ttl)),
+                             name=f"live-{source.name}", daemon=True).start()
+            self._inflight[source.name] = future
+        return future
+
+    def fetch(self, session_day: date, ttl: int = SNAPSHOT_TTL_SECONDS) -> Optional[LiveUniverse]:
+        """The first usable universe from any source, or None when all of them failed or timed out."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        queue = self._ordered()
+        pending: Dict[Future, Any] = {}
+
+        def launch():
+            source = queue.pop(0)
+            pending[self._start(source, session_day, ttl)] = source
+
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(list(pending), timeout=min(self.hedge_after, remaining) if queue else remaining,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                if queue:
+                    slow = ", ".join(s.name for s in pending.values())
+                    logging.info(f"⏱️ {slow} slower than {self.hedge_after:g}s — hedging with {queue[0].name}.")
+                    launch()
+                continue
+            for future in done:
+                pending.pop(future)
+                result = future.result()
+                if result is not None:
+                    logging.info(f"  Live universe from {result.source} ({len(result.stocks)} stocks, "
+                                 f"session {result.trade_date}) in {time.monotonic() - started:.1f}s.")
+                    return result
+            if not pending and queue:
+                logging.info(f"↪️ Failing over to {queue[0].name}.")
+                launch()
+
+        logging.error("FATAL: No live source returned a universe.")
+        return None
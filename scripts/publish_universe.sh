@@ -0,0 +1,11 @@
+#!/bin/sh
+# Commits and pushes the published universe. Used as Daily_Data.py --on-publish hook in stream mode.
+# Daily_Data keeps rewriting tracked files while this runs, so the rebase autostashes them; on a
+# conflict with a concurrent cron push the freshly streamed data (the commit being replayed) wins.
+# scripts/snapshots only changes once the session has closed (the stream's final run).
+set -e
+git add static/data/stock_universe.json static/data/data_version.json scripts/snapshots scripts/quality_metrics.jsonl
+git diff --staged --quiet && exit 0
+git commit -q -m "⚡ Live stock data at $(TZ='Asia/Kolkata' date '+%Y-%m-%d %H:%M:%S IST')"
+git pull -q --rebase --autostash -X theirs
+git push -q
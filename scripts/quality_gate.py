@@ -0,0 +1,202 @@
+import os
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from jsonio import dumps
+from history_store import previous_weekday
+from snapshot_store import IST, SNAPSHOT_DIR, list_sessions, load_session_columns, records_to_columns
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Array-level checks over the enriched universe before Daily_Data publishes it. A failed
+# check blocks the publish, so the last good stock_universe.json stays live. Every run
+# appends its metrics to quality_metrics.jsonl to trend data health over time.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG = {
+    "metrics_file": os.path.join(SCRIPT_DIR, "quality_metrics.jsonl"),
+    "metrics_max_lines": 2000,
+    "min_rows": 500,
+    # Row count against the latest recorded snapshot.
+    "min_row_ratio": 0.9,
+    # Largest share of missing (None/NaN) values per published column.
+    "max_null_ratio": {
+        "current_price": 0.01,
+        "day_volume": 0.02,
+        "Sector Name": 0.05,
+        "Market Cap": 0.05,
+        "fifty_two_week_high": 0.1,
+        "TurnoverSMA20": 0.1,
+    },
+    # Non-finite %change is published as 0, so a missing previous close shows up as zeros.
+    "max_zero_change_ratio": 0.25,
+    # |%change| beyond the stock's circuit band (plus slack for rounding) is impossible.
+    "circuit_slack_pct": 0.5,
+    "max_circuit_breach_ratio": 0.005,
+    # Previous close implied by close and %change vs the previous session's official close
+    # (from the candle history; the recorded snapshot only when no history is loaded). Only
+    # blocking when that reference is the weekday right before the session: an older one
+    # (missed session, stale history, holiday) is reported as a warning instead.
+    "previous_close_tolerance": 0.005,
+    "max_previous_close_mismatch_ratio": 0.1,
+}
+
+class QualityReport(NamedTuple):
+    session_date: str
+    metrics: Dict[str, Any]
+    failures: List[str]
+    warnings: List[str]
+
+    @property
+    def passed(self) -> bool:
+        return not self.failures
+
+# -------------------------------
+# CHECKS
+# -------------------------------
+
+def _float_array(values: List[Any]) -> np.ndarray:
+    return np.array([v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan for v in values],
+                    dtype=np.float64)
+
+def _null_ratio(values: List[Any]) -> float:
+    if not values:
+        return 1.0
+    return sum(1 for v in values if v is None or v == "" or (isinstance(v, float) and v != v)) / len(values)
+
+def _by_name(payload: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Column name -> values of a records_to_columns() payload."""
+    return dict(zip(payload.get("columns", []), payload.get("data", [])))
+
+def _latest_session(snapshot_dir: str, before: Optional[str] = None, on_or_before: Optional[str] = None) -> Optional[str]:
+    sessions = [s for s in list_sessions(snapshot_dir)
+                if (before is None or s < before) and (on_or_before is None or s <= on_or_before)]
+    return sessions[-1] if sessions else None
+
+def _aligned(columns: Dict[str, Any], symbols: np.ndarray, name: str) -> np.ndarray:
+    """Column `name` of a recorded snapshot, in the order of `symbols` (NaN where absent)."""
+    ref_symbols = np.array(columns.get("Symbol") or [], dtype=str)
+    ref_values = _float_array(columns.get(name) or [])
+    order = np.argsort(ref_symbols)
+    pos = np.clip(np.searchsorted(ref_symbols[order], symbols), 0, max(len(order) - 1, 0))
+    out = np.full(len(symbols), np.nan)
+    if len(order):
+        hit = ref_symbols[order][pos] == symbols
+        out[hit] = ref_values[order][pos][hit]
+    return out
+
+def check_universe(records: List[Dict[str, Any]], session_date: str, snapshot_dir: str = SNAPSHOT_DIR,
+                   previous_closes: Optional[Dict[str, float]] = None,
+                   previous_session: Optional[str] = None) -> QualityReport:
+    """
+    Runs every check on the publishable rows. `previous_closes` (symbol -> official close of
+    `previous_session`) is the reference for %change; without it the latest recorded snapshot
+    before the session is used. Checks lacking a reference are skipped.
+    """
+    metrics: Dict[str, Any] = {"rows": len(records)}
+    failures: List[str] = []
+    warnings: List[str] = []
+    columns = _by_name(records_to_columns(records))
+    symbols = np.array(columns.get("Symbol") or [], dtype=str)
+
+    if len(records) < CONFIG["min_rows"]:
+        failures.append(f"only {len(records)} rows (minimum {CONFIG['min_rows']})")
+    duplicates = len(symbols) - len(np.unique(symbols))
+    metrics["duplicate_symbols"] = duplicates
+    if duplicates:
+        failures.append(f"{duplicates} duplicate symbols")
+
+    # --- Null ratios ---
+    nulls = {name: round(_null_ratio(columns.get(name) or []), 4) for name in CONFIG["max_null_ratio"]}
+    metrics["null_ratio"] = nulls
+    for name, ratio in nulls.items():
+        if ratio > CONFIG["max_null_ratio"][name]:
+            failures.append(f"{name} missing in {ratio:.1%} of rows (limit {CONFIG['max_null_ratio'][name]:.1%})")
+
+    # --- %change outliers ---
+    close = _float_array(columns.get("current_price") or [])
+    change = _float_array(columns.get("change_percentage") or [])
+    band = _float_array(columns.get("circuitLimit") or [])
+    traded = np.isfinite(close) & (_float_array(columns.get("day_volume") or []) > 0)
+    zero_ratio = float((traded & (change == 0)).sum() / max(int(traded.sum()), 1))
+    metrics["zero_change_ratio"] = round(zero_ratio, 4)
+    if zero_ratio > CONFIG["max_zero_change_ratio"]:
+        failures.append(f"{zero_ratio:.1%} of traded stocks show 0% change")
+    banded = np.isfinite(band) & (band > 0) & np.isfinite(change)
+    breaches = banded & (np.abs(change) > band + CONFIG["circuit_slack_pct"])
+    breach_ratio = float(breaches.sum() / max(int(banded.sum()), 1))
+    metrics["circuit_breach_ratio"] = round(breach_ratio, 4)
+    metrics["max_abs_change_pct"] = round(float(np.nanmax(np.abs(change))), 2) if np.isfinite(change).any() else None
+    if breach_ratio > CONFIG["max_circuit_breach_ratio"]:
+        failures.append(f"{int(breaches.sum())} stocks moved beyond their circuit band ({breach_ratio:.2%})")
+
+    # --- Against the recorded snapshots ---
+    latest = _latest_session(snapshot_dir, on_or_before=session_date)
+    newest = _latest_session(snapshot_dir)
+    metrics["latest_snapshot"] = latest
+    if newest and newest > session_date:
+        failures.append(f"session {session_date} is older than the recorded session {newest}")
+    latest_payload = load_session_columns(latest, snapshot_dir) if latest else None
+    if latest_payload:
+        previous_rows = int(latest_payload.get("rows") or 0)
+        row_ratio = len(records) / previous_rows if previous_rows else None
+        metrics["row_ratio"] = round(row_ratio, 4) if row_ratio is not None else None
+        if row_ratio is not None and row_ratio < CONFIG["min_row_ratio"]:
+            failures.append(f"{len(records)} rows vs {previous_rows} in session {latest} ({row_ratio:.1%})")
+
+    # --- %change against the previous session's close ---
+    reference_close, previous = None, None
+    if previous_closes and previous_session:
+        previous, metrics["previous_close_source"] = previous_session, "history"
+        reference_close = np.array([previous_closes.get(s, np.nan) for s in symbols.tolist()], dtype=np.float64)
+    else:
+        previous = _latest_session(snapshot_dir, before=session_date)
+        previous_payload = load_session_columns(previous, snapshot_dir) if previous else None
+        if previous_payload:
+            metrics["previous_close_source"] = "snapshot"
+            reference_close = _aligned(_by_name(previous_payload), symbols, "current_price")
+    metrics["previous_session"] = previous
+    if reference_close is not None and len(symbols):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            implied_close = close / (1 + change / 100)
+            deviation = np.abs(implied_close / reference_close - 1)
+        comparable = np.isfinite(deviation)
+        mismatch = float((deviation[comparable] > CONFIG["previous_close_tolerance"]).sum() / max(int(comparable.sum()), 1))
+        metrics["previous_close_mismatch_ratio"] = round(mismatch, 4)
+        if mismatch > CONFIG["max_previous_close_mismatch_ratio"]:
+            message = f"%change of {mismatch:.1%} of stocks is not based on the {previous} close"
+            if previous == previous_weekday(date.fromisoformat(session_date)).isoformat():
+                failures.append(message + " (stale previous-day data?)")
+            else:
+                # Sessions in between were not seen, so a mismatch proves nothing.
+                warnings.append(message + f" (not the session right before {session_date}; not blocking)")
+
+    return QualityReport(session_date, metrics, failures, warnings)
+
+# -------------------------------
+# METRICS
+# -------------------------------
+
+def record_metrics(report: QualityReport, source: Optional[str] = None, path: Optional[str] = None):
+    """Appends the report as one JSON line, keeping only the newest metrics_max_lines lines."""
+    path = path or CONFIG["metrics_file"]
+    line = dumps({"checked_at": datetime.now(IST).strftime("%Y-%m-%d %H:%M:%S"), "session_date": report.session_date,
+                  "source": source, "passed": report.passed, "failures": report.failures, "warnings": report.warnings,
+                  **report.metrics}).decode("utf-8")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        lines = []
+    lines = (lines + [line])[-CONFIG["metrics_max_lines"]:]
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logging.warning(f"Could not record quality metrics: {e}")
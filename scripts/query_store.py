@@ -0,0 +1,368 @@
+import os
+import shutil
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from jsonio import dump_file, load_file
+from corporate_actions import ACTIONS_FILE, CorporateActions
+from history_store import HISTORY_DIR, HISTORY_FILE, load_history
+from sharded_store import MANIFEST_FILE as SHARD_MANIFEST_FILE
+from snapshot_store import SNAPSHOT_DIR, FINAL_FILE_NAME, list_sessions, load_session_columns
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Columnar, memory-mapped copy of the history and universe stores for ad-hoc analysis.
+# The JSON sources are compiled once into .npy arrays under scripts/.cache/query; queries
+# then np.load(mmap_mode="r") them, so only the pages a query touches are read from disk.
+# The store is rebuilt automatically when a source file changes.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+UNIVERSE_FILE = os.path.join(SCRIPT_DIR, "..", "static", "data", "stock_universe.json")
+STORE_DIR = os.path.join(SCRIPT_DIR, ".cache", "query")
+MANIFEST_FILE = "manifest.json"
+
+# Candle row: [timestamp, open, high, low, close, volume, oi, turnover]
+CANDLE_FIELDS = {"open": 1, "high": 2, "low": 3, "close": 4, "volume": 5, "turnover": 7}
+
+# Universe columns kept as strings; every other column is stored as float64 (NaN when missing).
+TEXT_COLUMNS = {"Symbol": "symbol", "Sector Name": "sector", "Industry Name": "industry",
+                "Stock Name": "name", "INECODE": "isin"}
+
+GROUP_COLUMNS = {"sector": "Sector Name", "industry": "Industry Name"}
+
+# -------------------------------
+# BUILD
+# -------------------------------
+
+def _source_stamp(path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def _sources(snapshot_dir: str) -> Dict[str, Any]:
+    """Size/mtime of every input, compared against the manifest to detect a stale store."""
+    return {
+        "history": _source_stamp(os.path.join(HISTORY_DIR, SHARD_MANIFEST_FILE)) or _source_stamp(HISTORY_FILE),
+        "actions": _source_stamp(ACTIONS_FILE),
+        "universe": _source_stamp(UNIVERSE_FILE),
+        "snapshots": {s: _source_stamp(os.path.join(snapshot_dir, s, FINAL_FILE_NAME))
+                      for s in list_sessions(snapshot_dir)},
+    }
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    return np.array([v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan for v in values],
+                    dtype=np.float64)
+
+def _build_history(history: List[Dict[str, Any]], out_dir: str) -> Dict[str, Any]:
+    """
+    history/dates.npy (D,) datetime64[D] ascending, history/symbols.npy (S,) sorted, and one
+    (D, S) float64 array per candle field. Date-major, so a cross-section is one contiguous row.
+    """
+    entries = {}
+    for item in history:
+        symbol = (item.get("Symbol") or "").strip().upper()
+        if symbol and item.get("candles"):
+            entries[symbol] = item["candles"]
+    symbols = sorted(entries)
+    dates = sorted({str(c[0])[:10] for candles in entries.values() for c in candles if c})
+    date_index = {d: i for i, d in enumerate(dates)}
+
+    panels = {field: np.full((len(dates), len(symbols)), np.nan) for field in CANDLE_FIELDS}
+    for col, symbol in enumerate(symbols):
+        for candle in entries[symbol]:
+            row = date_index.get(str(candle[0])[:10]) if candle else None
+            if row is None:
+                continue
+            for field, pos in CANDLE_FIELDS.items():
+                value = candle[pos] if len(candle) > pos else None
+                if isinstance(value, (int, float)):
+                    panels[field][row, col] = value
+    missing = np.isnan(panels["turnover"])
+    panels["turnover"][missing] = (panels["close"] * panels["volume"] / 1e7)[missing]
+
+    os.makedirs(os.path.join(out_dir, "history"))
+    np.save(os.path.join(out_dir, "history", "dates.npy"), np.array(dates, dtype="datetime64[D]"))
+    np.save(os.path.join(out_dir, "history", "symbols.npy"), np.array(symbols, dtype=str))
+    for field, panel in panels.items():
+        np.save(os.path.join(out_dir, "history", f"{field}.npy"), panel)
+    return {"symbols": len(symbols), "dates": len(dates), "fields": list(CANDLE_FIELDS)}
+
+def _build_universe(records: List[Dict[str, Any]], out_dir: str) -> Dict[str, Any]:
+    """universe/<column>.npy for the published universe, rows sorted by symbol."""
+    records = sorted((r for r in records if r.get("Symbol")), key=lambda r: r["Symbol"])
+    columns = []
+    for rec in records:
+        for key in rec:
+            if key not in columns:
+                columns.append(key)
+    os.makedirs(os.path.join(out_dir, "universe"))
+    numeric = []
+    for col in columns:
+        values = [rec.get(col) for rec in records]
+        if col in TEXT_COLUMNS:
+            array = np.array([v or "" for v in values], dtype=str)
+            name = TEXT_COLUMNS[col]
+        else:
+            array, name = _float_column(values), col
+            numeric.append(col)
+        np.save(os.path.join(out_dir, "universe", _file_name(name)), array)
+    return {"rows": len(records), "metrics": numeric}
+
+def _build_panel(snapshot_dir: str, out_dir: str) -> Dict[str, Any]:
+    """
+    panel/sessions.npy (N,) and one (N, S) float64 array per numeric universe metric, from the
+    archived end-of-session snapshots. This is what time-series questions about derived metrics
+    (RS_3M, Tomcap, ...) are answered from.
+    """
+    sessions, payloads = [], []
+    for session in list_sessions(snapshot_dir):
+        payload = load_session_columns(session, snapshot_dir)
+        if payload and "Symbol" in payload.get("columns", []):
+            sessions.append(session)
+            payloads.append(dict(zip(payload["columns"], payload["data"])))
+    symbols = sorted({s for p in payloads for s in p["Symbol"] if s})
+    position = {s: i for i, s in enumerate(symbols)}
+    metrics = [c for p in payloads for c in p if c not in TEXT_COLUMNS]
+    metrics = list(dict.fromkeys(metrics))
+
+    os.makedirs(os.path.join(out_dir, "panel"))
+    np.save(os.path.join(out_dir, "panel", "sessions.npy"), np.array(sessions, dtype="datetime64[D]"))
+    np.save(os.path.join(out_dir, "panel", "symbols.npy"), np.array(symbols, dtype=str))
+    for metric in metrics:
+        panel = np.full((len(sessions), len(symbols)), np.nan)
+        for row, payload in enumerate(payloads):
+            if metric not in payload:
+                continue
+            cols = [position[s] for s in payload["Symbol"] if s]
+            values = [v for s, v in zip(payload["Symbol"], payload[metric]) if s]
+            panel[row, cols] = _float_column(values)
+        np.save(os.path.join(out_dir, "panel", _file_name(metric)), panel)
+    return {"sessions": len(sessions), "symbols": len(symbols), "metrics": metrics}
+
+def _file_name(column: str) -> str:
+    """Universe column names contain spaces and symbols; file names keep only [A-Za-z0-9_]."""
+    return "".join(ch if ch.isalnum() else "_" for ch in column) + ".npy"
+
+def build_store(store_dir: str = STORE_DIR, snapshot_dir: str = SNAPSHOT_DIR) -> Dict[str, Any]:
+    """Compiles the JSON stores into store_dir. The previous store stays readable until the swap."""
+    sources = _sources(snapshot_dir)
+    tmp_dir = store_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest: Dict[str, Any] = {"built_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "sources": sources}
+    history = (load_history() or []) if sources["history"] else []
+    CorporateActions.load().adjust_history(history)  # split/bonus-adjusted prices and volumes
+    manifest["history"] = _build_history(history, tmp_dir)
+    del history
+    universe = load_file(UNIVERSE_FILE) if sources["universe"] else []
+    manifest["universe"] = _build_universe(universe, tmp_dir)
+    manifest["panel"] = _build_panel(snapshot_dir, tmp_dir)
+    dump_file(manifest, os.path.join(tmp_dir, MANIFEST_FILE))
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    logging.info(f"Query store built at {store_dir}: {manifest['history']['symbols']} symbols x "
+                 f"{manifest['history']['dates']} days, {manifest['panel']['sessions']} snapshot sessions.")
+    return manifest
+
+def is_stale(store_dir: str = STORE_DIR, snapshot_dir: str = SNAPSHOT_DIR) -> bool:
+    try:
+        manifest = load_file(os.path.join(store_dir, MANIFEST_FILE))
+    except (FileNotFoundError, ValueError):
+        return True
+    return manifest.get("sources") != _sources(snapshot_dir)
+
+# -------------------------------
+# READ PATH
+# -------------------------------
+
+class QueryStore:
+    """
+    Read-only view of a built store. Arrays are memory-mapped on first access and shared by
+    every query on this instance.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        self.store_dir = store_dir
+        self.manifest = load_file(os.path.join(store_dir, MANIFEST_FILE))
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def open(cls, store_dir: str = STORE_DIR, snapshot_dir: str = SNAPSHOT_DIR, rebuild: bool = True) -> "QueryStore":
+        """Opens the store, (re)building it first when a source changed and `rebuild` is set."""
+        if rebuild and is_stale(store_dir, snapshot_dir):
+            build_store(store_dir, snapshot_dir)
+        return cls(store_dir)
+
+    def _array(self, group: str, name: str) -> np.ndarray:
+        key = f"{group}/{name}"
+        if key not in self._arrays:
+            path = os.path.join(self.store_dir, group, _file_name(name) if not name.endswith(".npy") else name)
+            if not os.path.exists(path):
+                raise KeyError(f"Unknown {group} column: {name}")
+            self._arrays[key] = np.load(path, mmap_mode="r")
+        return self._arrays[key]
+
+    # --- Universe (latest published cross-section) ---
+
+    def universe_metrics(self) -> List[str]:
+        return self.manifest["universe"]["metrics"]
+
+    def universe_column(self, column: str) -> np.ndarray:
+        return self._array("universe", TEXT_COLUMNS.get(column, column))
+
+    def _universe_filter(self, sector: Optional[str], industry: Optional[str]) -> np.ndarray:
+        mask = np.ones(self.manifest["universe"]["rows"], dtype=bool)
+        if sector:
+            mask &= np.char.lower(self.universe_column("Sector Name")) == sector.lower()
+        if industry:
+            mask &= np.char.lower(self.universe_column("Industry Name")) == industry.lower()
+        return mask
+
+    # --- History (daily candles) ---
+
+    def history_panel(self, field: str = "close") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(dates, symbols, (D, S) values) of one candle field, memory-mapped."""
+        if field not in CANDLE_FIELDS:
+            raise KeyError(f"Unknown candle field: {field}")
+        return self._array("history", "dates.npy"), self._array("history", "symbols.npy"), self._array("history", field)
+
+    def _history_index(self, symbol: str) -> int:
+        symbols = self._array("history", "symbols.npy")
+        symbol = symbol.strip().upper()
+        pos = int(np.searchsorted(symbols, symbol))
+        if pos >= len(symbols) or symbols[pos] != symbol:
+            raise KeyError(f"No history for {symbol}")
+        return pos
+
+    def _history_row(self, as_of: Optional[str]) -> int:
+        """Index of the latest history date on or before `as_of` (default: the newest date)."""
+        dates = self._array("history", "dates.npy")
+        if not len(dates):
+            raise KeyError("History store is empty")
+        if as_of is None:
+            return len(dates) - 1
+        row = int(np.searchsorted(dates, np.datetime64(as_of, "D"), side="right")) - 1
+        if row < 0:
+            raise KeyError(f"No history on or before {as_of}")
+        return row
+
+    # --- Panel (archived sessions of the universe) ---
+
+    def _panel_row(self, on_or_before: str) -> int:
+        sessions = self._array("panel", "sessions.npy")
+        return int(np.searchsorted(sessions, np.datetime64(on_or_before, "D"), side="right")) - 1
+
+    # -------------------------------
+    # QUERIES
+    # -------------------------------
+
+    def top(self, metric: str, n: int = 20, ascending: bool = False, as_of: Optional[str] = None,
+            sector: Optional[str] = None, industry: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Top `n` stocks by `metric`. A universe column (RS_3M, Tomcap, ...) ranks the latest
+        universe, or the archived session on or before `as_of`. return_<N>d ranks the N-day
+        close-to-close return from history as of `as_of`.
+        """
+        if metric.startswith("return_") and metric.endswith("d"):
+            days = int(metric[len("return_"):-1])
+            row = self._history_row(as_of)
+            if row - days < 0:
+                raise KeyError(f"History holds fewer than {days} sessions before {as_of or 'today'}")
+            close = self._array("history", "close")
+            values = (close[row] / close[row - days] - 1) * 100
+            symbols = self._array("history", "symbols.npy")
+            mask = self._sector_mask(symbols, sector, industry)
+        elif as_of is not None:
+            row = self._panel_row(as_of)
+            if row < 0:
+                raise KeyError(f"No snapshot session on or before {as_of}")
+            values = self._array("panel", metric)[row]
+            symbols = self._array("panel", "symbols.npy")
+            mask = self._sector_mask(symbols, sector, industry)
+        else:
+            values = self.universe_column(metric)
+            symbols = self.universe_column("Symbol")
+            mask = self._universe_filter(sector, industry)
+
+        candidates = np.flatnonzero(mask & np.isfinite(values))
+        keys = values[candidates] if ascending else -values[candidates]
+        chosen = candidates[np.argsort(keys, kind="stable")[:n]]  # ties stay in symbol order
+        return [{"Symbol": str(symbols[i]), metric: round(float(values[i]), 2)} for i in chosen]
+
+    def _sector_mask(self, symbols: np.ndarray, sector: Optional[str], industry: Optional[str]) -> np.ndarray:
+        """Sector/industry filter for arrays keyed by symbol, using the latest universe classification."""
+        if not sector and not industry:
+            return np.ones(len(symbols), dtype=bool)
+        universe_symbols = self.universe_column("Symbol")
+        allowed = universe_symbols[self._universe_filter(sector, industry)]
+        return np.isin(symbols, allowed)
+
+    def series(self, symbol: str, field: str = "close", start: Optional[str] = None,
+               end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        One symbol over time: a candle field (open/high/low/close/volume/turnover) from history,
+        or a universe metric (RS_3M, ...) from the archived sessions.
+        """
+        if field in CANDLE_FIELDS:
+            dates, column = self._array("history", "dates.npy"), self._history_index(symbol)
+            values = self._array("history", field)
+        else:
+            dates = self._array("panel", "sessions.npy")
+            symbols = self._array("panel", "symbols.npy")
+            column = int(np.searchsorted(symbols, symbol.strip().upper()))
+            if column >= len(symbols) or symbols[column] != symbol.strip().upper():
+                raise KeyError(f"No snapshots for {symbol}")
+            values = self._array("panel", field)
+        lo = int(np.searchsorted(dates, np.datetime64(start, "D"))) if start else 0
+        hi = int(np.searchsorted(dates, np.datetime64(end, "D"), side="right")) if end else len(dates)
+        window = values[lo:hi, column]
+        return [{"date": str(d), field: float(v)} for d, v in zip(dates[lo:hi], window) if np.isfinite(v)]
+
+    def sector_aggregate(self, metric: str, by: str = "sector", agg: str = "median") -> List[Dict[str, Any]]:
+        """Per-sector (or per-industry) median/mean/sum/min/max/count of a universe metric, largest first."""
+        groups = self.universe_column(GROUP_COLUMNS[by])
+        values = self.universe_column(metric)
+        if not np.issubdtype(values.dtype, np.number):
+            raise KeyError(f"Not a numeric universe column: {metric}")
+        valid = np.isfinite(values) & (groups != "")
+        names, inverse = np.unique(groups[valid], return_inverse=True)
+        picked = values[valid]
+        reducers = {"median": np.median, "mean": np.mean, "sum": np.sum, "min": np.min, "max": np.max,
+                    "count": len}
+        reduce = reducers[agg]
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(names) + 1))
+        rows = []
+        for i, name in enumerate(names):
+            members = picked[order[bounds[i]:bounds[i + 1]]]
+            rows.append({GROUP_COLUMNS[by]: str(name), f"{agg}_{metric}": round(float(reduce(members)), 2),
+                         "stocks": len(members)})
+        rows.sort(key=lambda r: r[f"{agg}_{metric}"], reverse=True)
+        return rows
+
+    def crossed(self, metric: str, threshold: float, since: str, below: bool = False) -> List[Dict[str, Any]]:
+        """
+        Stocks whose `metric` crossed `threshold` (upwards, or downwards with `below`) between the
+        last archived session before `since` and the latest session.
+        """
+        sessions = self._array("panel", "sessions.npy")
+        if not len(sessions):
+            raise KeyError("No snapshot sessions recorded")
+        start = int(np.searchsorted(sessions, np.datetime64(since, "D"))) - 1
+        if start < 0:
+            raise KeyError(f"No snapshot session before {since}")
+        panel = self._array("panel", metric)
+        before, after = panel[start], panel[-1]
+        hit = (before > threshold) & (after <= threshold) if below else (before < threshold) & (after >= threshold)
+        symbols = self._array("panel", "symbols.npy")
+        return [{"Symbol": str(symbols[i]), f"{metric}_{sessions[start]}": float(before[i]),
+                 f"{metric}_{sessions[-1]}": float(after[i])}
+                for i in np.flatnonzero(hit)]
@@ -0,0 +1,142 @@
+import time
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Request pacing that adapts to the server (AIMD). Healthy responses raise the request rate
+# additively; 429 and 5xx responses (and network errors) cut it multiplicatively and honour
+# Retry-After, so a fetcher settles just below what the host tolerates.
+
+THROTTLE_STATUSES = {429, 503}
+DEFAULT_MIN_RATE = 0.2      # requests/second floor
+DEFAULT_MAX_RATE = 20.0     # requests/second ceiling
+DEFAULT_INCREASE = 0.5      # requests/second gained per second of healthy traffic
+DEFAULT_DECREASE = 0.5      # rate multiplier on a throttle or server error
+MAX_RETRY_AFTER = 300       # seconds; longer server hints are capped
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds to wait. Accepts delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return min(max(0.0, (when - datetime.now(timezone.utc)).total_seconds()), MAX_RETRY_AFTER)
+
+# -------------------------------
+# LIMITER
+# -------------------------------
+
+class AdaptiveRateLimiter:
+    """
+    Paces request starts for one host. wait() blocks until the next slot; record() feeds the
+    outcome back. Thread-safe, so concurrent workers share one budget.
+    """
+
+    def __init__(self, initial_rate: float, min_rate: float = DEFAULT_MIN_RATE,
+                 max_rate: float = DEFAULT_MAX_RATE, increase: float = DEFAULT_INCREASE,
+                 decrease: float = DEFAULT_DECREASE):
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self.min_rate, self.max_rate = min_rate, max_rate
+        self.increase, self.decrease = increase, decrease
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._last_decrease = 0.0
+        self.counters = {"requests": 0, "ok": 0, "throttled": 0, "server_errors": 0,
+                         "client_errors": 0, "network_errors": 0, "retry_after_waits": 0}
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+            self.counters["requests"] += 1
+        if slot > now:
+            time.sleep(slot - now)
+
+    def record(self, response: Optional[requests.Response] = None, error: Optional[BaseException] = None):
+        """Adjusts the rate from a response (or a network error when there is none)."""
+        with self._lock:
+            if response is None:
+                self.counters["network_errors"] += 1
+                self._back_off(None)
+                return
+            status = response.status_code
+            if status in THROTTLE_STATUSES or status >= 500:
+                self.counters["throttled" if status in THROTTLE_STATUSES else "server_errors"] += 1
+                self._back_off(parse_retry_after(response.headers.get("Retry-After")))
+            elif status >= 400:
+                self.counters["client_errors"] += 1  # the request was bad, not the pace
+            else:
+                self.counters["ok"] += 1
+                # Additive increase: +`increase` req/s for every second's worth of healthy requests.
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def _back_off(self, retry_after: Optional[float]):
+        now = time.monotonic()
+        # One cut per interval at the current rate, so a burst of in-flight failures counts once.
+        if now - self._last_decrease >= 1.0 / self.rate:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._last_decrease = now
+        if retry_after:
+            self.counters["retry_after_waits"] += 1
+            self._next_slot = max(self._next_slot, now + retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"rate": round(self.rate, 2), **self.counters}
+
+    def __str__(self) -> str:
+        s = self.stats()
+        return (f"{s['rate']} req/s | {s['requests']} requests, {s['ok']} ok, {s['throttled']} throttled, "
+                f"{s['server_errors']} 5xx, {s['network_errors']} network errors")
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_registry_lock = threading.Lock()
+
+def limiter_for(url: str, initial_rate: float = 5.0, **kwargs: Any) -> AdaptiveRateLimiter:
+    """The shared limiter of the URL's host, created with the given settings on first use."""
+    host = urlsplit(url).netloc
+    with _registry_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter(initial_rate, **kwargs)
+        return _limiters[host]
+
+def limiter_backed_off(error: BaseException) -> bool:
+    """
+    True when paced_get() already slowed the host down for this failure (429/503, 5xx or a
+    network error). Other failures (4xx, an undecodable body) leave the pace alone, so a
+    caller retrying them must wait on its own.
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status in THROTTLE_STATUSES or status >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def paced_get(url: str, limiter: Optional[AdaptiveRateLimiter] = None, **kwargs: Any) -> requests.Response:
+    """
+    requests.get() behind the host's limiter. The outcome is recorded before returning;
+    network errors are recorded and re-raised.
+    """
+    limiter = limiter or limiter_for(url)
+    limiter.wait()
+    try:
+        response = requests.get(url, **kwargs)
+    except requests.exceptions.RequestException as e:
+        limiter.record(error=e)
+        raise
+    limiter.record(response)
+    return response
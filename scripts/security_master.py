@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, date
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from jsonio import dump_file, dumps, load_file
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# One entry per security, keyed by ISIN, remembering every symbol and ISIN it has had.
+# NSE.py feeds it from the EQUITY_L listing, Sector_Industry.py adds StockEdge ids, and the
+# pipelines join through it so a rename or ISIN change never orphans history.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MASTER_FILE = os.path.join(SCRIPT_DIR, "security_master.json")
+
+PLACEHOLDER_ISIN = "XXXXXXXXXXXX"
+
+def _clean(value: Any) -> str:
+    return str(value or "").strip().upper()
+
+def _listing_date(value: str) -> Optional[str]:
+    """EQUITY_L dates look like 06-OCT-2008; stored as YYYY-MM-DD."""
+    try:
+        return datetime.strptime(value.strip(), "%d-%b-%Y").strftime("%Y-%m-%d")
+    except (AttributeError, ValueError):
+        return None
+
+# -------------------------------
+# INDEX
+# -------------------------------
+
+class SecurityMaster:
+    """
+    In-memory view of security_master.json with dict lookups by ISIN (current or past),
+    symbol (current or past) and StockEdge SecurityID.
+    """
+
+    def __init__(self, entries: Optional[List[Dict[str, Any]]] = None):
+        self.entries: List[Dict[str, Any]] = entries or []
+        self._dirty = False
+        self._reindex()
+
+    @classmethod
+    def load(cls, path: str = MASTER_FILE) -> "SecurityMaster":
+        """Loads the master; a missing or unreadable file yields an empty master."""
+        try:
+            return cls(load_file(path))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls()
+
+    def save(self, path: str = MASTER_FILE) -> bool:
+        """
+        Writes the master only when an update changed an entry, so a run that finds the
+        listing as it was leaves no diff. Returns True when the file was written.
+        """
+        if not self._dirty:
+            return False
+        # Sorted by ISIN so the committed file diffs line by line between runs.
+        self.entries.sort(key=lambda e: e["isin"])
+        dump_file(self.entries, path)
+        self._dirty = False
+        return True
+
+    def _reindex(self):
+        self._by_isin: Dict[str, Dict[str, Any]] = {}
+        self._by_symbol: Dict[str, Dict[str, Any]] = {}
+        self._by_past_symbol: Dict[str, Dict[str, Any]] = {}
+        self._by_security_id: Dict[str, Dict[str, Any]] = {}
+        for entry in self.entries:
+            self._index(entry)
+
+    def _index(self, entry: Dict[str, Any]):
+        for old in entry.get("past_isins", []):
+            self._by_isin.setdefault(old, entry)
+        self._by_isin[entry["isin"]] = entry
+        for old in entry.get("past_symbols", []):
+            self._by_past_symbol[old] = entry
+        if entry.get("symbol"):
+            self._by_symbol[entry["symbol"]] = entry
+        if entry.get("security_id") is not None:
+            self._by_security_id[str(entry["security_id"])] = entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def listed_isins(rows: Iterable[Dict[str, Any]]) -> Set[str]:
+        """ISINs present in one NSE.json listing. Entries are never removed from the master, so
+        a delisted or suspended security still resolves; this tells them apart."""
+        return {_clean(row.get("isin")) for row in rows if _clean(row.get("isin")) not in ("", PLACEHOLDER_ISIN)}
+
+    # --- Lookups ---
+
+    def by_isin(self, isin: str) -> Optional[Dict[str, Any]]:
+        return self._by_isin.get(_clean(isin))
+
+    def by_symbol(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Current symbol first; a symbol the security traded under earlier also resolves."""
+        symbol = _clean(symbol)
+        return self._by_symbol.get(symbol) or self._by_past_symbol.get(symbol)
+
+    def by_security_id(self, security_id: Any) -> Optional[Dict[str, Any]]:
+        return self._by_security_id.get(str(security_id)) if security_id is not None else None
+
+    def isin_for(self, symbol: str) -> Optional[str]:
+        entry = self.by_symbol(symbol)
+        return entry["isin"] if entry else None
+
+    def canonical_isin(self, isin: str) -> str:
+        """The security's current ISIN, or the input unchanged when it is unknown."""
+        entry = self.by_isin(isin)
+        return entry["isin"] if entry else _clean(isin)
+
+    def canonical_symbol(self, symbol: str) -> str:
+        """The security's current symbol, or the input unchanged when it is unknown."""
+        entry = self.by_symbol(symbol)
+        return entry["symbol"] if entry and entry.get("symbol") else _clean(symbol)
+
+    def resolve_isin(self, isin: Optional[str], symbol: Optional[str] = None) -> Optional[str]:
+        """Join key for a row carrying an ISIN and/or a symbol: the current ISIN of that security."""
+        if isin and _clean(isin) != PLACEHOLDER_ISIN:
+            return self.canonical_isin(isin)
+        return self.isin_for(symbol) if symbol else None
+
+    def index_history(self, historical_data: List[Dict[str, Any]]) -> Dict[str, List[list]]:
+        """Candles of stock_historical_universe.json keyed by current ISIN."""
+        index = {}
+        for item in historical_data:
+            key = self.resolve_isin(item.get("INECODE"), item.get("Symbol"))
+            if key and "candles" in item:
+                index[key] = item["candles"]
+        return index
+
+    # --- Incremental updates ---
+
+    def update_from_nse(self, rows: Iterable[Dict[str, Any]], today: Optional[date] = None) -> List[Dict[str, str]]:
+        """
+        Applies one NSE.json listing (trading_symbol, isin, series, date_of_listing,
+        name_of_company). Returns the renames and ISIN changes detected, as
+        {"type", "isin", "old", "new"} dicts.
+        """
+        today_str = (today or datetime.today().date()).strftime("%Y-%m-%d")
+        listing = {}
+        for row in rows:
+            isin, symbol = _clean(row.get("isin")), _clean(row.get("trading_symbol"))
+            if isin and symbol and isin != PLACEHOLDER_ISIN:
+                listing[isin] = (symbol, row)
+
+        events = []
+        unknown = []
+        # Known ISINs first, so a symbol freed by a rename is released before it is reused.
+        for isin, (symbol, row) in listing.items():
+            entry = self._by_isin.get(isin)
+            if entry is None or entry["isin"] != isin:
+                unknown.append(isin)
+                continue
+            if entry.get("symbol") != symbol:
+                events.append({"type": "rename", "isin": isin, "old": entry.get("symbol"), "new": symbol})
+                self._rename(entry, symbol)
+            self._dirty |= self._apply_row(entry, row)
+
+        for isin in unknown:
+            symbol, row = listing[isin]
+            previous = self._by_symbol.get(symbol)
+            if previous is not None and previous["isin"] not in listing:
+                # Same symbol, new ISIN, old ISIN gone from the listing: a re-issued ISIN.
+                events.append({"type": "isin_change", "isin": isin, "old": previous["isin"], "new": isin})
+                previous.setdefault("past_isins", []).append(previous["isin"])
+                previous["isin"] = isin
+                entry = previous
+            else:
+                entry = {"isin": isin, "symbol": symbol, "past_symbols": [], "past_isins": [], "first_seen": today_str}
+                self.entries.append(entry)
+            self._apply_row(entry, row)
+            self._index(entry)
+            self._dirty = True
+
+        if events:
+            self._dirty = True
+            self._reindex()
+        return events
+
+    def update_from_stockedge(self, stocks: Iterable[Dict[str, Any]]) -> int:
+        """Attaches StockEdge SecurityID/ListingID to known securities. Returns the count attached."""
+        attached = 0
+        for stock in stocks:
+            entry = self._by_isin.get(_clean(stock.get("INECODE"))) or self.by_symbol(stock.get("Symbol"))
+            if entry is None or stock.get("SecurityID") is None:
+                continue
+            if entry.get("security_id") != stock["SecurityID"]:
+                entry["security_id"] = stock["SecurityID"]
+                self._by_security_id[str(stock["SecurityID"])] = entry
+                attached += 1
+            if stock.get("ListingID") not in (None, "N/A") and entry.get("listing_id") != stock["ListingID"]:
+                entry["listing_id"] = stock["ListingID"]
+                self._dirty = True
+        if attached:
+            self._dirty = True
+        return attached
+
+    def _rename(self, entry: Dict[str, Any], symbol: str):
+        old = entry.get("symbol")
+        if old and old not in entry.setdefault("past_symbols", []):
+            entry["past_symbols"].append(old)
+        if symbol in entry["past_symbols"]:
+            entry["past_symbols"].remove(symbol)  # renamed back
+        entry["symbol"] = symbol
+        self._by_symbol.pop(old, None)
+        self._by_symbol[symbol] = entry
+
+    @staticmethod
+    def _apply_row(entry: Dict[str, Any], row: Dict[str, Any]) -> bool:
+        """Copies the listing's descriptive fields onto the entry. Returns True when any changed."""
+        fields = {
+            "name": (row.get("name_of_company") or entry.get("name") or "").strip(),
+            "series": (row.get("series") or entry.get("series") or "").strip(),
+            "listing_date": _listing_date(row.get("date_of_listing", "")) or entry.get("listing_date"),
+        }
+        changed = any(entry.get(key) != value for key, value in fields.items())
+        entry.update(fields)
+        return changed
+
+    # --- Remapping ---
+
+    def remap_history(self, historical_data: List[Dict[str, Any]]) -> int:
+        """
+        Re-keys stock_historical_universe.json entries stored under a past ISIN or symbol to
+        the security's current ones, in place. Returns the number of entries re-keyed.
+        """
+        remapped = 0
+        for entry in historical_data:
+            inecode = entry.get("INECODE")
+            current = self.by_isin(inecode) if inecode else self.by_symbol(entry.get("Symbol"))
+            if current is None:
+                continue
+            if entry.get("INECODE") != current["isin"] or entry.get("Symbol") != current["symbol"]:
+                entry["INECODE"], entry["Symbol"] = current["isin"], current["symbol"]
+                remapped += 1
+        return remapped
+
+# -------------------------------
+# COMMAND LINE
+# -------------------------------
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Look up or rebuild the security master index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_lookup = sub.add_parser("lookup", help="Resolve a symbol, ISIN or SecurityID (current or past).")
+    p_lookup.add_argument("key")
+    p_update = sub.add_parser("update", help="Apply an NSE.json listing to the master.")
+    p_update.add_argument("--nse", default=os.path.join(SCRIPT_DIR, "NSE.json"))
+    args = parser.parse_args(argv)
+
+    master = SecurityMaster.load()
+    if args.command == "lookup":
+        entry = master.by_isin(args.key) or master.by_symbol(args.key) or master.by_security_id(args.key)
+        sys.stdout.write(dumps(entry, indent=True).decode("utf-8") + "\n")
+        return
+    events = master.update_from_nse(load_file(args.nse))
+    master.save()
+    for event in events:
+        print(f"🔁 {event['type']}: {event['old']} → {event['new']} ({event['isin']})")
+    print(f"✅ Security master holds {len(master)} securities ({len(events)} changes).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from jsonio import dumps, load_file, load_file_as
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Diff-friendly layout for the large JSON stores committed by the workflows. Rows are sorted
+# by key and written one compact row per line, split into shards by the key's first
+# character, with a manifest.json listing every shard's row count and content hash. A row
+# that carries a long, growing list (a symbol's candles) can have that list expanded one
+# element per line, so appending an element changes one line instead of the whole row. A
+# write only replaces the files whose bytes changed, so a commit touches just those shards
+# and git packs deltas against the previous version of each.
+
+MANIFEST_FILE = "manifest.json"
+
+# -------------------------------
+# ENCODING
+# -------------------------------
+
+def shard_of(key: Any) -> str:
+    """Shard name of a row key: its first letter, "0" for digits, "_" for anything else."""
+    first = str(key or "")[:1].lower()
+    if first.isascii() and first.isalpha():
+        return first
+    return "0" if first.isdigit() else "_"
+
+def _encode_expanded(row: Dict[str, Any], expand: str) -> bytes:
+    """One row with its `expand` list moved last and written one element per line."""
+    items = row.get(expand)
+    if not isinstance(items, list):
+        return dumps(row)
+    head = dumps({k: v for k, v in row.items() if k != expand})[:-1]
+    head += b"," if len(head) > 1 else b""
+    body = b",\n".join(dumps(item) for item in items)
+    return head + dumps(expand) + (b":[\n" + body + b"\n]}" if items else b":[]}")
+
+def encode_rows(rows: Iterable[Any], expand: Optional[str] = None) -> bytes:
+    """
+    A JSON array with one compact row per line: still plain JSON, but diffed row by row.
+    With `expand`, that list field of each row is written one element per line instead.
+    """
+    lines = [_encode_expanded(row, expand) if expand else dumps(row) for row in rows]
+    return b"[\n" + b",\n".join(lines) + b"\n]\n" if lines else b"[]\n"
+
+def write_if_changed(raw: bytes, path: str) -> bool:
+    """Atomically replaces `path` with `raw` unless it already holds exactly those bytes."""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == raw:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+    return True
+
+# -------------------------------
+# SHARDED STORE
+# -------------------------------
+
+def write_sharded(rows: Iterable[Dict[str, Any]], out_dir: str, key: str = "Symbol",
+                  expand: Optional[str] = None) -> Dict[str, int]:
+    """
+    Writes rows to out_dir/<shard>.json plus the manifest, leaving unchanged shards untouched
+    and removing shards that no longer have rows. `expand` is passed to encode_rows().
+    Returns {"shards", "written", "removed"}.
+    """
+    shards: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in sorted(rows, key=lambda r: str(r.get(key) or "")):
+        shards[shard_of(row.get(key))].append(row)
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest: Dict[str, Any] = {"key": key, "shards": {}}
+    written = 0
+    for name in sorted(shards):
+        raw = encode_rows(shards[name], expand)
+        written += write_if_changed(raw, os.path.join(out_dir, f"{name}.json"))
+        manifest["shards"][name] = {"rows": len(shards[name]), "sha1": hashlib.sha1(raw).hexdigest()[:16]}
+
+    removed = 0
+    for file_name in os.listdir(out_dir):
+        name, ext = os.path.splitext(file_name)
+        if ext == ".json" and file_name != MANIFEST_FILE and name not in shards:
+            os.remove(os.path.join(out_dir, file_name))
+            removed += 1
+    write_if_changed(dumps(manifest, indent=True) + b"\n", os.path.join(out_dir, MANIFEST_FILE))
+    return {"shards": len(shards), "written": written, "removed": removed}
+
+def read_sharded(in_dir: str, schema: Optional[str] = None) -> Optional[List[Any]]:
+    """All rows of a sharded store in key order, or None when in_dir holds no manifest."""
+    try:
+        manifest = load_file(os.path.join(in_dir, MANIFEST_FILE))
+    except FileNotFoundError:
+        return None
+    rows: List[Any] = []
+    for name in manifest.get("shards", {}):
+        path = os.path.join(in_dir, f"{name}.json")
+        rows.extend(load_file_as(path, schema) if schema else load_file(path))
+    return rows
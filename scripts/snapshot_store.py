@@ -0,0 +1,236 @@
+import os
+import sys
+import gzip
+import json
+import logging
+import argparse
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from zoneinfo import ZoneInfo
+
+from jsonio import dumps, loads
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(SCRIPT_DIR, "snapshots")
+
+IST = ZoneInfo("Asia/Kolkata")  # session dates and capture times are both exchange-local
+
+FINAL_FILE_NAME = "universe.json.gz"
+INTRADAY_DIR_NAME = "intraday"
+
+# Metrics compared by day_over_day_changes() when none are requested explicitly.
+DEFAULT_CHANGE_METRICS = ["current_price", "change_percentage", "RS_3M", "RS_6M", "Tomcap", "TurnoverSMA20"]
+
+# -------------------------------
+# HELPER FUNCTIONS
+# -------------------------------
+
+def _partition_dir(session_date: str, snapshot_dir: str) -> str:
+    """Each trading session gets its own date-named partition directory."""
+    return os.path.join(snapshot_dir, session_date)
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Converts a list of row dicts into a columnar payload.
+    Column order follows first appearance so the layout is stable between runs.
+    """
+    columns: List[str] = []
+    seen = set()
+    for rec in records:
+        for key in rec:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    data = [[rec.get(col) for rec in records] for col in columns]
+    return {"columns": columns, "rows": len(records), "data": data}
+
+def columns_to_records(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inverse of records_to_columns()."""
+    columns = payload.get("columns", [])
+    data = payload.get("data", [])
+    return [dict(zip(columns, row)) for row in zip(*data)]
+
+def _write_gzip_json(payload: Dict[str, Any], path: str):
+    """Writes gzip-compressed JSON atomically (temp file + rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    raw = dumps(payload)
+    # mtime=0 keeps the gzip header stable so identical content yields identical bytes.
+    with open(tmp_path, "wb") as f:
+        with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=9, mtime=0) as gz:
+            gz.write(raw)
+    os.replace(tmp_path, path)
+
+def _read_gzip_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with gzip.open(path, "rb") as f:
+            return loads(f.read())
+    except FileNotFoundError:
+        logging.warning(f"Snapshot not found at {path}.")
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"Could not read snapshot {path}: {e}")
+    return None
+
+# -------------------------------
+# WRITE PATH
+# -------------------------------
+
+def record_snapshot(records: List[Dict[str, Any]], session_date: str, snapshot_dir: str = SNAPSHOT_DIR,
+                    intraday: bool = False, captured_at: Optional[datetime] = None,
+                    meta: Optional[Dict[str, Any]] = None, final: bool = True) -> Optional[str]:
+    """
+    Stores the universe for a session. The session's final file is replaced when its
+    content changes (the last run of the day wins), earlier sessions are never touched.
+    With intraday=True a timestamped version is kept as well; final=False keeps only that.
+    `meta` (e.g. the quality gate's verdict) is stored alongside the columns.
+    """
+    if not records:
+        logging.warning("No records to snapshot. Skipping.")
+        return None
+    sessions = list_sessions(snapshot_dir)
+    if sessions and session_date < sessions[-1]:
+        logging.warning(f"Session {session_date} is older than the recorded session {sessions[-1]}. Skipping.")
+        return None
+
+    captured_at = captured_at.astimezone(IST) if captured_at else datetime.now(IST)
+    payload = records_to_columns(records)
+    payload["session_date"] = session_date
+    payload["captured_at"] = captured_at.strftime("%Y-%m-%d %H:%M:%S")
+    payload.update(meta or {})
+
+    partition = _partition_dir(session_date, snapshot_dir)
+    final_path = os.path.join(partition, FINAL_FILE_NAME)
+    if intraday:
+        intraday_path = os.path.join(partition, INTRADAY_DIR_NAME, captured_at.strftime("%H%M%S") + ".json.gz")
+        _write_gzip_json(payload, intraday_path)
+    if not final:
+        return intraday_path if intraday else None
+
+    stored = _read_gzip_json(final_path) if os.path.isfile(final_path) else None
+    if stored and all(stored.get(key) == value for key, value in payload.items() if key != "captured_at"):
+        logging.info(f"  Snapshot of session {session_date} unchanged; nothing written.")
+        return final_path
+    _write_gzip_json(payload, final_path)
+    logging.info(f"  Snapshot of {len(records)} stocks recorded for session {session_date}.")
+    return final_path
+
+# -------------------------------
+# READ PATH
+# -------------------------------
+
+def list_sessions(snapshot_dir: str = SNAPSHOT_DIR) -> List[str]:
+    """Returns all session dates with a final snapshot, oldest first."""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(snapshot_dir)
+        if os.path.isfile(os.path.join(snapshot_dir, name, FINAL_FILE_NAME))
+    )
+
+def list_intraday_versions(session_date: str, snapshot_dir: str = SNAPSHOT_DIR) -> List[str]:
+    """Returns the HHMMSS labels of intraday versions for a session, oldest first."""
+    intraday_dir = os.path.join(_partition_dir(session_date, snapshot_dir), INTRADAY_DIR_NAME)
+    if not os.path.isdir(intraday_dir):
+        return []
+    return sorted(name[:-len(".json.gz")] for name in os.listdir(intraday_dir) if name.endswith(".json.gz"))
+
+def resolve_session(as_of: str, snapshot_dir: str = SNAPSHOT_DIR) -> Optional[str]:
+    """Finds the latest recorded session on or before the given YYYY-MM-DD date."""
+    candidates = [d for d in list_sessions(snapshot_dir) if d <= as_of]
+    return candidates[-1] if candidates else None
+
+def load_session_columns(session_date: str, snapshot_dir: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """The columnar payload (see records_to_columns) of a session's final snapshot."""
+    return _read_gzip_json(os.path.join(_partition_dir(session_date, snapshot_dir), FINAL_FILE_NAME))
+
+def load_universe_as_of(as_of: str, snapshot_dir: str = SNAPSHOT_DIR, intraday_time: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Returns the universe as it was published at the end of the latest session on or
+    before `as_of`. Pass intraday_time (HHMMSS) to read a specific intraday version of
+    that exact session instead.
+    """
+    if intraday_time:
+        path = os.path.join(_partition_dir(as_of, snapshot_dir), INTRADAY_DIR_NAME, intraday_time + ".json.gz")
+    else:
+        session = resolve_session(as_of, snapshot_dir)
+        if not session:
+            logging.warning(f"No snapshot recorded on or before {as_of}.")
+            return []
+        path = os.path.join(_partition_dir(session, snapshot_dir), FINAL_FILE_NAME)
+
+    payload = _read_gzip_json(path)
+    return columns_to_records(payload) if payload else []
+
+def day_over_day_changes(as_of: str, metrics: Optional[List[str]] = None,
+                         snapshot_dir: str = SNAPSHOT_DIR) -> List[Dict[str, Any]]:
+    """
+    Compares the session resolved for `as_of` with the session recorded before it.
+    Each row carries the current value, previous value and absolute change per metric;
+    changes are None where either side is missing or non-numeric.
+    """
+    metrics = metrics or DEFAULT_CHANGE_METRICS
+    sessions = list_sessions(snapshot_dir)
+    session = resolve_session(as_of, snapshot_dir)
+    if not session:
+        logging.warning(f"No snapshot recorded on or before {as_of}.")
+        return []
+    idx = sessions.index(session)
+    if idx == 0:
+        logging.warning(f"No session recorded before {session}; nothing to compare against.")
+        return []
+
+    current = load_universe_as_of(session, snapshot_dir)
+    previous = {rec.get("Symbol"): rec for rec in load_universe_as_of(sessions[idx - 1], snapshot_dir)}
+
+    changes = []
+    for rec in current:
+        symbol = rec.get("Symbol")
+        prev = previous.get(symbol, {})
+        row: Dict[str, Any] = {"Symbol": symbol}
+        for metric in metrics:
+            cur_val, prev_val = rec.get(metric), prev.get(metric)
+            row[metric] = cur_val
+            row[f"prev_{metric}"] = prev_val
+            if isinstance(cur_val, (int, float)) and isinstance(prev_val, (int, float)):
+                row[f"{metric}_change"] = round(cur_val - prev_val, 2)
+            else:
+                row[f"{metric}_change"] = None
+        changes.append(row)
+    return changes
+
+# -------------------------------
+# COMMAND LINE
+# -------------------------------
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Read archived stock universe snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("sessions", help="List recorded sessions.")
+
+    p_asof = sub.add_parser("as-of", help="Print the universe as of a date.")
+    p_asof.add_argument("date", help="YYYY-MM-DD")
+    p_asof.add_argument("--time", help="Intraday version (HHMMSS) of that exact session.")
+
+    p_changes = sub.add_parser("changes", help="Print day-over-day metric changes.")
+    p_changes.add_argument("date", help="YYYY-MM-DD")
+    p_changes.add_argument("--metric", action="append", help="Metric to compare (repeatable).")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "sessions":
+        result: Any = list_sessions()
+    elif args.command == "as-of":
+        result = load_universe_as_of(args.date, intraday_time=args.time)
+    else:
+        result = day_over_day_changes(args.date, args.metric)
+
+    sys.stdout.write(dumps(result, indent=True).decode("utf-8") + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+# -------------------------------
+# SCHEMA
+# -------------------------------
+# One row of static/data/stock_universe.json. Every live source (live_sources.py) yields
+# StockRecord objects and Daily_Data.py enriches and publishes them, so the published
+# columns, their order and their names are defined here and nowhere else.
+
+class Column(NamedTuple):
+    attr: str    # StockRecord attribute
+    name: str    # Key in the published JSON
+    dtype: str   # "str", "int" or "float"
+
+COLUMNS = (
+    Column("symbol", "Symbol", "str"),
+    Column("close", "current_price", "float"),
+    Column("high", "day_high", "float"),
+    Column("low", "day_low", "float"),
+    Column("volume", "day_volume", "int"),
+    Column("change_pct", "change_percentage", "float"),
+    Column("sector_name", "Sector Name", "str"),
+    Column("industry_name", "Industry Name", "str"),
+    Column("stock_name", "Stock Name", "str"),
+    Column("market_cap", "Market Cap", "float"),
+    Column("inecode", "INECODE", "str"),
+    Column("circuit_limit", "circuitLimit", "int"),
+    Column("fifty_two_week_high", "fifty_two_week_high", "float"),
+    Column("fifty_two_week_low", "fifty_two_week_low", "float"),
+    Column("down_from_high_pct", "Down from 52W High (%)", "float"),
+    Column("up_from_low_pct", "Up from 52W Low (%)", "float"),
+    Column("turnover", "turnover", "float"),
+    Column("turnover_sma20", "TurnoverSMA20", "float"),
+    Column("tomcap", "Tomcap", "float"),
+    Column("rs_3m", "RS_3M", "int"),
+    Column("rs_6m", "RS_6M", "int"),
+)
+
+OUTPUT_NAMES = [col.name for col in COLUMNS]
+
+# Sector_Industry.json keys copied onto a record by apply_sector(). Other keys in that
+# file (SecurityID, ListingID, ...) are not part of the published universe.
+SECTOR_FIELDS = {
+    "Sector Name": "sector_name",
+    "Industry Name": "industry_name",
+    "Stock Name": "stock_name",
+    "Market Cap": "market_cap",
+    "INECODE": "inecode",
+}
+
+@dataclass(slots=True)
+class StockRecord:
+    """
+    A stock moving through the enrichment stages. Attributes not listed in COLUMNS
+    (open, rs_3m_value, rs_6m_value) are working values and are never published.
+    """
+    symbol: str
+    close: Any = None
+    high: Any = None
+    low: Any = None
+    volume: Any = None
+    open: Any = None
+    change_pct: Any = None
+    sector_name: Optional[str] = None
+    industry_name: Optional[str] = None
+    stock_name: Optional[str] = None
+    market_cap: Optional[float] = None
+    inecode: Optional[str] = None
+    circuit_limit: Any = None
+    fifty_two_week_high: Optional[float] = None
+    fifty_two_week_low: Optional[float] = None
+    down_from_high_pct: Optional[float] = None
+    up_from_low_pct: Optional[float] = None
+    turnover: Optional[float] = None
+    turnover_sma20: Optional[float] = None
+    tomcap: Optional[float] = None
+    rs_3m: Optional[int] = None
+    rs_6m: Optional[int] = None
+    rs_3m_value: Optional[float] = None
+    rs_6m_value: Optional[float] = None
+
+    def apply_sector(self, sector_info: Dict[str, Any]):
+        """Copies the Sector_Industry.json fields of this symbol onto the record."""
+        for key, attr in SECTOR_FIELDS.items():
+            if key in sector_info:
+                setattr(self, attr, sector_info[key])
+
+    def to_output(self) -> Dict[str, Any]:
+        """
+        The published JSON row: schema order and names, numbers coerced to the column
+        dtype and non-finite floats as None. %change is rounded to 2 decimals and
+        reported as 0 when it is not finite.
+        """
+        row = {}
+        for col in COLUMNS:
+            row[col.name] = _coerce(getattr(self, col.attr), col)
+        return row
+
+def _coerce(value: Any, col: Column) -> Any:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if isinstance(value, float) and not math.isfinite(value):
+        return 0 if col.attr == "change_pct" else None
+    if col.attr == "change_pct":
+        return round(value, 2)
+    if col.dtype == "float":
+        return float(value)
+    if col.dtype == "int" and isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def records_to_output(records: Iterable[StockRecord]) -> List[Dict[str, Any]]:
+    return [rec.to_output() for rec in records]
@@ -0,0 +1,286 @@
+import os
+import gzip
+import time
+import hashlib
+import logging
+import requests
+import numpy as np
+from itertools import compress
+from operator import itemgetter
+from datetime import date, datetime, timedelta, time as dtime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from jsonio import decode_as, dumps, load_file, response_json_as
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+
+# Live/closing state of the whole universe for a session.
+LAST_TRADED_STATE_URL = "https://api-v2.strike.money/v3/market/api/equity/last-traded-state?securities=EQ%3A*&onlyFaoStocks=false&lastTradedTime={date}"
+
+# Full-universe daily candle for a past session.
+PRICETICKS_URL = "https://api-v2.strike.money/v3/market/api/equity/priceticks?securities=EQ%3A*&onlyFaoStocks=false&candleInterval=1d&dateTimes={date}"
+
+# Downloaded universe snapshots are cached on disk, keyed by endpoint + session date, so
+# scripts running close together (circuitlimit, Daily_Data, Historical_Data) share one download.
+SNAPSHOT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "strike")
+SNAPSHOT_TTL_SECONDS = 60        # Lifetime of a snapshot taken while the market is open
+SNAPSHOT_CACHE_MAX_AGE_DAYS = 3  # Cache files older than this are pruned
+
+IST = ZoneInfo("Asia/Kolkata")
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+
+# Column layout used when a response carries no "fields" list (priceticks candles).
+DEFAULT_CANDLE_FIELDS = ["dateTime", "open", "high", "low", "close", "volume"]
+
+# Output column -> accepted Strike field names, in order of preference.
+OHLCV_COLUMNS = {
+    "open": ("dayOpen", "open"),
+    "high": ("dayHigh", "high"),
+    "low": ("dayLow", "low"),
+    "close": ("dayClose", "close"),
+    "volume": ("dayVolume", "volume"),
+}
+
+# -------------------------------
+# FETCHING
+# -------------------------------
+
+def is_market_open(moment: datetime) -> bool:
+    """True on weekdays between the 09:15 open and 15:30 close (IST). Exchange holidays are not known here."""
+    moment = moment.astimezone(IST)
+    return moment.weekday() < 5 and MARKET_OPEN <= moment.time() < MARKET_CLOSE
+
+def snapshot_expiry(fetched_at: datetime, session_date: str, ttl: int) -> datetime:
+    """
+    When a cached snapshot stops being valid. Past sessions never change; a snapshot taken
+    during market hours lives `ttl` seconds; one taken outside market hours stays valid
+    until the next open because nothing trades in between.
+    """
+    fetched_at = fetched_at.astimezone(IST)
+    if session_date < fetched_at.strftime("%Y-%m-%d"):
+        return datetime.max.replace(tzinfo=IST)
+    if is_market_open(fetched_at):
+        return fetched_at + timedelta(seconds=ttl)
+    next_open = datetime.combine(fetched_at.date(), MARKET_OPEN, tzinfo=IST)
+    if fetched_at >= next_open:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return next_open
+
+def _snapshot_key(url_template: str, date_str: str) -> str:
+    endpoint = url_template.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    digest = hashlib.sha1(url_template.encode("utf-8")).hexdigest()[:8]
+    return f"{endpoint}_{date_str}_{digest}"
+
+def _prune_snapshot_cache(cache_dir: str):
+    cutoff = time.time() - SNAPSHOT_CACHE_MAX_AGE_DAYS * 86400
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass  # pruned by a concurrent fetch
+
+# Snapshots already parsed by this process: key -> (expiry, payload)
+_parsed_snapshots: Dict[str, Tuple[datetime, Dict[str, Any]]] = {}
+
+def fetch_snapshot(url_template: str, date_str: str, ttl: int = SNAPSHOT_TTL_SECONDS,
+                   cache_dir: str = SNAPSHOT_CACHE_DIR) -> Dict[str, Any]:
+    """
+    Returns the parsed full-universe response for `date_str`, downloading it only when no
+    valid copy exists in this process or in the on-disk cache. Network and decode errors
+    raise requests exceptions, as with a direct requests.get().
+    """
+    key = _snapshot_key(url_template, date_str)
+    now = datetime.now(IST)
+
+    cached = _parsed_snapshots.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    data_path = os.path.join(cache_dir, key + ".json.gz")
+    meta_path = os.path.join(cache_dir, key + ".meta.json")
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        try:
+            meta = load_file(meta_path)
+            expiry = snapshot_expiry(datetime.fromtimestamp(meta["fetched_at"], IST), date_str, ttl)
+            if expiry > now:
+                with open(data_path, "rb") as f:
+                    payload = decode_as(gzip.decompress(f.read()), "strike")
+                logging.info(f"  Using cached snapshot {key} (fetched {datetime.fromtimestamp(meta['fetched_at'], IST):%H:%M:%S}).")
+                _parsed_snapshots[key] = (expiry, payload)
+                return payload
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"  Ignoring unreadable snapshot cache {key}: {e}")
+
+    response = requests.get(url_template.format(date=date_str), timeout=30)
+    response.raise_for_status()
+    payload = response_json_as(response, "strike")
+    fetched_at = time.time()
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _prune_snapshot_cache(cache_dir)
+        with open(data_path + ".tmp", "wb") as f:
+            f.write(gzip.compress(response.content, compresslevel=5, mtime=0))
+        os.replace(data_path + ".tmp", data_path)
+        with open(meta_path, "wb") as f:
+            f.write(dumps({"url": url_template, "session_date": date_str, "fetched_at": fetched_at}))
+    except OSError as e:
+        logging.warning(f"  Could not cache snapshot {key}: {e}")
+
+    _parsed_snapshots[key] = (snapshot_expiry(datetime.fromtimestamp(fetched_at, IST), date_str, ttl), payload)
+    return payload
+
+def find_valid_trading_day_data(start_date: date, url_template: str, max_lookback_days: int = 30,
+                                ttl: int = SNAPSHOT_TTL_SECONDS) -> Tuple[Optional[date], Optional[Dict[str, Any]]]:
+    """
+    Looks back day-by-day from a start date to find the first day with valid API data.
+    Responses go through the shared snapshot cache (see fetch_snapshot).
+    """
+    logging.info(f"Searching for data using template: {url_template[:60]}...")
+    current_date = start_date
+    for _ in range(max_lookback_days):
+        date_str = current_date.strftime("%Y-%m-%d")
+        try:
+            data = fetch_snapshot(url_template, date_str, ttl)
+
+            ticks_new = data.get("data", {}).get("current", {}).get("ticks")
+            ticks_old = data.get("data", {}).get("ticks")
+
+            if ticks_new or ticks_old:
+                logging.info(f"  SUCCESS: Found valid trading data for date: {date_str}")
+                return current_date, data
+            else:
+                logging.info(f"  No trades found for {date_str}, looking back...")
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"  Could not fetch data for {date_str} ({e}), looking back...")
+
+        current_date -= timedelta(days=1)
+
+    logging.error(f"FATAL: Could not find any trading data after looking back {max_lookback_days} days.")
+    return None, None
+
+# -------------------------------
+# DECODING
+# -------------------------------
+
+def get_fields_and_ticks(data: Dict[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+    """Returns (fields, ticks) for both the `data.current` and the legacy flat `data` shapes."""
+    api_data = data.get("data", {}) or {}
+    inner = api_data["current"] if isinstance(api_data.get("current"), dict) else api_data
+    return inner.get("fields") or [], inner.get("ticks") or {}
+
+class DecodedTicks(NamedTuple):
+    """Column-wise view of a Strike response: row i of every array belongs to symbols[i]."""
+    symbols: np.ndarray                # str array
+    numeric: Dict[str, np.ndarray]     # float64 arrays, NaN where missing or non-numeric
+    raw: Dict[str, List[Any]]          # values passed through untouched (dates, bands)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+def _field_index(fields: Sequence[str], names: Sequence[str]) -> Optional[int]:
+    for name in names:
+        if name in fields:
+            return fields.index(name)
+    return None
+
+def _to_float_column(values: List[Any]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)  # None becomes NaN
+    except (TypeError, ValueError):
+        return np.array([v if isinstance(v, (int, float)) else np.nan for v in values], dtype=np.float64)
+
+def decode_ticks(data: Dict[str, Any], numeric_columns: Dict[str, Sequence[str]],
+                 raw_columns: Optional[Dict[str, Sequence[str]]] = None,
+                 default_fields: Optional[List[str]] = None, keep_numeric_raw: bool = False) -> DecodedTicks:
+    """
+    Decodes the latest row of every symbol in a Strike fields/ticks payload into parallel
+    columns. Field indices are resolved once per response; both the `data.current` and the
+    legacy flat `data` shapes are accepted. Columns whose fields are absent come back all-NaN/None.
+    With keep_numeric_raw, `raw` also holds each numeric column's untouched values.
+    """
+    fields, ticks = get_fields_and_ticks(data)
+    fields = fields or default_fields or []
+    raw_columns = raw_columns or {}
+
+    symbols, rows = [], []
+    for symbol, tick_data in ticks.items():
+        if tick_data and isinstance(tick_data, list) and isinstance(tick_data[0], list):
+            symbols.append(symbol)
+            rows.append(tick_data[0])
+
+    wanted = {name: _field_index(fields, aliases) for name, aliases in {**numeric_columns, **raw_columns}.items()}
+    present = [idx for idx in wanted.values() if idx is not None]
+    width = max(present) + 1 if present else 0
+    if any(len(row) < width for row in rows):
+        rows = [row if len(row) >= width else row + [None] * (width - len(row)) for row in rows]
+
+    def column(idx: Optional[int]) -> List[Any]:
+        if idx is None:
+            return [None] * len(rows)
+        return list(map(itemgetter(idx), rows))
+
+    numeric, raw = {}, {}
+    for name in numeric_columns:
+        values = column(wanted[name])
+        numeric[name] = _to_float_column(values)
+        if keep_numeric_raw:
+            raw[name] = values
+    raw.update({name: column(wanted[name]) for name in raw_columns})
+    return DecodedTicks(np.array(symbols, dtype=str), numeric, raw)
+
+def align_to(symbols: np.ndarray, other_symbols: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Reorders `values` (parallel to other_symbols) to follow `symbols`; NaN where a symbol is missing."""
+    result = np.full(len(symbols), np.nan)
+    if len(other_symbols) == 0 or len(symbols) == 0:
+        return result
+    order = np.argsort(other_symbols)
+    sorted_symbols = other_symbols[order]
+    pos = np.clip(np.searchsorted(sorted_symbols, symbols), 0, len(sorted_symbols) - 1)
+    found = sorted_symbols[pos] == symbols
+    result[found] = values[order][pos[found]]
+    return result
+
+def to_python(values: np.ndarray, raw: Sequence[Any]) -> List[Any]:
+    """
+    JSON-friendly values of a decoded column: the payload's own value (so integer prices stay
+    integers), or None where the float column is NaN (missing or non-numeric).
+    """
+    return [r if v == v else None for v, r in zip(values.tolist(), raw)]
+
+def extract_daily_bars(data: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Converts a full-universe Strike response into one daily candle per symbol, shaped
+    like the Upstox candles kept in the history store: [timestamp, open, high, low, close, volume, oi].
+    """
+    decoded = decode_ticks(data, OHLCV_COLUMNS, {"dateTime": ("dateTime",)}, default_fields=DEFAULT_CANDLE_FIELDS,
+                           keep_numeric_raw=True)
+    close = decoded.numeric["close"]
+    keep = np.isfinite(close) & np.array([d is not None for d in decoded.raw["dateTime"]], dtype=bool)
+    if len(decoded) and not keep.any():
+        logging.error("  Strike response has no usable candles.")
+
+    columns = [to_python(decoded.numeric[name][keep], list(compress(decoded.raw[name], keep)))
+               for name in ("open", "high", "low", "close", "volume")]
+    sessions = [str(d)[:10] for d, k in zip(decoded.raw["dateTime"], keep) if k]
+    return {
+        symbol: [f"{session}T00:00:00+05:30", o, h, l, c, v, 0]
+        for symbol, session, o, h, l, c, v in zip(decoded.symbols[keep].tolist(), sessions, *columns)
+    }
+
+def session_date_of(bars: Dict[str, list]) -> Optional[date]:
+    """The trading date shared by most bars of a snapshot."""
+    counts: Dict[str, int] = {}
+    for bar in bars.values():
+        counts[bar[0][:10]] = counts.get(bar[0][:10], 0) + 1
+    if not counts:
+        return None
+    return datetime.strptime(max(counts, key=counts.get), "%Y-%m-%d").date()
@@ -0,0 +1,223 @@
+// --- STOCK UNIVERSE DATA ENGINE (WEB WORKER) ---
+// Owns the universe dataset off the main thread: JSON parsing, filter compilation, sorting,
+// insight-chart aggregation and update diffing all run here. The page only receives counts,
+// small summaries and the slice of rows its virtual table is showing.
+//
+// Messages are { id, type, ...payload } and every reply is { id, result } or { id, error }.
+
+importScripts('/static/js/universe-cache.js');
+
+// --- STATE ---
+let rows = [];                 // Parsed universe rows
+let bySymbol = new Map();      // Symbol -> row, for diffing updates
+let result = new Int32Array(0); // Row indices of the current filter + sort, in display order
+let resultId = 0;
+
+const TEXT_KEYS = new Set(["Symbol", "Stock Name", "Sector Name", "Industry Name", "INECODE"]);
+
+// --- LOADING & DIFFING ---
+const normalizeRows = (data) => (Array.isArray(data) ? data : []).map(r => ({ ...r, "Market Cap": parseFloat(r["Market Cap"]) || 0 }));
+
+const sameRow = (a, b) => {
+    for (const key in b) { if (a[key] !== b[key]) return false; }
+    return Object.keys(a).length === Object.keys(b).length;
+};
+
+const diffAgainstCurrent = (nextRows) => {
+    let changed = 0, added = 0;
+    const seen = new Set();
+    for (const row of nextRows) {
+        const prev = bySymbol.get(row.Symbol);
+        seen.add(row.Symbol);
+        if (!prev) added++;
+        else if (!sameRow(prev, row)) changed++;
+    }
+    let removed = 0;
+    bySymbol.forEach((_, symbol) => { if (!seen.has(symbol)) removed++; });
+    return { changed, added, removed };
+};
+
+const setRows = (parsed) => {
+    const nextRows = normalizeRows(parsed);
+    const diff = diffAgainstCurrent(nextRows);
+    rows = nextRows;
+    bySymbol = new Map(rows.map(r => [r.Symbol, r]));
+    result = new Int32Array(0);
+    return { total: rows.length, diff, facets: buildFacets() };
+};
+
+// Dropdown options: every sector, and the industries of each sector.
+const buildFacets = () => {
+    const sectors = new Set(), industries = {};
+    rows.forEach(r => {
+        const sector = r["Sector Name"], industry = r["Industry Name"];
+        if (sector) sectors.add(sector);
+        if (industry) (industries[sector || ''] ||= new Set()).add(industry);
+    });
+    const industriesBySector = {};
+    Object.entries(industries).forEach(([sector, set]) => { industriesBySector[sector] = [...set].sort(); });
+    return { sectors: [...sectors].sort(), industriesBySector };
+};
+
+// --- FILTERS ---
+const parseNumericFilter = (filterString) => {
+    if (!filterString || String(filterString).trim() === '') return [];
+    const conditions = String(filterString).split(',').map(s => s.trim()).filter(Boolean);
+    const parsedConditions = [];
+    const multipliers = { 'k': 1e3, 'm': 1e6, 'b': 1e9, 't': 1e12, 'cr': 1e7 };
+    const operatorRegex = /^(>=|<=|!=|>|<|=)/;
+    for (const cond of conditions) {
+        let opMatch = cond.match(operatorRegex);
+        let operator = opMatch ? opMatch[0] : '=';
+        let valueStr = opMatch ? cond.substring(opMatch[0].length) : cond;
+        const lastChar = valueStr.slice(-1).toLowerCase();
+        const lastTwoChars = valueStr.slice(-2).toLowerCase();
+        let multiplier = 1;
+        if (multipliers[lastTwoChars]) { valueStr = valueStr.slice(0, -2); multiplier = multipliers[lastTwoChars]; }
+        else if (multipliers[lastChar]) { valueStr = valueStr.slice(0, -1); multiplier = multipliers[lastChar]; }
+        const numericValue = parseFloat(valueStr);
+        if (!isNaN(numericValue)) { parsedConditions.push({ operator, value: numericValue * multiplier }); }
+    }
+    return parsedConditions;
+};
+
+const compileCondition = ({ operator, value }) => {
+    switch (operator) {
+        case '>': return v => v > value; case '<': return v => v < value;
+        case '>=': return v => v >= value; case '<=': return v => v <= value;
+        case '!=': return v => v != value; case '=': return v => v == value;
+        default: return () => true;
+    }
+};
+
+// Turns the page's filter state into one predicate per active filter, evaluated in a single pass.
+const compileFilters = (filters = {}) => {
+    const predicates = [];
+    Object.entries(filters.columns || {}).forEach(([key, value]) => {
+        if (value && value !== 'ALL') predicates.push(row => String(row[key]) === String(value));
+    });
+    Object.entries(filters.textFilters || {}).forEach(([key, filterString]) => {
+        const tests = parseNumericFilter(filterString).map(compileCondition);
+        if (tests.length > 0) {
+            predicates.push(row => {
+                const v = row[key];
+                if (v === null || v === undefined) return false;
+                return tests.every(test => test(v));
+            });
+        }
+    });
+    return predicates;
+};
+
+// --- QUERY ---
+const runQuery = (filters, sort) => {
+    const predicates = compileFilters(filters);
+    const matched = [];
+    for (let i = 0; i < rows.length; i++) {
+        const row = rows[i];
+        if (predicates.every(p => p(row))) matched.push(i);
+    }
+    if (sort && sort.key) {
+        const key = sort.key, dir = sort.order === 'asc' ? 1 : -1;
+        const values = matched.map(i => rows[i][key]);
+        const order = matched.map((_, j) => j);
+        order.sort((x, y) => {
+            const vA = values[x], vB = values[y];
+            let c = 0;
+            if (typeof vA === 'number' && typeof vB === 'number') { c = vA - vB; }
+            else { c = String(vA ?? '').localeCompare(String(vB ?? '')); }
+            return dir * c || x - y;
+        });
+        result = Int32Array.from(order, j => matched[j]);
+    } else {
+        result = Int32Array.from(matched);
+    }
+    resultId++;
+    return { resultId, count: result.length, total: rows.length };
+};
+
+// Rows [start, end) of the current result. Numbers travel as one transferable Float64Array
+// (row-major, NaN for missing); text columns as plain arrays.
+const sliceRows = (start, end, keys) => {
+    start = Math.max(0, start); end = Math.min(result.length, end);
+    const n = Math.max(0, end - start);
+    const numericKeys = keys.filter(k => !TEXT_KEYS.has(k));
+    const textKeys = keys.filter(k => TEXT_KEYS.has(k));
+    const numeric = new Float64Array(n * numericKeys.length);
+    const text = {};
+    textKeys.forEach(k => { text[k] = new Array(n); });
+    for (let r = 0; r < n; r++) {
+        const row = rows[result[start + r]];
+        for (let c = 0; c < numericKeys.length; c++) {
+            const v = row[numericKeys[c]];
+            numeric[r * numericKeys.length + c] = typeof v === 'number' ? v : NaN;
+        }
+        textKeys.forEach(k => { text[k][r] = row[k] ?? null; });
+    }
+    return { resultId, start, numericKeys, numeric, text };
+};
+
+// --- INSIGHT CHARTS ---
+const groupStats = ({ groupBy, minStocks, whRange, minUp, minDown }) => {
+    const groups = {};
+    for (const i of result) {
+        const stock = rows[i];
+        const groupName = stock[groupBy]; if (!groupName) continue;
+        (groups[groupName] ||= { name: groupName, stocks: [] }).stocks.push(stock);
+    }
+    const chartGroups = Object.values(groups).filter(g => g.stocks.length >= (minStocks || 0));
+    chartGroups.forEach(g => {
+        g.totalInTable = g.stocks.length; g.sumChange = 0; g.advancers = 0; g.decliners = 0; g.nearHigh = 0;
+        g.stocks.forEach(s => { const change = s['change_percentage']; const down52w = s['Down from 52W High (%)']; if (typeof change === 'number') { g.sumChange += change; if (change >= (minUp !== null ? minUp : 0.0001)) g.advancers++; if (change <= (minDown !== null ? minDown : -0.0001)) g.decliners++; } if (typeof down52w === 'number' && (whRange === null || down52w <= whRange)) g.nearHigh++; });
+        g.avgChange = g.totalInTable > 0 ? g.sumChange / g.totalInTable : 0; g.adRatio = g.decliners > 0 ? g.advancers / g.decliners : (g.advancers > 0 ? Infinity : 1); g.nearHighPercent = g.totalInTable > 0 ? (g.nearHigh / g.totalInTable) * 100 : 0;
+        const rsStocks = g.stocks.filter(s => typeof s['RS_3M'] === 'number' && s['RS_3M'] !== 100);
+        g.rsStockCount = rsStocks.length;
+        g.avgRsRank = g.rsStockCount > 0 ? rsStocks.reduce((sum, s) => sum + s['RS_3M'], 0) / g.rsStockCount : 0;
+        delete g.stocks;
+    });
+    return chartGroups;
+};
+
+// --- EXPORT ---
+const exportLists = () => {
+    const bySector = {}, symbols = [];
+    for (const i of result) {
+        const s = rows[i];
+        symbols.push(s['Symbol']);
+        if (s['Sector Name']) (bySector[s['Sector Name']] ||= []).push(s['Symbol']);
+    }
+    return { bySector, symbols };
+};
+
+// --- MESSAGE HANDLING ---
+const handlers = {
+    // Loads the shared IndexedDB copy; null when nothing is cached yet.
+    loadCached: async () => {
+        const cached = await UniverseCache.read();
+        if (!cached) return null;
+        return { ...setRows(JSON.parse(cached.text)), version: cached.version };
+    },
+    // Downloads `version` (latest when omitted), replaces the cached copy and loads it.
+    loadVersion: async ({ version, bypassHttpCache }) => {
+        const entry = await UniverseCache.download(version, bypassHttpCache);
+        return { ...setRows(JSON.parse(entry.text)), version: entry.version };
+    },
+    query: ({ filters, sort, chart }) => {
+        const summary = runQuery(filters, sort);
+        if (chart) summary.groups = groupStats(chart);
+        return summary;
+    },
+    groups: ({ chart }) => groupStats(chart),
+    slice: ({ start, end, keys }) => sliceRows(start, end, keys),
+    exportLists: () => exportLists(),
+};
+
+self.onmessage = async (event) => {
+    const { id, type, ...payload } = event.data;
+    try {
+        const value = await handlers[type](payload);
+        self.postMessage({ id, result: value }, value && value.numeric ? [value.numeric.buffer] : []);
+    } catch (err) {
+        self.postMessage({ id, error: String(err && err.message || err) });
+    }
+};
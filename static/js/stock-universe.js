@@ -1,12 +1,10 @@
 // --- STOCK UNIVERSE SCRIPT (V5.2 - REFRESH & TIMESTAMP ADDED) --
 document.addEventListener('DOMContentLoaded', () => {
     // --- CONSTANTS ---
-    const STOCK_UNIVERSE_DATA_PATH = "/static/data/stock_universe.json";
-    const DATA_VERSION_PATH = "/static/data/data_version.json";
     const POLLING_INTERVAL = 180000; // 3 minutes
 
-    const SU_LOCAL_STORAGE_DATA_KEY = 'finvestikStockData';
-    const SU_LOCAL_STORAGE_VERSION_KEY = 'finvestikDataVersion';
+    const SU_LEGACY_STORAGE_KEYS = ['finvestikStockData', 'finvestikDataVersion'];
+    const SU_SPARKLINES_PATH = '/static/data/sparklines.json'; // Hover previews, built by scripts/Sparklines.py
     
     // NEW KEYS FOR NEW FEATURES
     const SU_COLUMN_ORDER_KEY = 'finvestikSUColumnOrderKey';
@@ -70,9 +68,12 @@ document.addEventListener('DOMContentLoaded', () => {
     suChartAccordionContainer, chart52wHighContainer, chartAvgGainContainer, chartAdRatioContainer,
     chartPopup, chartPopupContainer,chartRsRankContainer;
         
-    let fullStockData = [], suCurrentColumnOrder = [], suColumnWidths = {}, suColumnVisibility = {}, currentlyDisplayedSUData = [], isStockDataLoaded = false;
+    let suCurrentColumnOrder = [], suColumnWidths = {}, suColumnVisibility = {}, isStockDataLoaded = false;
+    let suTotal = 0, suFacets = { sectors: [], industriesBySector: {} };
+    let suResult = { id: 0, count: 0, rows: new Map() }; // Current filter + sort result; rows are fetched from the engine by index
     let suCurrentSort = { key: 'Market Cap', order: 'desc' };
     let suFilters = {}; let chartPopupTimeout, sortableInstance, pollingIntervalId; 
+    let suSparklines = null, suSparklinesRequest = null; // Bundle loaded on the first hover
     let localDataVersion = null;
     let currentResizing = { th: null, startX: 0, startWidth: 0 }, panelResizing = { active: false, startX: 0, startWidth: 0 }; 
 
@@ -111,33 +112,56 @@ document.addEventListener('DOMContentLoaded', () => {
     const saveSUColumnOrder = () => localStorage.setItem(SU_COLUMN_ORDER_KEY, JSON.stringify(suCurrentColumnOrder));
     const saveSUColumnWidths = () => localStorage.setItem(SU_COLUMN_WIDTHS_KEY, JSON.stringify(suColumnWidths));
 
+    // --- DATA ENGINE (WEB WORKER) ---
+    // Parsing, filtering, sorting and chart aggregation run in stock-universe-worker.js so the
+    // page stays responsive while a 1.5 MB update is processed. callEngine() is a promise-based RPC.
+    const suEngine = new Worker('/static/js/stock-universe-worker.js');
+    const suEnginePending = new Map();
+    let suEngineSeq = 0;
+    suEngine.onmessage = (e) => {
+        const { id, result, error } = e.data;
+        const pending = suEnginePending.get(id);
+        if (!pending) return;
+        suEnginePending.delete(id);
+        if (error) pending.reject(new Error(error)); else pending.resolve(result);
+    };
+    const callEngine = (type, payload = {}) => new Promise((resolve, reject) => {
+        const id = ++suEngineSeq;
+        suEnginePending.set(id, { resolve, reject });
+        suEngine.postMessage({ id, type, ...payload });
+    });
+    const applyLoadedData = (loaded) => {
+        suTotal = loaded.total;
+        suFacets = loaded.facets;
+        isStockDataLoaded = true;
+    };
+
     // --- DATA FETCHING & POLLING ---
+    // The universe lives in the IndexedDB cache shared with the RRG page (universe-cache.js); the
+    // worker reads and writes it directly, so the page never holds the raw file.
     async function initDataLoad() {
         loadSUColumnSettings();
         loadSUFilters();
         populateColumnsPanel();
         populateFiltersPanel();
+        // Older versions kept a full copy of the file in localStorage.
+        SU_LEGACY_STORAGE_KEYS.forEach(key => localStorage.removeItem(key));
 
-        try {
-            const cachedVersion = localStorage.getItem(SU_LOCAL_STORAGE_VERSION_KEY);
-            const cachedData = localStorage.getItem(SU_LOCAL_STORAGE_DATA_KEY);
-            if (cachedVersion && cachedData) {
-                localDataVersion = parseInt(cachedVersion);
-                fullStockData = JSON.parse(cachedData);
-                isStockDataLoaded = true;
-                updateLastUpdatedUI(localDataVersion); // Update UI with cached time
-            } else {
-                await fetchInitialData();
-            }
-        } catch (e) {
-            await fetchInitialData();
-        } finally {
+        let cached = null;
+        try { cached = await callEngine('loadCached'); } catch (e) { cached = null; }
+        if (cached) {
+            localDataVersion = cached.version;
+            applyLoadedData(cached);
+            updateLastUpdatedUI(localDataVersion); // Update UI with cached time
             displayStockUniverse();
             startPolling();
+            checkForUpdates(); // Render from cache first, then validate against data_version.json
+        } else {
+            await fetchInitialData();
         }
     }
 
-    async function fetchInitialData() {
+    async function fetchInitialData(bypassHttpCache = false) {
         if(suSkeletonLoader) suSkeletonLoader.style.display = 'block';
         if(suContainer) suContainer.classList.add('hidden');
         
@@ -146,21 +170,9 @@ document.addEventListener('DOMContentLoaded', () => {
         if(refreshIcon) refreshIcon.classList.add('fa-spin');
 
         try {
-            const t = new Date().getTime();
-            const [versionRes, dataRes] = await Promise.all([ 
-                fetch(DATA_VERSION_PATH + `?t=${t}`), 
-                fetch(STOCK_UNIVERSE_DATA_PATH + `?t=${t}`) 
-            ]);
-            if (!versionRes.ok || !dataRes.ok) throw new Error('Failed to fetch initial data files.');
-            const versionData = await versionRes.json();
-            const jsonData = await dataRes.json();
-            
-            localDataVersion = versionData.timestamp;
-            fullStockData = jsonData?.map(r => ({ ...r, "Market Cap": parseFloat(r["Market Cap"]) || 0 })) || [];
-            isStockDataLoaded = true;
-            
-            localStorage.setItem(SU_LOCAL_STORAGE_VERSION_KEY, localDataVersion);
-            localStorage.setItem(SU_LOCAL_STORAGE_DATA_KEY, JSON.stringify(fullStockData));
+            const loaded = await callEngine('loadVersion', { bypassHttpCache });
+            localDataVersion = loaded.version;
+            applyLoadedData(loaded);
             updateLastUpdatedUI(localDataVersion); // Update UI
 
         } catch (err) {
@@ -180,27 +192,23 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function checkForUpdates() {
         try {
-            const res = await fetch(DATA_VERSION_PATH + `?t=${new Date().getTime()}`);
-            if (!res.ok) return;
-            const versionData = await res.json();
-            if (versionData.timestamp && localDataVersion && versionData.timestamp > localDataVersion) {
+            const latestVersion = await UniverseCache.fetchVersion();
+            if (latestVersion && localDataVersion !== null && latestVersion > localDataVersion) {
                 if(suLoading) suLoading.classList.remove('hidden');
-                await fetchAndApplyUpdates(versionData.timestamp);
+                await fetchAndApplyUpdates(latestVersion);
             }
         } catch (error) { console.error("Error checking for updates:", error); }
     }
 
     async function fetchAndApplyUpdates(newVersion) {
         try {
-            const res = await fetch(STOCK_UNIVERSE_DATA_PATH + `?t=${new Date().getTime()}`);
-            if (!res.ok) return;
-            const jsonData = await res.json();
-            fullStockData = jsonData?.map(r => ({ ...r, "Market Cap": parseFloat(r["Market Cap"]) || 0 })) || [];
-            localDataVersion = newVersion;
-            localStorage.setItem(SU_LOCAL_STORAGE_VERSION_KEY, newVersion);
-            localStorage.setItem(SU_LOCAL_STORAGE_DATA_KEY, JSON.stringify(fullStockData));
+            const loaded = await callEngine('loadVersion', { version: newVersion });
+            applyLoadedData(loaded);
+            localDataVersion = loaded.version;
             updateLastUpdatedUI(localDataVersion);
-            applyAndRenderSU();
+            // The engine diffs the new file against the old one; an unchanged universe needs no re-render.
+            const { changed, added, removed } = loaded.diff;
+            if (changed || added || removed) applyAndRenderSU();
         } finally {
             if(suLoading) suLoading.classList.add('hidden');
         }
@@ -222,68 +230,16 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
-    const parseNumericFilter = (filterString) => {
-        if (!filterString || String(filterString).trim() === '') return [];
-        const conditions = String(filterString).split(',').map(s => s.trim()).filter(Boolean);
-        const parsedConditions = [];
-        const multipliers = { 'k': 1e3, 'm': 1e6, 'b': 1e9, 't': 1e12, 'cr': 1e7 };
-        const operatorRegex = /^(>=|<=|!=|>|<|=)/;
-        for (const cond of conditions) {
-            let opMatch = cond.match(operatorRegex);
-            let operator = opMatch ? opMatch[0] : '=';
-            let valueStr = opMatch ? cond.substring(opMatch[0].length) : cond;
-            const lastChar = valueStr.slice(-1).toLowerCase();
-            const lastTwoChars = valueStr.slice(-2).toLowerCase();
-            let multiplier = 1;
-            if (multipliers[lastTwoChars]) { valueStr = valueStr.slice(0, -2); multiplier = multipliers[lastTwoChars]; } 
-            else if (multipliers[lastChar]) { valueStr = valueStr.slice(0, -1); multiplier = multipliers[lastChar]; }
-            const numericValue = parseFloat(valueStr);
-            if (!isNaN(numericValue)) { parsedConditions.push({ operator, value: numericValue * multiplier }); }
-        }
-        return parsedConditions;
-    };
-    
-    const applyAndRenderSU = () => {
+    const applyAndRenderSU = async () => {
         if (!isStockDataLoaded) return; 
-        let tableData = [...fullStockData];
-
-        Object.entries(suFilters.columns || {}).forEach(([key, value]) => { if (value && value !== 'ALL') { tableData = tableData.filter(row => String(row[key]) === String(value)); } });
-        Object.entries(suFilters.textFilters || {}).forEach(([key, filterString]) => {
-            if (filterString) {
-                const conditions = parseNumericFilter(filterString);
-                if (conditions.length > 0) {
-                    tableData = tableData.filter(row => {
-                        const rowValue = row[key];
-                        if (rowValue === null || rowValue === undefined) return false;
-                        return conditions.every(cond => {
-                            switch (cond.operator) {
-                                case '>': return rowValue > cond.value; case '<': return rowValue < cond.value;
-                                case '>=': return rowValue >= cond.value; case '<=': return rowValue <= cond.value;
-                                case '!=': return rowValue != cond.value; case '=': return rowValue == cond.value;
-                                default: return true;
-                            }
-                        });
-                    });
-                }
-            }
-        });
-        
-        if (suCurrentSort.key) {
-            tableData.sort((a,b) => {
-                const vA = a[suCurrentSort.key], vB = b[suCurrentSort.key];
-                let c = 0;
-                if (typeof vA === 'number' && typeof vB === 'number') { c = vA - vB; } 
-                else { c = String(vA ?? '').localeCompare(String(vB ?? '')); }
-                return suCurrentSort.order === 'asc' ? c : -c;
-            });
-        }
-        
-        currentlyDisplayedSUData = tableData;
         saveSUFilters();
-        renderStockUniverseTable(tableData);
-        if (suChartPanel && !suChartPanel.classList.contains('is-closed')) {
-            renderAllInsightCharts(tableData);
-        }
+        const chartOpen = suChartPanel && !suChartPanel.classList.contains('is-closed');
+        const summary = await callEngine('query', { filters: suFilters, sort: suCurrentSort, chart: chartOpen ? suFilters.chart : null });
+        if (summary.resultId < suResult.id) return; // A newer query has already been rendered
+        suTotal = summary.total;
+        suResult = { id: summary.resultId, count: summary.count, rows: new Map() };
+        renderStockUniverseTable();
+        if (summary.groups) renderAllInsightCharts(summary.groups, summary.count);
     };
 
     // --- TABLE INTERACTIVITY ---
@@ -297,7 +253,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     suCurrentColumnOrder = Array.from(suHeaderRow.children).map(th => th.dataset.key);
                     saveSUColumnOrder();
                     createSUHeaderAndFilterRows();
-                    renderStockUniverseTable(currentlyDisplayedSUData);
+                    renderStockUniverseTable();
                 }
             });
         }
@@ -347,38 +303,147 @@ document.addEventListener('DOMContentLoaded', () => {
         initializeResizeHandles();
     };
 
-    const renderStockUniverseTable = (data) => {
-        if(!suTableBodyElement) return;
-        if(!suHeaderRow) createSUHeaderAndFilterRows();
-        const cols = suCurrentColumnOrder.map(k => suColumnDefinitions.find(d => d.key === k)).filter(d => d && suColumnVisibility[d.key]);
-        suTableBodyElement.innerHTML = '';
-        const fragment = document.createDocumentFragment();
-        if (data.length === 0) {
-            const tr = document.createElement('tr');
+    // --- VIRTUAL TABLE ---
+    // Only rows in (or near) the viewport exist in the DOM. A pool of <tr> nodes is re-bound to
+    // whichever rows are visible as the table scrolls, spacer rows above and below keep the
+    // scrollbar sized for the whole result, and a cell is only written when its text changes,
+    // so data updates touch just the cells that moved. Row data is requested from the engine
+    // in blocks around the viewport and kept in suResult.rows.
+    const SU_ROW_OVERSCAN = 10;
+    const SU_ROW_PREFETCH = 100;
+    const SU_ROW_CACHE_LIMIT = 2000;
+    const SU_DEFAULT_ROW_HEIGHT = 45;
+    const suVirtual = { cols: [], colsKey: '', pool: [], rowHeight: 0, start: 0, end: 0, frame: null, topSpacer: null, bottomSpacer: null, emptyRow: null, pendingSlice: null };
+
+    // Rebuilds row objects from a slice: numbers arrive in one transferred Float64Array (NaN = missing).
+    const storeSURowSlice = (slice) => {
+        const numericKeys = slice.numericKeys, width = numericKeys.length;
+        const n = slice.text.Symbol ? slice.text.Symbol.length : 0;
+        const textEntries = Object.entries(slice.text);
+        for (let r = 0; r < n; r++) {
+            const row = {};
+            for (let c = 0; c < width; c++) { const v = slice.numeric[r * width + c]; row[numericKeys[c]] = Number.isNaN(v) ? null : v; }
+            textEntries.forEach(([key, values]) => { row[key] = values[r]; });
+            suResult.rows.set(slice.start + r, row);
+        }
+        if (suResult.rows.size > SU_ROW_CACHE_LIMIT) {
+            const keepFrom = slice.start - SU_ROW_CACHE_LIMIT / 2, keepTo = slice.start + n + SU_ROW_CACHE_LIMIT / 2;
+            suResult.rows.forEach((_, i) => { if (i < keepFrom || i >= keepTo) suResult.rows.delete(i); });
+        }
+    };
+
+    const requestSURows = (start, end) => {
+        const from = Math.max(0, start - SU_ROW_PREFETCH), to = Math.min(suResult.count, end + SU_ROW_PREFETCH);
+        const key = `${suResult.id}:${from}:${to}`;
+        if (suVirtual.pendingSlice === key) return;
+        suVirtual.pendingSlice = key;
+        callEngine('slice', { start: from, end: to, keys: suColumnDefinitions.map(d => d.key) }).then(slice => {
+            if (suVirtual.pendingSlice === key) suVirtual.pendingSlice = null;
+            if (slice.resultId !== suResult.id) return; // The result changed while the slice was in flight
+            storeSURowSlice(slice);
+            renderSUWindow(true);
+        }).catch(err => console.error("Error loading table rows:", err));
+    };
+
+    const createSUSpacerRow = () => {
+        const tr = document.createElement('tr');
+        tr.className = 'su-spacer';
+        tr.appendChild(document.createElement('td'));
+        return tr;
+    };
+
+    const createSUPoolRow = (cols) => {
+        const tr = document.createElement('tr');
+        cols.forEach(def => {
             const td = document.createElement('td');
-            td.colSpan = cols.length || 1;
-            td.className = 'text-center p-4';
-            td.textContent = 'No stocks match the current filters.';
+            if(def.cellClass) td.className = def.cellClass;
+            if(def.key === 'Symbol') td.classList.add('symbol-cell');
             tr.appendChild(td);
-            fragment.appendChild(tr);
+        });
+        return tr;
+    };
+
+    const bindSURow = (tr, stock, cols) => {
+        if (tr.dataset.symbol !== stock.Symbol) tr.dataset.symbol = stock.Symbol;
+        const cells = tr.children;
+        cols.forEach((def, i) => {
+            const td = cells[i];
+            const v = stock[def.key];
+            const text = def.formatter ? def.formatter(v) : formatValue(v);
+            if (td.textContent !== text) td.textContent = text;
+            if (def.key === 'change_percentage') {
+                const color = typeof v === 'number' ? (v >= 0 ? 'var(--text-positive)' : 'var(--text-negative)') : '';
+                if (td.style.color !== color) td.style.color = color;
+            }
+            if (def.key === 'Symbol' && td.dataset.symbol !== v) td.dataset.symbol = v;
+        });
+    };
+
+    const resetSUVirtualBody = (cols) => {
+        suTableBodyElement.innerHTML = '';
+        suVirtual.cols = cols;
+        suVirtual.colsKey = cols.map(d => d.key).join('|');
+        suVirtual.pool = [];
+        suVirtual.start = suVirtual.end = 0;
+        suVirtual.topSpacer = createSUSpacerRow();
+        suVirtual.bottomSpacer = createSUSpacerRow();
+        suVirtual.emptyRow = document.createElement('tr');
+        const td = document.createElement('td');
+        td.className = 'text-center p-4';
+        td.textContent = 'No stocks match the current filters.';
+        suVirtual.emptyRow.appendChild(td);
+        [suVirtual.topSpacer, suVirtual.emptyRow, suVirtual.bottomSpacer].forEach(tr => { tr.firstChild.colSpan = cols.length || 1; });
+        suTableBodyElement.append(suVirtual.topSpacer, suVirtual.bottomSpacer);
+    };
+
+    const renderSUWindow = (force = false) => {
+        suVirtual.frame = null;
+        const { cols, pool } = suVirtual;
+        const count = suResult.count;
+        const rowHeight = suVirtual.rowHeight || SU_DEFAULT_ROW_HEIGHT;
+        const scrollTop = suTableContainer ? suTableContainer.scrollTop : 0;
+        const viewport = suTableContainer ? suTableContainer.clientHeight : window.innerHeight;
+        const start = Math.max(0, Math.floor(scrollTop / rowHeight) - SU_ROW_OVERSCAN);
+        const end = Math.min(count, Math.ceil((scrollTop + viewport) / rowHeight) + SU_ROW_OVERSCAN);
+        if (!force && start === suVirtual.start && end === suVirtual.end) return;
+        suVirtual.start = start; suVirtual.end = end;
+
+        if (count === 0) {
+            pool.forEach(tr => tr.remove()); pool.length = 0;
+            suTableBodyElement.insertBefore(suVirtual.emptyRow, suVirtual.bottomSpacer);
         } else {
-            data.forEach(stock => {
-                const tr = document.createElement('tr');
-                tr.dataset.symbol = stock.Symbol;
-                cols.forEach(def => {
-                    const td = document.createElement('td');
-                    let v = stock[def.key];
-                    td.textContent = def.formatter ? def.formatter(v) : formatValue(v);
-                    if(def.cellClass) td.className=def.cellClass;
-                    if(def.key === 'change_percentage' && typeof v === 'number') td.style.color = v >= 0 ? 'var(--text-positive)' : 'var(--text-negative)';
-                    if(def.key === 'Symbol'){ td.classList.add('symbol-cell'); td.dataset.symbol=v; }
-                    tr.appendChild(td);
-                });
-                fragment.appendChild(tr);
-            });
+            suVirtual.emptyRow.remove();
+        }
+        while (pool.length < end - start) { const tr = createSUPoolRow(cols); pool.push(tr); suTableBodyElement.insertBefore(tr, suVirtual.bottomSpacer); }
+        while (pool.length > Math.max(0, end - start)) pool.pop().remove();
+        // Rows not fetched yet keep their previous content until the slice arrives (one message round trip).
+        let missing = false;
+        pool.forEach((tr, i) => { const row = suResult.rows.get(start + i); if (row) bindSURow(tr, row, cols); else missing = true; });
+        if (missing) requestSURows(start, end);
+        suVirtual.topSpacer.style.height = `${start * rowHeight}px`;
+        suVirtual.bottomSpacer.style.height = `${(count - end) * rowHeight}px`;
+
+        // Row height depends on fonts and the theme; measure the first real row once and re-window with it.
+        if (!suVirtual.rowHeight && pool.length && suResult.rows.has(start)) {
+            const measured = pool[0].getBoundingClientRect().height;
+            if (measured > 0) { suVirtual.rowHeight = measured; if (Math.abs(measured - rowHeight) > 0.5) renderSUWindow(true); }
+        }
+    };
+
+    const scheduleSUWindow = () => { if (!suVirtual.frame) suVirtual.frame = requestAnimationFrame(() => renderSUWindow()); };
+
+    const renderStockUniverseTable = () => {
+        if(!suTableBodyElement) return;
+        if(!suHeaderRow) createSUHeaderAndFilterRows();
+        const cols = suCurrentColumnOrder.map(k => suColumnDefinitions.find(d => d.key === k)).filter(d => d && suColumnVisibility[d.key]);
+        if (cols.map(d => d.key).join('|') !== suVirtual.colsKey || !suVirtual.topSpacer) resetSUVirtualBody(cols);
+        // Keep the scroll position across updates, but not past the end of a shorter result.
+        if (suTableContainer) {
+            const maxScroll = Math.max(0, suResult.count * (suVirtual.rowHeight || SU_DEFAULT_ROW_HEIGHT) - suTableContainer.clientHeight);
+            if (suTableContainer.scrollTop > maxScroll) suTableContainer.scrollTop = maxScroll;
         }
-        suTableBodyElement.appendChild(fragment);
-        if(suRowCount) suRowCount.textContent = `Showing ${data.length} of ${fullStockData.length} stocks.`;
+        renderSUWindow(true);
+        if(suRowCount) suRowCount.textContent = `Showing ${suResult.count} of ${suTotal} stocks.`;
     };
     
     // --- CHART POPUP FUNCTIONS ---
@@ -395,15 +460,71 @@ document.addEventListener('DOMContentLoaded', () => {
         chartPopupContainer.appendChild(script);
     };
     
-    const showChartPopup = (event) => {
-        if (!chartPopup) return;
-        clearTimeout(chartPopupTimeout);
-        const cell = event.target.closest('.symbol-cell');
-        if (!cell || !cell.dataset.symbol) return;
-        const symbol = cell.dataset.symbol;
-        const tradingViewSymbol = `BSE:${symbol}`;
-        const currentTheme = document.documentElement.classList.contains('light') ? 'light' : 'dark';
-        createTradingViewWidget(tradingViewSymbol, currentTheme);
+    // Previews come from the local sparkline bundle; the TradingView widget only loads on click.
+    const loadSparklines = () => {
+        if (!suSparklinesRequest) {
+            suSparklinesRequest = fetch(SU_SPARKLINES_PATH, { cache: 'no-cache' })
+                .then(res => { if (!res.ok) throw new Error(`HTTP ${res.status}`); return res.json(); })
+                .then(bundle => { suSparklines = bundle; return bundle; })
+                .catch(err => { console.warn('Sparklines unavailable:', err); return null; });
+        }
+        return suSparklinesRequest;
+    };
+
+    // Entry: [low, high, offset, base64(x bytes + y bytes)] -> [{x, y}] in close prices, oldest first.
+    const decodeSparkline = (bundle, entry) => {
+        const [low, high, offset, packed] = entry;
+        const bytes = Uint8Array.from(atob(packed), c => c.charCodeAt(0));
+        const n = bytes.length / 2, points = [];
+        for (let i = 0; i < n; i++) points.push({ x: Math.max(bytes[i], offset), y: low + (high - low) * bytes[n + i] / bundle.levels });
+        return points;
+    };
+
+    const renderSparklinePreview = (symbol) => {
+        if (!chartPopupContainer) return;
+        chartPopupContainer.innerHTML = '';
+        chartPopupContainer.dataset.currentSymbol = symbol;
+        chartPopupContainer.dataset.mode = 'preview';
+        const entry = suSparklines && suSparklines.series ? suSparklines.series[symbol] : null;
+        const wrap = document.createElement('div');
+        wrap.className = 'w-full h-full flex flex-col p-2';
+        const title = document.createElement('div');
+        title.className = 'flex justify-between text-sm font-semibold';
+        const name = document.createElement('span'); name.textContent = symbol; title.appendChild(name);
+        wrap.appendChild(title);
+        if (!entry) {
+            const empty = document.createElement('div');
+            empty.className = 'flex-1 flex items-center justify-center text-sm opacity-70';
+            empty.textContent = suSparklines ? 'No preview available' : 'Loading preview…';
+            wrap.appendChild(empty);
+        } else {
+            const points = decodeSparkline(suSparklines, entry);
+            const first = points[0].y, last = points[points.length - 1].y;
+            const change = first ? (last / first - 1) * 100 : 0;
+            const color = change >= 0 ? 'var(--text-positive)' : 'var(--text-negative)';
+            const badge = document.createElement('span');
+            badge.style.color = color;
+            badge.textContent = `${change >= 0 ? '+' : ''}${change.toFixed(2)}% · ${suSparklines.window}D`;
+            title.appendChild(badge);
+            const [low, high] = entry, w = 380, h = 220, span = (high - low) || 1, maxX = Math.max(suSparklines.window - 1, 1);
+            const coords = points.map(p => `${(p.x / maxX * w).toFixed(1)},${(h - (p.y - low) / span * h).toFixed(1)}`).join(' ');
+            const chart = document.createElement('div');
+            chart.className = 'flex-1 min-h-0';
+            chart.innerHTML = `<svg width="100%" height="100%" viewBox="0 0 ${w} ${h}" preserveAspectRatio="none" aria-hidden="true"><polyline fill="none" stroke="${color}" stroke-width="1.5" vector-effect="non-scaling-stroke" points="${coords}"/></svg>`;
+            wrap.appendChild(chart);
+            const range = document.createElement('div');
+            range.className = 'flex justify-between text-xs opacity-70';
+            range.innerHTML = `<span>L ${formatPrice(low)} · H ${formatPrice(high)}</span><span>as of ${formatValue(suSparklines.as_of)}</span>`;
+            wrap.appendChild(range);
+        }
+        const hint = document.createElement('div');
+        hint.className = 'text-xs opacity-70 text-center';
+        hint.textContent = 'Click the symbol for the full chart';
+        wrap.appendChild(hint);
+        chartPopupContainer.appendChild(wrap);
+    };
+
+    const positionChartPopup = (cell) => {
         const popupWidth = chartPopup.offsetWidth;
         const popupHeight = chartPopup.offsetHeight;
         const offset = 15;
@@ -418,6 +539,37 @@ document.addEventListener('DOMContentLoaded', () => {
         chartPopup.style.top = `${top}px`;
         chartPopup.classList.remove('hidden');
     };
+
+    const showChartPopup = (event) => {
+        if (!chartPopup) return;
+        clearTimeout(chartPopupTimeout);
+        const cell = event.target.closest('.symbol-cell');
+        const symbol = cell ? cell.closest('tr')?.dataset.symbol : null;
+        if (!symbol) return;
+        // Already showing this symbol: keep a full chart the user opened, or a drawn preview.
+        const shown = chartPopupContainer ? chartPopupContainer.dataset : {};
+        if (shown.currentSymbol === symbol && (shown.mode === 'full' || suSparklines)) return;
+        renderSparklinePreview(symbol);
+        positionChartPopup(cell);
+        if (!suSparklines) {
+            loadSparklines().then(() => {
+                if (chartPopupContainer && chartPopupContainer.dataset.currentSymbol === symbol && chartPopupContainer.dataset.mode === 'preview') renderSparklinePreview(symbol);
+            });
+        }
+    };
+
+    const openFullChart = (event) => {
+        if (!chartPopup) return;
+        const cell = event.target.closest('.symbol-cell');
+        const symbol = cell ? cell.closest('tr')?.dataset.symbol : null;
+        if (!symbol) return;
+        clearTimeout(chartPopupTimeout);
+        const currentTheme = document.documentElement.classList.contains('light') ? 'light' : 'dark';
+        createTradingViewWidget(`BSE:${symbol}`, currentTheme);
+        chartPopupContainer.dataset.currentSymbol = symbol;
+        chartPopupContainer.dataset.mode = 'full';
+        positionChartPopup(cell);
+    };
     
     const hideChartPopup = () => {
         if (!chartPopup) return;
@@ -426,31 +578,17 @@ document.addEventListener('DOMContentLoaded', () => {
             if (chartPopupContainer) {
                 chartPopupContainer.innerHTML = '';
                 delete chartPopupContainer.dataset.currentSymbol;
+                delete chartPopupContainer.dataset.mode;
             }
         }, 300);
     };
 
     // --- CHART & PANEL FUNCTIONS ---
-    const renderAllInsightCharts = (tableData) => {
+    // chartGroups come from the engine's groupStats(): one summary per sector/industry of the filtered stocks.
+    const renderAllInsightCharts = (chartGroups, stockCount) => {
         if (!suFilters.chart || !chartAdRatioContainer || !isStockDataLoaded) return;
-        const { groupBy, minStocks, whRange, minUp, minDown } = suFilters.chart;
-        if (suChartStatus) suChartStatus.textContent = `Charts based on ${tableData.length} filtered stocks.`;
-        const groupData = (data, key) => data.reduce((acc, stock) => {
-            const groupName = stock[key]; if (!groupName) return acc;
-            if (!acc[groupName]) acc[groupName] = { name: groupName, stocks: [] };
-            acc[groupName].stocks.push(stock); return acc;
-        }, {});
-        const tableGroups = groupData(tableData, groupBy);
-        let chartGroups = Object.values(tableGroups).filter(g => g.stocks.length >= (minStocks || 0));
-        chartGroups.forEach(g => {
-            g.totalInTable = g.stocks.length; g.sumChange = 0; g.advancers = 0; g.decliners = 0; g.nearHigh = 0; g.sumRsRank = 0;
-            g.stocks.forEach(s => { const change = s['change_percentage']; const down52w = s['Down from 52W High (%)']; const rsRank = s['RS_3M']; if (typeof change === 'number') { g.sumChange += change; if (change >= (minUp !== null ? minUp : 0.0001)) g.advancers++; if (change <= (minDown !== null ? minDown : -0.0001)) g.decliners++; } if (typeof down52w === 'number' && (whRange === null || down52w <= whRange)) g.nearHigh++; if (typeof rsRank === 'number') g.sumRsRank += rsRank;  });
-            g.avgChange = g.totalInTable > 0 ? g.sumChange / g.totalInTable : 0; g.adRatio = g.decliners > 0 ? g.advancers / g.decliners : (g.advancers > 0 ? Infinity : 1); g.nearHighPercent = g.totalInTable > 0 ? (g.nearHigh / g.totalInTable) * 100 : 0;
-            const rsStocks = g.stocks.filter(s => typeof s['RS_3M'] === 'number' && s['RS_3M'] !== 100);
-            g.rsStockCount = rsStocks.length;
-            g.sumRsRank = rsStocks.reduce((sum, s) => sum + s['RS_3M'], 0);
-            g.avgRsRank = g.rsStockCount > 0 ? g.sumRsRank / g.rsStockCount : 0;
-        });
+        const { whRange } = suFilters.chart;
+        if (suChartStatus) suChartStatus.textContent = `Charts based on ${stockCount} filtered stocks.`;
         const adData = [...chartGroups].sort((a, b) => b.adRatio - a.adRatio); const maxAdRatio = Math.max(1, ...adData.filter(d => isFinite(d.adRatio)).map(d => d.adRatio));
         adData.forEach(d => { d.percentageWidth = d.adRatio === Infinity ? 100 : Math.min(100, 10 + (d.adRatio / (maxAdRatio || 1)) * 90) });
         renderBarChart(chartAdRatioContainer, adData, { valueFormatter: d => d.adRatio === Infinity ? 'All Up' : d.adRatio.toFixed(2), titleFormatter: d => `${d.name}: Ratio ${d.adRatio === Infinity ? 'All Up' : d.adRatio.toFixed(2)} (${d.advancers} Up, ${d.decliners} Down)`, subLabelFormatter: d => `(${d.advancers}/${d.decliners})` });
@@ -491,7 +629,7 @@ document.addEventListener('DOMContentLoaded', () => {
         suPanelResizer.classList.toggle('is-closed');
         suInsightsToggleButton.classList.toggle('active');
         const isNowVisible = !suChartPanel.classList.contains('is-closed');
-        if (isNowVisible && currentlyDisplayedSUData) { renderAllInsightCharts(currentlyDisplayedSUData); }
+        if (isNowVisible && isStockDataLoaded) { callEngine('groups', { chart: suFilters.chart }).then(groups => renderAllInsightCharts(groups, suResult.count)); }
         try { const settings = JSON.parse(localStorage.getItem(SU_CHART_PANEL_SETTINGS) || '{}'); settings.isOpen = isNowVisible; localStorage.setItem(SU_CHART_PANEL_SETTINGS, JSON.stringify(settings)); } catch (e) {}
     };
     const initializePanelResizer = () => { if(!suPanelResizer)return;suPanelResizer.addEventListener('mousedown',e=>{if(e.button!==0)return;panelResizing.active=true;panelResizing.startX=e.pageX;panelResizing.startWidth=suChartPanel.offsetWidth;suPanelResizer.classList.add('active');document.body.style.cursor='col-resize';document.body.style.userSelect='none';document.addEventListener('mousemove',onPanelResizeMouseMove);document.addEventListener('mouseup',onPanelResizeMouseUp,{once:true});e.preventDefault();}); };
@@ -509,8 +647,8 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
     
-    const exportStockUniverseAsSingleFile = () => {
-        if(!currentlyDisplayedSUData || !currentlyDisplayedSUData.length){
+    const exportStockUniverseAsSingleFile = async () => {
+        if(!suResult.count){
             alert("No data to export.");
             return;
         }
@@ -519,14 +657,7 @@ document.addEventListener('DOMContentLoaded', () => {
             return;
         }
 
-        const sectors = {};
-        currentlyDisplayedSUData.forEach(s => {
-            const sector = s['Sector Name'];
-            const sym = s['Symbol'];
-            if(!sector) return;
-            if(!sectors[sector]) { sectors[sector] = []; }
-            sectors[sector].push(sym);
-        });
+        const { bySector: sectors, symbols: allSymbolsList } = await callEngine('exportLists');
 
         let sectorFileContent = ''; 
         Object.keys(sectors).sort().forEach(sectorName => {
@@ -534,7 +665,6 @@ document.addEventListener('DOMContentLoaded', () => {
             sectorFileContent += `###${sectorName},${syms},\n`;
         });
 
-        const allSymbolsList = currentlyDisplayedSUData.map(stock => stock['Symbol']);
         const simpleFileContent = allSymbolsList.join(',');
 
         const zip = new JSZip();
@@ -586,12 +716,13 @@ document.addEventListener('DOMContentLoaded', () => {
         const applyBtn = document.createElement('button'); applyBtn.className = 'btn btn-primary'; applyBtn.textContent = 'Apply'; applyBtn.id = 'su-filters-panel-apply';
         footer.append(clearBtn, applyBtn); suFiltersPanel.append(grid, footer);
     };
+    const allIndustries = () => [...new Set(Object.values(suFacets.industriesBySector).flat())].sort();
     const populateTopLevelDropdowns = () => {
-        if(!suFilterRow || fullStockData.length === 0) return;
+        if(!suFilterRow || !suTotal) return;
         suColumnDefinitions.filter(d => d.isFilterable && d.filterType === 'dropdown').forEach(def => {
             const s = suFilterRow.querySelector(`select[data-filter-key="${def.key}"]`);
             if(s){
-                const vals = [...new Set(fullStockData.map(i => i[def.key]).filter(Boolean))].sort();
+                const vals = def.key === 'Sector Name' ? suFacets.sectors : allIndustries();
                 s.innerHTML=`<option value="ALL">ALL</option>`+vals.map(v=>`<option value="${v}">${v}</option>`).join('');
                 s.value = suFilters.columns[def.key] || 'ALL';
             }
@@ -599,11 +730,11 @@ document.addEventListener('DOMContentLoaded', () => {
         updateDependentDropdowns();
     };
     const updateDependentDropdowns = () => {
-        if(!suFilterRow || !fullStockData.length) return;
+        if(!suFilterRow || !suTotal) return;
         const selSec = suFilters.columns['Sector Name'] || 'ALL';
         const indDrop = suFilterRow.querySelector(`select[data-filter-key="Industry Name"]`);
         if(!indDrop) return;
-        let relInd=[...new Set(fullStockData.filter(r=>selSec === 'ALL' || r['Sector Name'] === selSec).map(i=>i['Industry Name']).filter(Boolean))].sort();
+        let relInd = selSec === 'ALL' ? allIndustries() : (suFacets.industriesBySector[selSec] || []);
         const curInd = suFilters.columns['Industry Name'] || 'ALL';
         indDrop.innerHTML = `<option value="ALL">ALL</option>`+relInd.map(v=>`<option value="${v}">${v}</option>`).join('');
         indDrop.value = relInd.includes(curInd) ? curInd : 'ALL';
@@ -637,15 +768,14 @@ document.addEventListener('DOMContentLoaded', () => {
         if(suClearFiltersButton) suClearFiltersButton.addEventListener('click', clearAllSUFiltersAndSort);
         if(suInsightsToggleButton) suInsightsToggleButton.addEventListener('click', toggleInsightsPanel);
         if(suExportSingleButton) suExportSingleButton.addEventListener('click', exportStockUniverseAsSingleFile);
-        if(suTableBodyElement){suTableBodyElement.addEventListener('mouseover',e=>{if(e.target.closest('.symbol-cell'))showChartPopup(e);});suTableBodyElement.addEventListener('mouseout',e=>{if(e.target.closest('.symbol-cell'))hideChartPopup(e);});}
+        if(suTableContainer){suTableContainer.addEventListener('scroll',scheduleSUWindow,{passive:true});window.addEventListener('resize',scheduleSUWindow);}
+        if(suTableBodyElement){suTableBodyElement.addEventListener('mouseover',e=>{if(e.target.closest('.symbol-cell'))showChartPopup(e);});suTableBodyElement.addEventListener('mouseout',e=>{if(e.target.closest('.symbol-cell'))hideChartPopup(e);});suTableBodyElement.addEventListener('click',e=>{if(e.target.closest('.symbol-cell'))openFullChart(e);});}
         if(chartPopup){chartPopup.addEventListener('mouseenter',()=>clearTimeout(chartPopupTimeout));chartPopup.addEventListener('mouseleave',hideChartPopup);}
         if(suChartPanel) suChartPanel.addEventListener('click', handleChartBarClick);
 
         if(suRefreshButton) {
             suRefreshButton.addEventListener('click', () => {
-                localStorage.removeItem(SU_LOCAL_STORAGE_DATA_KEY);
-                localStorage.removeItem(SU_LOCAL_STORAGE_VERSION_KEY);
-                fetchInitialData();
+                fetchInitialData(true);
             });
         }
 
@@ -655,7 +785,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 suColumnVisibility[e.target.dataset.key] = e.target.checked;
                 saveSUColumnVisibility();
                 createSUHeaderAndFilterRows();
-                renderStockUniverseTable(currentlyDisplayedSUData);
+                renderStockUniverseTable();
             }
         });
 
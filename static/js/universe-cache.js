@@ -0,0 +1,76 @@
+// --- UNIVERSE CACHE ---
+// One IndexedDB copy of the latest stock_universe.json and its data_version.json timestamp,
+// shared by every page that needs the universe (stock universe table, RRG) and by the stock
+// universe worker. A page renders from the cached copy at once and downloads the file again
+// only when data_version.json reports a newer version.
+//
+// Loaded as a classic script on pages and with importScripts() in workers; exposes self.UniverseCache.
+(function (scope) {
+    const DB_NAME = 'finvestik';
+    const DB_VERSION = 1;
+    const STORE = 'universe';
+    const KEY = 'latest';
+    const UNIVERSE_PATH = '/static/data/stock_universe.json';
+    const VERSION_PATH = '/static/data/data_version.json';
+
+    let dbPromise = null;
+    const openDb = () => dbPromise ||= new Promise((resolve, reject) => {
+        const req = indexedDB.open(DB_NAME, DB_VERSION);
+        req.onupgradeneeded = () => req.result.createObjectStore(STORE);
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+
+    const withStore = (mode, fn) => openDb().then(db => new Promise((resolve, reject) => {
+        const tx = db.transaction(STORE, mode);
+        const req = fn(tx.objectStore(STORE));
+        tx.oncomplete = () => resolve(req.result);
+        tx.onerror = () => reject(tx.error);
+    }));
+
+    // { version, text, savedAt } or null. Storage errors (private mode, quota) read as a cache miss.
+    const read = () => withStore('readonly', store => store.get(KEY)).then(entry => entry || null).catch(() => null);
+
+    const write = (version, text) => withStore('readwrite', store => store.put({ version, text, savedAt: Date.now() }, KEY))
+        .catch(err => console.warn("Universe cache not saved:", err));
+
+    const clear = () => withStore('readwrite', store => store.delete(KEY)).catch(() => null);
+
+    // Latest published version (data_version.json timestamp), or null when it cannot be fetched.
+    const fetchVersion = async () => {
+        try {
+            const res = await fetch(VERSION_PATH + `?t=${Date.now()}`);
+            if (!res.ok) return null;
+            return (await res.json()).timestamp || null;
+        } catch (e) { return null; }
+    };
+
+    // The file is requested under its version, so the browser's HTTP cache can serve repeats too.
+    const fetchUniverse = async (version, bypassHttpCache = false) => {
+        const res = await fetch(`${UNIVERSE_PATH}?v=${version || Date.now()}`, bypassHttpCache ? { cache: 'reload' } : {});
+        if (!res.ok) throw new Error(`Failed to fetch ${UNIVERSE_PATH}: ${res.status}`);
+        return res.text();
+    };
+
+    // Downloads `version` (the latest one when omitted) and stores it as the cached copy.
+    const download = async (version, bypassHttpCache = false) => {
+        if (version === undefined || version === null) version = await fetchVersion();
+        const text = await fetchUniverse(version, bypassHttpCache);
+        await write(version || 0, text);
+        return { version: version || 0, text };
+    };
+
+    // Calls onData(entry) with the cached copy right away, then again if a newer version had to be
+    // downloaded. Resolves with the entry that is current afterwards.
+    const sync = async (onData) => {
+        const cached = await read();
+        if (cached) await onData(cached);
+        const latest = await fetchVersion();
+        if (cached && (latest === null || cached.version >= latest)) return cached;
+        const entry = await download(latest);
+        await onData(entry);
+        return entry;
+    };
+
+    scope.UniverseCache = { read, write, clear, fetchVersion, fetchUniverse, download, sync };
+})(self);
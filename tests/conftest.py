@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The pipeline scripts import each other as top-level modules from scripts/.
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, "benchmarks"))
+sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+import pytest
+
+from corporate_actions import CorporateActions, parse_purpose
+from security_master import SecurityMaster
+
+ISIN = "INE000A01011"
+
+def candles(closes, start=date(2026, 9, 1)):
+    """Newest-first candles for consecutive days, opening at each day's close."""
+    rows = [[f"{start + timedelta(days=i)}T00:00:00+05:30", c, c, c, c, 1000, 0] for i, c in enumerate(closes)]
+    return rows[::-1]
+
+@pytest.fixture
+def actions():
+    master = SecurityMaster()
+    master.update_from_nse([{"trading_symbol": "ACME", "isin": ISIN, "series": "EQ"}])
+    return CorporateActions(master=master)
+
+def test_parse_purpose():
+    assert parse_purpose("Face Value Split (Sub-Division) - From Rs 10/- Per Share To Rs 2/- Per Share") == ("split", 5.0)
+    assert parse_purpose("Bonus 1:1") == ("bonus", 2.0)
+    assert parse_purpose("Dividend - Rs 5 Per Share") is None
+
+def test_detects_a_split_gap(actions):
+    history = [{"Symbol": "ACME", "INECODE": ISIN, "candles": candles([500, 505, 510, 102, 103])}]
+
+    added = actions.detect(history)
+
+    assert [(a["ex_date"], a["factor"]) for a in added] == [("2026-09-04", 5.0)]
+
+def test_adjusts_bars_before_the_ex_date(actions):
+    actions.add(ISIN, "ACME", "2026-09-04", 5.0, "split", "nse")
+    series = candles([500, 505, 510, 102, 103])
+    history = [{"Symbol": "ACME", "INECODE": ISIN, "candles": series}]
+
+    assert actions.adjust_history(history) == 1
+    closes = [c[4] for c in history[0]["candles"]][::-1]
+    volumes = [c[5] for c in history[0]["candles"]][::-1]
+    assert closes == pytest.approx([100, 101, 102, 102, 103])
+    assert volumes == [5000, 5000, 5000, 1000, 1000]
+    assert series[-1][4] == 500  # the stored candles are not modified
+
+def test_already_adjusted_history_is_left_alone(actions):
+    actions.add(ISIN, "ACME", "2026-09-04", 5.0, "split", "nse")
+    series = candles([100, 101, 102, 102, 103])
+
+    assert actions.adjust_candles(series, actions.for_security(ISIN)) is series
+
+def test_actions_follow_a_renamed_symbol(actions):
+    actions.add(ISIN, "ACME", "2026-09-04", 2.0, "bonus", "nse")
+    actions.master.update_from_nse([{"trading_symbol": "ACMENEW", "isin": ISIN, "series": "EQ"}])
+    actions._reindex()
+
+    assert [a["factor"] for a in actions.for_security(None, "ACMENEW")] == [2.0]
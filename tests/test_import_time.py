@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from check_import_time import BUDGETS_MS, LAZY_MODULES, measure
+
+# Multiplier on every budget for machines slower than the CI runner.
+SCALE = float(os.environ.get("FINVESTIK_IMPORT_BUDGET_SCALE", "1.0"))
+REPEAT = 5
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_import_within_budget(module):
+    runs = [measure(module) for _ in range(REPEAT)]
+    best_ms = min(us for us, _ in runs) / 1000
+    assert best_ms <= BUDGETS_MS[module] * SCALE, f"{module} imports in {best_ms:.0f}ms"
+    assert not LAZY_MODULES & runs[0][1], f"{module} imports {sorted(LAZY_MODULES & runs[0][1])} at startup"
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import Daily_Data
+import quality_gate
+from quality_gate import check_universe
+from security_master import SecurityMaster
+from snapshot_store import list_sessions, load_session_columns, record_snapshot
+from stock_record import StockRecord
+
+SESSION = "2026-10-19"
+
+def universe(n=600, change=1.0):
+    return [{
+        "Symbol": f"SYM{i:04d}", "current_price": 101.0, "day_volume": 1000, "change_percentage": change,
+        "circuitLimit": 20, "Sector Name": "Tech", "Market Cap": 1000.0,
+        "fifty_two_week_high": 150.0, "TurnoverSMA20": 1.5,
+    } for i in range(n)]
+
+def test_healthy_universe_passes(tmp_path):
+    report = check_universe(universe(), SESSION, str(tmp_path))
+    assert report.passed, report.failures
+
+@pytest.mark.parametrize("records, expected", [
+    (universe(100), "only 100 rows"),
+    (universe() + universe(1), "1 duplicate symbols"),
+    (universe(change=0.0), "show 0% change"),
+    (universe(change=35.0), "beyond their circuit band"),
+    ([dict(r, current_price=None) for r in universe()], "current_price missing"),
+])
+def test_broken_universe_fails(tmp_path, records, expected):
+    report = check_universe(records, SESSION, str(tmp_path))
+    assert not report.passed
+    assert any(expected in failure for failure in report.failures), report.failures
+
+def test_change_against_a_stale_previous_close_fails(tmp_path):
+    previous = [dict(r, current_price=100.0) for r in universe()]
+    record_snapshot(previous, "2026-10-16", str(tmp_path))
+
+    assert check_universe(universe(change=1.0), SESSION, str(tmp_path)).passed
+    # %change still computed against the close two sessions back
+    stale = check_universe(universe(change=5.0), SESSION, str(tmp_path))
+    assert any("not based on the 2026-10-16 close" in f for f in stale.failures)
+
+def test_gap_in_recorded_sessions_does_not_block(tmp_path):
+    # Only 10-15 was recorded; today's %change is (correctly) based on the 10-16 close.
+    record_snapshot([dict(r, current_price=90.0) for r in universe()], "2026-10-15", str(tmp_path))
+    report = check_universe(universe(change=1.0), SESSION, str(tmp_path))
+    assert report.passed, report.failures
+    assert any("not based on the 2026-10-15 close" in w for w in report.warnings)
+
+def test_history_close_is_the_reference(tmp_path):
+    record_snapshot([dict(r, current_price=90.0) for r in universe()], "2026-10-15", str(tmp_path))
+    closes = {r["Symbol"]: 100.0 for r in universe()}
+    report = check_universe(universe(change=1.0), SESSION, str(tmp_path),
+                            previous_closes=closes, previous_session="2026-10-16")
+    assert report.passed and not report.warnings
+    assert report.metrics["previous_close_source"] == "history"
+    stale = check_universe(universe(change=5.0), SESSION, str(tmp_path),
+                           previous_closes=closes, previous_session="2026-10-16")
+    assert any("not based on the 2026-10-16 close" in f for f in stale.failures)
+
+def test_older_session_than_recorded_fails(tmp_path):
+    record_snapshot(universe(), "2026-10-20", str(tmp_path))
+    report = check_universe(universe(), SESSION, str(tmp_path))
+    assert any("older than the recorded session" in f for f in report.failures)
+
+def stocks(n=600, close=101.0, change=1.0):
+    return [StockRecord(f"SYM{i:04d}", close=close, volume=1000, change_pct=change, circuit_limit=20,
+                        sector_name="Tech", market_cap=1000.0, inecode=f"INE{i:09d}",
+                        fifty_two_week_high=150.0, turnover_sma20=1.5) for i in range(n)]
+
+def test_blocked_publish_still_records_the_session(tmp_path, monkeypatch):
+    monkeypatch.setitem(Daily_Data.CONFIG, "snapshot_dir", str(tmp_path / "snapshots"))
+    monkeypatch.setitem(Daily_Data.CONFIG, "output_file", str(tmp_path / "stock_universe.json"))
+    monkeypatch.setitem(Daily_Data.CONFIG, "output_version_file", str(tmp_path / "data_version.json"))
+    monkeypatch.setitem(quality_gate.CONFIG, "metrics_file", str(tmp_path / "quality_metrics.jsonl"))
+    monkeypatch.setattr(Daily_Data, "session_closed", lambda trade_date: True)
+    history = {f"INE{i:09d}": [["2026-10-19T00:00:00+05:30", 0, 0, 0, 101.0, 0],
+                               ["2026-10-16T00:00:00+05:30", 0, 0, 0, 100.0, 0]] for i in range(600)}
+    refs = {"history": history, "master": SecurityMaster()}
+
+    # %change based on a stale close: blocked, but the session is still recorded.
+    assert not Daily_Data.publish(stocks(change=5.0), SESSION, "test", refs)
+    assert not (tmp_path / "stock_universe.json").exists()
+    assert list_sessions(str(tmp_path / "snapshots")) == [SESSION]
+    assert load_session_columns(SESSION, str(tmp_path / "snapshots"))["quality_failures"]
+
+    assert Daily_Data.publish(stocks(change=1.0), SESSION, "test", refs)
+    assert (tmp_path / "data_version.json").exists()
+    assert load_session_columns(SESSION, str(tmp_path / "snapshots"))["quality_failures"] == []
+    metrics = [json.loads(line) for line in (tmp_path / "quality_metrics.jsonl").read_text().splitlines()]
+    assert [m["passed"] for m in metrics] == [False, True]
+    assert metrics[-1]["previous_close_source"] == "history"
+
+def test_session_snapshot_is_written_once_after_the_close(tmp_path, monkeypatch):
+    snapshots = tmp_path / "snapshots"
+    monkeypatch.setitem(Daily_Data.CONFIG, "snapshot_dir", str(snapshots))
+    monkeypatch.setitem(Daily_Data.CONFIG, "output_file", str(tmp_path / "stock_universe.json"))
+    monkeypatch.setitem(Daily_Data.CONFIG, "output_version_file", str(tmp_path / "data_version.json"))
+    monkeypatch.setitem(quality_gate.CONFIG, "metrics_file", str(tmp_path / "quality_metrics.jsonl"))
+
+    monkeypatch.setattr(Daily_Data, "session_closed", lambda trade_date: False)
+    assert Daily_Data.publish(stocks(), SESSION)
+    assert list_sessions(str(snapshots)) == []
+
+    monkeypatch.setattr(Daily_Data, "session_closed", lambda trade_date: True)
+    assert Daily_Data.publish(stocks(), SESSION)
+    final = snapshots / SESSION / "universe.json.gz"
+    written = final.read_bytes()
+    Daily_Data.publish(stocks(), SESSION)  # a later run with the same universe
+    assert final.read_bytes() == written
@@ -0,0 +1,23 @@
+import pytest
+
+from jsonio import dump_file
+from query_store import MANIFEST_FILE, QueryStore, _build_universe
+
+def store(tmp_path):
+    records = [
+        {"Symbol": "AAA", "Sector Name": "Tech", "Industry Name": "Software", "Market Cap": 100.0},
+        {"Symbol": "BBB", "Sector Name": "Tech", "Industry Name": "Hardware", "Market Cap": 300.0},
+        {"Symbol": "CCC", "Sector Name": "Banks", "Industry Name": "Private Bank", "Market Cap": 50.0},
+    ]
+    dump_file({"universe": _build_universe(records, str(tmp_path))}, str(tmp_path / MANIFEST_FILE))
+    return QueryStore(str(tmp_path))
+
+def test_sector_aggregate(tmp_path):
+    rows = store(tmp_path).sector_aggregate("Market Cap", agg="sum")
+    assert rows == [{"Sector Name": "Tech", "sum_Market Cap": 400.0, "stocks": 2},
+                    {"Sector Name": "Banks", "sum_Market Cap": 50.0, "stocks": 1}]
+
+@pytest.mark.parametrize("metric", ["Industry Name", "No Such Column"])
+def test_sector_aggregate_rejects_non_numeric_metrics(tmp_path, metric):
+    with pytest.raises(KeyError):
+        store(tmp_path).sector_aggregate(metric)
@@ -0,0 +1,58 @@
+from datetime import date
+
+from security_master import SecurityMaster
+
+def listing(*rows):
+    return [{"trading_symbol": symbol, "isin": isin, "series": "EQ", "name_of_company": symbol.title(),
+             "date_of_listing": "01-JAN-2010"} for symbol, isin in rows]
+
+def test_rename_keeps_the_isin_and_remembers_the_old_symbol():
+    master = SecurityMaster()
+    master.update_from_nse(listing(("OLDCO", "INE000A01011")))
+    events = master.update_from_nse(listing(("NEWCO", "INE000A01011")))
+
+    assert events == [{"type": "rename", "isin": "INE000A01011", "old": "OLDCO", "new": "NEWCO"}]
+    assert master.by_symbol("OLDCO") is master.by_symbol("NEWCO")
+    assert master.canonical_symbol("oldco") == "NEWCO"
+
+def test_reissued_isin_resolves_the_old_one():
+    master = SecurityMaster()
+    master.update_from_nse(listing(("ACME", "INE000A01011")))
+    events = master.update_from_nse(listing(("ACME", "INE000A01029")))
+
+    assert events[0]["type"] == "isin_change"
+    assert master.canonical_isin("INE000A01011") == "INE000A01029"
+    assert len(master) == 1
+
+def test_remap_history_rekeys_past_identities():
+    master = SecurityMaster()
+    master.update_from_nse(listing(("OLDCO", "INE000A01011"), ("ACME", "INE000B01011")))
+    master.update_from_nse(listing(("NEWCO", "INE000A01011"), ("ACME", "INE000B01029")))
+    history = [
+        {"Symbol": "OLDCO", "INECODE": "INE000A01011", "candles": []},
+        {"Symbol": "ACME", "INECODE": "INE000B01011", "candles": []},
+        {"Symbol": "GONE", "INECODE": "INE999Z01011", "candles": []},
+    ]
+
+    assert master.remap_history(history) == 2
+    assert [(e["Symbol"], e["INECODE"]) for e in history] == [
+        ("NEWCO", "INE000A01011"), ("ACME", "INE000B01029"), ("GONE", "INE999Z01011")]
+
+def test_unchanged_listing_is_not_saved(tmp_path):
+    path = str(tmp_path / "security_master.json")
+    master = SecurityMaster()
+    master.update_from_nse(listing(("ACME", "INE000A01011")), today=date(2026, 10, 19))
+    assert master.save(path)
+
+    master = SecurityMaster.load(path)
+    master.update_from_nse(listing(("ACME", "INE000A01011")), today=date(2026, 10, 20))
+    assert not master.save(path)
+
+def test_listed_isins_leave_out_delisted_securities():
+    master = SecurityMaster()
+    master.update_from_nse(listing(("ACME", "INE000A01011"), ("GONE", "INE000B01011")))
+    listed = SecurityMaster.listed_isins(listing(("ACME", "INE000A01011")))
+
+    assert master.by_symbol("GONE") is not None  # the master never forgets a security
+    assert master.isin_for("GONE") not in listed
+    assert master.isin_for("ACME") in listed
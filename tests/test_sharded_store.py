@@ -0,0 +1,23 @@
+import os
+
+from sharded_store import encode_rows, read_sharded, write_sharded
+from jsonio import loads
+
+def test_round_trip_and_unchanged_shards_untouched(tmp_path):
+    rows = [{"Symbol": s, "candles": [[1, 2], [3, 4]]} for s in ("ACME", "BETA", "1ST", "ZED")]
+    stats = write_sharded(rows, str(tmp_path), expand="candles")
+    assert stats == {"shards": 4, "written": 4, "removed": 0}
+    assert read_sharded(str(tmp_path)) == sorted(rows, key=lambda r: r["Symbol"])
+
+    rows[0]["candles"].insert(0, [5, 6])
+    stats = write_sharded(rows[:3], str(tmp_path), expand="candles")
+    assert stats == {"shards": 3, "written": 1, "removed": 1}
+    assert not os.path.exists(tmp_path / "z.json")
+
+def test_expanded_rows_are_plain_json_one_element_per_line():
+    raw = encode_rows([{"candles": [[1], [2]], "Symbol": "A"}, {"Symbol": "B", "candles": []}], expand="candles")
+    assert loads(raw) == [{"Symbol": "A", "candles": [[1], [2]]}, {"Symbol": "B", "candles": []}]
+    assert raw.count(b"\n") == 7
+
+def test_missing_store_reads_as_none(tmp_path):
+    assert read_sharded(str(tmp_path / "absent")) is None